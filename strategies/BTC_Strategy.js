@@ -6,12 +6,16 @@ const os = require('os');
 const fs = require('fs/promises');
 const crypto = require('crypto');
 
-const chunkSize = 100;
+// Chunking and worker count are chosen by execution_planner.py from its calibration.
+// Run `python execution_planner.py calibrate` once per deployment; until then each
+// request runs in process. Results go through STRATEGY_RESULT_CACHE when it is set.
+const basePythonTimeoutMs = 30000;
+const timeoutPerCandleMs = 2;
 
 async function createTempFilePath() {
     const uniqueId = crypto.randomBytes(16).toString('hex');
     const timestamp = Date.now();
-    const fileName = `btc_chunk_${uniqueId}_${timestamp}.json`;
+    const fileName = `btc_input_${uniqueId}_${timestamp}.json`;
     return path.join(os.tmpdir(), fileName).replace(/\\/g, '/');
 }
 
@@ -48,25 +52,25 @@ async function safeDeleteFile(filePath, maxRetries = 3) {
     }
 }
 
-async function processChunk(chunk, index) {
+async function runStrategy(candleData, cursor = null) {
     let tempFile = null;
 
     try {
         tempFile = await createTempFilePath();
-        console.log(`Created temp file for chunk ${index}: ${tempFile}`);
+        console.log(`Created temp file for ${candleData.length} candles: ${tempFile}`);
 
         try {
-            await fs.writeFile(tempFile, JSON.stringify({ candleData: chunk }));
+            await fs.writeFile(tempFile, JSON.stringify({ engine: 'btc', candleData, cursor }));
             console.log(`Successfully wrote data to temp file: ${tempFile}`);
         } catch (writeError) {
             throw new Error(`Failed to write temporary file: ${writeError.message}`);
         }
 
         const result = await new Promise((resolve, reject) => {
-            const scriptPath = path.join(__dirname, 'btc_strategy.py').replace(/\\/g, '/');
+            const scriptPath = path.join(__dirname, 'execution_planner.py').replace(/\\/g, '/');
             console.log(`Executing Python script: ${scriptPath} with temp file: ${tempFile}`);
 
-            const pythonProcess = spawn('python', [scriptPath, tempFile]);
+            const pythonProcess = spawn('python', [scriptPath, 'run', tempFile]);
 
             let dataString = '';
             let errorString = '';
@@ -102,12 +106,12 @@ async function processChunk(chunk, index) {
             setTimeout(() => {
                 pythonProcess.kill();
                 reject(new Error('Python process timed out'));
-            }, 30000);
+            }, basePythonTimeoutMs + candleData.length * timeoutPerCandleMs);
         });
 
         return result;
     } catch (error) {
-        console.error(`Error processing chunk ${index}:`, error);
+        console.error('Error running strategy:', error);
         throw error;
     } finally {
         if (tempFile) {
@@ -124,6 +128,8 @@ router.post('/:strategyId/analyze', async (req, res) => {
     try {
         console.log('Starting strategy analysis');
         const { candleData } = req.body;
+        // Timestamp of the newest candle the client already has signals for
+        const cursor = req.body.cursor ?? null;
 
         if (!candleData || !Array.isArray(candleData)) {
             console.error('Invalid candle data format received');
@@ -133,30 +139,33 @@ router.post('/:strategyId/analyze', async (req, res) => {
             });
         }
 
-        const chunks = [];
-        for (let i = 0; i < candleData.length; i += chunkSize) {
-            chunks.push(candleData.slice(i, i + chunkSize));
+        if (cursor !== null && !Number.isFinite(Number(cursor))) {
+            console.error('Invalid cursor received');
+            return res.status(400).json({
+                success: false,
+                error: 'Invalid cursor'
+            });
         }
-        console.log(`Split data into ${chunks.length} chunks`);
 
         let allSignals = [];
         let errors = [];
+        let plan;
+        let nextCursor = cursor;
 
-        for (let i = 0; i < chunks.length; i++) {
-            try {
-                console.log(`Processing chunk ${i + 1}/${chunks.length}`);
-                const result = await processChunk(chunks[i], i);
-                if (Array.isArray(result)) {
-                    allSignals = allSignals.concat(result);
-                    console.log(`Successfully processed chunk ${i + 1}, got ${result.length} signals`);
-                }
-            } catch (error) {
-                console.error(`Error processing chunk ${i}:`, error);
-                errors.push({
-                    chunk: i,
-                    error: error.message
-                });
+        try {
+            const result = await runStrategy(candleData, cursor === null ? null : Number(cursor));
+            if (result.error) {
+                throw new Error(result.error);
             }
+            allSignals = result.signals;
+            plan = result.plan;
+            nextCursor = result.cursor ?? cursor;
+            console.log(`Ran ${plan.mode} plan (chunk size ${plan.chunk_size}, ${plan.workers} workers), got ${allSignals.length} signals`);
+        } catch (error) {
+            console.error('Error processing candles:', error);
+            errors.push({
+                error: error.message
+            });
         }
 
         allSignals.sort((a, b) => a.timestamp - b.timestamp);
@@ -165,9 +174,11 @@ router.post('/:strategyId/analyze', async (req, res) => {
         res.json({
             success: true,
             signals: allSignals,
+            cursor: nextCursor,
             metadata: {
                 totalSignals: allSignals.length,
                 processedCandles: candleData.length,
+                plan,
                 errors: errors.length > 0 ? errors : undefined
             }
         });
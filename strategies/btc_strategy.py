@@ -1,20 +1,25 @@
 import numpy as np
 import pandas as pd
 import json
+import os
 import sys
 from datetime import datetime
 
+from candle_sanitizer import sanitize_frame
+from recurrence import rolling_sum
+
 class BTCStrategy:
     def __init__(self, data):
         self.data = pd.DataFrame(data)
         self.data['timestamp'] = pd.to_numeric(self.data['timestamp'])
+        self.data, self.data_quality = sanitize_frame(self.data)
         self.timeframe = self._detect_timeframe()
-        self.setup_indicators()
+        self.params = self._adjust_parameters()
 
     def _detect_timeframe(self):
-        # Calculate average time difference between candles in minutes
-        time_diff = np.diff(self.data['timestamp']) / (1000 * 60)  # Convert to minutes
-        avg_diff = np.mean(time_diff)
+        # Use the most common candle spacing in minutes; the mean is skewed by gaps
+        interval = self.data_quality['interval_ms']
+        avg_diff = interval / (1000 * 60) if interval else np.mean(np.diff(self.data['timestamp']) / (1000 * 60))
         
         # Map average difference to timeframe
         if avg_diff <= 1:
@@ -84,26 +89,36 @@ class BTCStrategy:
         }
         return params[self.timeframe]
 
-    def setup_indicators(self):
-        params = self._adjust_parameters()
+    def setup_indicators(self, first=0):
+        """
+        Candles from `first` on with their indicator columns. Only their
+        look-back is read and each value uses just its own window, so the rows
+        of a cursor run equal those of a full run.
+        """
+        params = self.params
+        begin = max(first - max(params['sma_period'], params['volume_sma_period'], 2) + 1, 0)
+        data = self.data.iloc[begin:].copy()
         
         # Calculate basic indicators
-        self.data['price_change'] = self.data['close'].pct_change() * 100
-        self.data['volume_sma'] = self.data['volume'].rolling(
-            window=params['volume_sma_period']).mean()
-        self.data['price_sma'] = self.data['close'].rolling(
-            window=params['sma_period']).mean()
+        data['price_change'] = data['close'].pct_change() * 100
+        data['volume_sma'] = rolling_sum(data['volume'], params['volume_sma_period']) / params['volume_sma_period']
+        data['price_sma'] = rolling_sum(data['close'], params['sma_period']) / params['sma_period']
         
         # Volume conditions
-        self.data['volume_spike'] = self.data['volume'] > self.data['volume_sma'] * params['volume_threshold']
+        data['volume_spike'] = data['volume'] > data['volume_sma'] * params['volume_threshold']
         
         # Trend conditions
-        self.data['above_sma'] = self.data['close'] > self.data['price_sma']
-        self.data['below_sma'] = self.data['close'] < self.data['price_sma']
+        data['above_sma'] = data['close'] > data['price_sma']
+        data['below_sma'] = data['close'] < data['price_sma']
         
-        self.params = params
+        return data.iloc[first - begin:]
 
-    def calculate(self):
+    def calculate(self, cursor=None):
+        """
+        Scan for signals. With a cursor (timestamp of the last candle a caller has
+        already seen) only candles after it are scanned, and indicators are only
+        computed for them and their look-back, so the signals match a full run.
+        """
         params = self.params
         min_periods = max(params['sma_period'], params['volume_sma_period'])
         
@@ -111,45 +126,41 @@ class BTCStrategy:
             return []
 
         signals = []
+        first = min_periods
+        if cursor is not None:
+            first = max(first, int(np.searchsorted(self.data['timestamp'].to_numpy(), cursor, side='right')))
+        # Rows from the candle before the first one scanned, whose price change is part of the conditions
+        data = self.setup_indicators(first - 1)
         
-        for i in range(min_periods, len(self.data)):
-            row = self.data.iloc[i]
-            prev_row = self.data.iloc[i-1]
-            
-            # Long conditions
-            long_conditions = (
-                prev_row['price_change'] < -params['price_change_threshold'] and
-                row['volume_spike'] and
-                row['below_sma']
-            )
-            
-            # Short conditions
-            short_conditions = (
-                prev_row['price_change'] > params['price_change_threshold'] and
-                row['volume_spike'] and
-                row['above_sma']
-            )
+        # Each row's conditions use the previous row's price change; NaN
+        # compares False, so rows without a full look-back never signal
+        price_change = data['price_change'].to_numpy()[:-1]
+        volume_spike = data['volume_spike'].to_numpy()[1:]
+        long_conditions = (price_change < -params['price_change_threshold']) & volume_spike & data['below_sma'].to_numpy()[1:]
+        short_conditions = (price_change > params['price_change_threshold']) & volume_spike & data['above_sma'].to_numpy()[1:]
+        closes = data['close'].to_numpy()[1:]
+        timestamps = data['timestamp'].to_numpy()[1:]
+        
+        for i in np.flatnonzero(long_conditions | short_conditions):
+            entry_price = float(closes[i])
+            timestamp = int(timestamps[i])
             
-            if long_conditions or short_conditions:
-                entry_price = float(row['close'])
-                timestamp = int(row['timestamp'])
-                
-                if long_conditions:
-                    signals.append({
-                        'timestamp': timestamp,
-                        'type': 'long',
-                        'entry_price': entry_price,
-                        'tp': entry_price * (1 + params['tp_percentage']),
-                        'sl': entry_price * (1 - params['sl_percentage'])
-                    })
-                elif short_conditions:
-                    signals.append({
-                        'timestamp': timestamp,
-                        'type': 'short',
-                        'entry_price': entry_price,
-                        'tp': entry_price * (1 - params['tp_percentage']),
-                        'sl': entry_price * (1 + params['sl_percentage'])
-                    })
+            if long_conditions[i]:
+                signals.append({
+                    'timestamp': timestamp,
+                    'type': 'long',
+                    'entry_price': entry_price,
+                    'tp': entry_price * (1 + params['tp_percentage']),
+                    'sl': entry_price * (1 - params['sl_percentage'])
+                })
+            else:
+                signals.append({
+                    'timestamp': timestamp,
+                    'type': 'short',
+                    'entry_price': entry_price,
+                    'tp': entry_price * (1 - params['tp_percentage']),
+                    'sl': entry_price * (1 + params['sl_percentage'])
+                })
         
         return signals
 
@@ -160,13 +171,24 @@ if __name__ == "__main__":
             input_data = json.load(f)
         
         candleData = input_data['candleData']
+        cursor = input_data.get('cursor')
         
-        # Run strategy
-        strategy = BTCStrategy(candleData)
-        signals = strategy.calculate()
+        # Run strategy, through the result cache when one is configured
+        cache_dir = os.environ.get('STRATEGY_RESULT_CACHE')
+        if cache_dir:
+            from result_cache import ResultCache
+            signals = ResultCache(cache_dir).calculate_btc(candleData, cursor)
+        else:
+            signals = BTCStrategy(candleData).calculate(cursor)
         
-        # Output results
-        print(json.dumps(signals))
+        # Output results; callers passing a cursor get the one to send next time
+        if cursor is None:
+            print(json.dumps(signals))
+        else:
+            print(json.dumps({
+                'signals': signals,
+                'cursor': int(max(float(c['timestamp']) for c in candleData)) if candleData else cursor
+            }))
         
     except Exception as e:
         print(json.dumps({
@@ -0,0 +1,365 @@
+import numpy as np
+import argparse
+import csv
+import json
+import socket
+import sys
+import time
+from collections import deque
+from itertools import chain
+
+from candle_stream import CANDLE_FIELDS
+from kline_loader import interval_ms
+
+TRADE_FIELDS = ['timestamp', 'price', 'quantity']
+
+# Names exchanges and recorders use for the trade fields
+TRADE_ALIASES = {
+    'timestamp': 'timestamp', 'time': 'timestamp', 'T': 'timestamp', 't': 'timestamp',
+    'price': 'price', 'p': 'price',
+    'quantity': 'quantity', 'qty': 'quantity', 'q': 'quantity', 'volume': 'quantity',
+    'vol': 'quantity', 'v': 'quantity', 'size': 'quantity', 'amount': 'quantity'
+}
+
+BASE_TIMEFRAME = '1m'
+
+# Emit latencies kept for stats(); older ones are dropped so a long-running feed stays bounded
+LATENCY_WINDOW = 10000
+
+
+def _parse_trade(record):
+    """Normalize a trade (object with aliased fields or [timestamp, price, quantity] array)"""
+    if not isinstance(record, dict):
+        return dict(zip(TRADE_FIELDS, (float(value) for value in record)))
+    trade = {}
+    for key, value in record.items():
+        if key in TRADE_ALIASES and TRADE_ALIASES[key] not in trade:
+            trade[TRADE_ALIASES[key]] = float(value)
+    return trade
+
+
+def _iter_trade_lines(lines):
+    """Yield trades from JSON lines or from CSV with a header row"""
+    lines = iter(lines)
+    for first in lines:
+        if first.strip():
+            break
+    else:
+        return
+
+    if first.lstrip().startswith(('{', '[')):
+        for line in chain([first], lines):
+            if line.strip():
+                yield _parse_trade(json.loads(line))
+        return
+
+    for row in csv.DictReader(chain([first], lines)):
+        yield _parse_trade(row)
+
+
+def iter_trades(source):
+    """
+    Iterate over trades from a file path ('-' for stdin), an open text file or
+    any iterable of trade dicts/arrays, for replaying recorded tape.
+    """
+    if isinstance(source, str):
+        if source == '-':
+            yield from _iter_trade_lines(sys.stdin)
+            return
+        with open(source, 'r') as f:
+            yield from _iter_trade_lines(f)
+        return
+
+    if hasattr(source, 'readline'):
+        yield from _iter_trade_lines(source)
+        return
+
+    for trade in source:
+        yield _parse_trade(trade)
+
+
+def iter_socket_trades(host='127.0.0.1', port=9100, idle_timeout=0.25):
+    """
+    Accept one local TCP connection and yield the JSON-lines trades sent over it.
+
+    Stands in for an exchange websocket. None is yielded whenever the feed is
+    idle for idle_timeout seconds so the consumer can close candles on the clock.
+    """
+    with socket.create_server((host, port)) as server:
+        connection, _ = server.accept()
+        with connection:
+            connection.settimeout(idle_timeout)
+            buffer = b''
+            while True:
+                try:
+                    chunk = connection.recv(65536)
+                except socket.timeout:
+                    yield None
+                    continue
+                if not chunk:
+                    break
+                buffer += chunk
+                *lines, buffer = buffer.split(b'\n')
+                for line in lines:
+                    if line.strip():
+                        yield _parse_trade(json.loads(line))
+            if buffer.strip():
+                yield _parse_trade(json.loads(buffer))
+
+
+class CandleRing:
+    """Fixed-capacity buffer of the most recent candles of one timeframe"""
+
+    def __init__(self, capacity=1000):
+        self.capacity = int(capacity)
+        self.rows = np.zeros((self.capacity, len(CANDLE_FIELDS)))
+        self.start = 0
+        self.count = 0
+
+    def __len__(self):
+        return self.count
+
+    def append(self, row):
+        self.rows[(self.start + self.count) % self.capacity] = row
+        if self.count < self.capacity:
+            self.count += 1
+        else:
+            self.start = (self.start + 1) % self.capacity
+
+    def to_array(self, last=None):
+        """The newest `last` candles (all by default), oldest first, as an (n x 6) array"""
+        n = self.count if last is None else min(int(last), self.count)
+        positions = (self.start + self.count - n + np.arange(n)) % self.capacity
+        return self.rows[positions]
+
+    def to_dicts(self, last=None):
+        candles = []
+        for row in self.to_array(last).tolist():
+            candle = dict(zip(CANDLE_FIELDS, row))
+            candle['timestamp'] = int(candle['timestamp'])
+            candles.append(candle)
+        return candles
+
+
+class CandleAggregator:
+    """
+    Build OHLCV candles from a stream of trades and push them to subscribers.
+
+    Trades fill 1m buckets; a bucket closes once the newest trade time (or the
+    clock passed to advance()) is grace_ms past its end, so ticks that arrive
+    late or out of order within the grace window still land in the right
+    candle. Later ones are counted in late_trades and dropped. Higher
+    timeframes are rolled up from closed 1m candles. Each timeframe keeps its
+    recent candles in a CandleRing. A higher-timeframe period that began
+    before the first 1m candle is incomplete and is not emitted.
+    """
+
+    def __init__(self, timeframes=('1m', '5m'), capacity=1000, grace_ms=2000, fill_gaps=True):
+        self.base_ms = interval_ms(BASE_TIMEFRAME)
+        self.timeframes = list(dict.fromkeys([BASE_TIMEFRAME] + list(timeframes)))
+        self.periods = {tf: interval_ms(tf) for tf in self.timeframes}
+        for tf, period in self.periods.items():
+            if period % self.base_ms:
+                raise ValueError(f"Timeframe '{tf}' is not a multiple of {BASE_TIMEFRAME}")
+        self.grace_ms = grace_ms
+        self.fill_gaps = fill_gaps
+        self.rings = {tf: CandleRing(capacity) for tf in self.timeframes}
+        self.subscribers = {tf: [] for tf in self.timeframes}
+
+        # Open 1m buckets: start -> [open, high, low, close, volume, first trade time, last trade time]
+        self.buckets = {}
+        self.rollups = {tf: None for tf in self.timeframes if tf != BASE_TIMEFRAME}
+        self.watermark = None
+        self.closed_until = None
+        self.last_close = None
+        self.first_base = None
+        self.trades = 0
+        self.late_trades = 0
+        self.partial_rollups = 0
+        self.emit_latency_ms = deque(maxlen=LATENCY_WINDOW)
+
+    def subscribe(self, timeframe, callback):
+        """Call callback(timeframe, candle) for every closed candle of timeframe"""
+        if timeframe not in self.subscribers:
+            raise ValueError(f"Timeframe '{timeframe}' is not aggregated")
+        self.subscribers[timeframe].append(callback)
+
+    def subscribe_strategy(self, strategy, timeframe=BASE_TIMEFRAME, on_signals=None):
+        """
+        Feed closed candles to a strategy and pass new signals to on_signals(timeframe, candle, signals).
+
+        Instances with update() (ScalpingStrategy) are streamed one candle at a
+        time. Anything else is treated as a batch strategy class such as
+        BTCStrategy: it is rebuilt over the ring buffer and only signals after
+        the previous candle are reported.
+        """
+        if hasattr(strategy, 'update'):
+            def run(candle):
+                return strategy.update([candle])
+        else:
+            def run(candle):
+                candles = self.rings[timeframe].to_dicts()
+                if len(candles) < 2:
+                    return []
+                return strategy(candles).calculate(cursor=candles[-2]['timestamp'])
+
+        def deliver(tf, candle):
+            signals = run(candle)
+            if signals and on_signals is not None:
+                on_signals(tf, candle, signals)
+
+        self.subscribe(timeframe, deliver)
+
+    def add_trade(self, trade):
+        """Add one trade and close any buckets it pushes past the grace window"""
+        timestamp = float(trade['timestamp'])
+        price = float(trade['price'])
+        quantity = float(trade.get('quantity', 0.0))
+        start = timestamp - timestamp % self.base_ms
+
+        if self.closed_until is not None and start < self.closed_until:
+            self.late_trades += 1
+            return
+        self.trades += 1
+
+        bucket = self.buckets.get(start)
+        if bucket is None:
+            self.buckets[start] = [price, price, price, price, quantity, timestamp, timestamp]
+        else:
+            if timestamp < bucket[5]:
+                bucket[0], bucket[5] = price, timestamp
+            if timestamp >= bucket[6]:
+                bucket[3], bucket[6] = price, timestamp
+            bucket[1] = max(bucket[1], price)
+            bucket[2] = min(bucket[2], price)
+            bucket[4] += quantity
+
+        if self.watermark is None or timestamp > self.watermark:
+            self.watermark = timestamp
+            self.advance(timestamp)
+
+    def advance(self, now_ms):
+        """Close every bucket that ended more than grace_ms before now_ms"""
+        cutoff = now_ms - self.grace_ms
+        ready = sorted(start for start in self.buckets if start + self.base_ms <= cutoff)
+        for start in ready:
+            if self.fill_gaps and self.closed_until is not None and self.last_close is not None:
+                for gap in np.arange(self.closed_until, start, self.base_ms):
+                    close = self.last_close
+                    self._close_base(np.array([gap, close, close, close, close, 0.0]))
+            o, h, l, c, v = self.buckets.pop(start)[:5]
+            self._close_base(np.array([start, o, h, l, c, v]))
+
+    def flush(self):
+        """Close all open 1m buckets, e.g. at the end of a replay; partial higher timeframes stay open"""
+        if self.buckets:
+            self.advance(max(self.buckets) + self.base_ms + self.grace_ms)
+
+    def _close_base(self, row):
+        if self.first_base is None:
+            self.first_base = row[0]
+        self.closed_until = row[0] + self.base_ms
+        self.last_close = row[4]
+        self._emit(BASE_TIMEFRAME, row)
+
+        for tf, rollup in self.rollups.items():
+            period = self.periods[tf]
+            start = row[0] - row[0] % period
+            if rollup is not None and rollup[0] != start:
+                self.rollups[tf] = None
+                self._emit_rollup(tf, rollup)
+                rollup = None
+            if rollup is None:
+                rollup = row.copy()
+                rollup[0] = start
+            else:
+                rollup[2] = max(rollup[2], row[2])
+                rollup[3] = min(rollup[3], row[3])
+                rollup[4] = row[4]
+                rollup[5] += row[5]
+            self.rollups[tf] = rollup
+            if row[0] + self.base_ms == start + period:
+                self.rollups[tf] = None
+                self._emit_rollup(tf, rollup)
+
+    def _emit_rollup(self, timeframe, row):
+        # The trades before the first 1m candle are missing from its period
+        if row[0] < self.first_base:
+            self.partial_rollups += 1
+            return
+        self._emit(timeframe, row)
+
+    def _emit(self, timeframe, row):
+        closed_at = time.perf_counter()
+        self.rings[timeframe].append(row)
+        candle = dict(zip(CANDLE_FIELDS, row.tolist()))
+        candle['timestamp'] = int(candle['timestamp'])
+        for callback in self.subscribers[timeframe]:
+            callback(timeframe, candle)
+        if self.subscribers[timeframe]:
+            self.emit_latency_ms.append((time.perf_counter() - closed_at) * 1000)
+
+    def run(self, trades, clock=None):
+        """
+        Consume a trade iterable until it ends, then flush.
+
+        A None item means the feed is idle; open buckets are then closed
+        against clock() (wall time in ms by default).
+        """
+        clock = clock or (lambda: time.time() * 1000)
+        for trade in trades:
+            if trade is None:
+                self.advance(clock())
+            else:
+                self.add_trade(trade)
+        self.flush()
+
+    def stats(self):
+        latency = np.asarray(self.emit_latency_ms)
+        return {
+            'trades': self.trades,
+            'late_trades': self.late_trades,
+            'partial_rollups': self.partial_rollups,
+            'candles': {tf: len(ring) for tf, ring in self.rings.items()},
+            'emit_latency_ms': {
+                'p50': float(np.percentile(latency, 50)),
+                'p99': float(np.percentile(latency, 99)),
+                'max': float(latency.max())
+            } if latency.size else {}
+        }
+
+
+if __name__ == "__main__":
+    from btc_strategy import BTCStrategy
+    from scalping_strategy import ScalpingStrategy
+
+    parser = argparse.ArgumentParser(description='Aggregate trades into candles and run the strategies on each close')
+    parser.add_argument('source', nargs='?', default='-', help="trade file (JSON lines or CSV), '-' for stdin")
+    parser.add_argument('--listen', type=int, help='read JSON-lines trades from a local TCP port instead')
+    parser.add_argument('--timeframes', default='1m,5m')
+    parser.add_argument('--grace-ms', type=int, default=2000)
+    parser.add_argument('--capacity', type=int, default=1000)
+    parser.add_argument('--config', help='JSON file with the ScalpingStrategy configuration')
+    parser.add_argument('--btc', action='store_true', help='also run BTCStrategy on each closed candle')
+    args = parser.parse_args()
+
+    timeframes = [tf for tf in args.timeframes.split(',') if tf]
+    aggregator = CandleAggregator(timeframes, args.capacity, args.grace_ms)
+
+    config = {}
+    if args.config:
+        with open(args.config, 'r') as f:
+            config = json.load(f)
+
+    def print_signals(timeframe, candle, signals):
+        for signal in signals:
+            print(json.dumps(dict(signal, timeframe=timeframe)), flush=True)
+
+    for tf in timeframes:
+        aggregator.subscribe_strategy(ScalpingStrategy(dict(config, timeframe=tf)), tf, print_signals)
+        if args.btc:
+            aggregator.subscribe_strategy(BTCStrategy, tf, print_signals)
+
+    trades = iter_socket_trades(port=args.listen) if args.listen else iter_trades(args.source)
+    aggregator.run(trades)
+    print(json.dumps(aggregator.stats()), file=sys.stderr)
@@ -0,0 +1,319 @@
+import numpy as np
+import json
+import sys
+
+CANDLE_FIELDS = ['timestamp', 'open', 'high', 'low', 'close', 'volume']
+
+FILL_MODES = ('none', 'ffill', 'mark')
+
+
+# Deltas sampled when inferring the interval of very long series
+INTERVAL_SAMPLE = 100_000
+
+# Gap fills copy the runs of candles between gaps as blocks up to this many gaps
+MAX_COPIED_RUNS = 4096
+
+
+def infer_interval(timestamps):
+    """Most common spacing between consecutive candles (robust to gaps, unlike the mean)"""
+    deltas = np.diff(timestamps)
+    if len(deltas) > INTERVAL_SAMPLE:
+        deltas = deltas[::len(deltas) // INTERVAL_SAMPLE]
+    deltas = deltas[deltas > 0]
+    if deltas.size == 0:
+        return None
+    values, counts = np.unique(deltas, return_counts=True)
+    return float(values[np.argmax(counts)])
+
+
+def _valid_rows(candles):
+    """
+    Mask of usable rows, or None when every row is usable.
+
+    Rows with non-finite or non-positive prices, high < low or negative
+    volume are unusable. Whole-array checks run first so clean data never
+    pays for building a row mask.
+    """
+    bad = None
+    clean = (
+        np.isfinite(candles).all() and candles[:, 1:5].min(initial=np.inf) > 0
+        and candles[:, 5].min(initial=0.0) >= 0
+    )
+    if not clean:
+        # NaN fails the comparisons too, so each check also catches missing values
+        bad = ~np.isfinite(candles[:, 0]) | ~(candles[:, 5] >= 0)
+        for column in range(1, 5):
+            values = candles[:, column]
+            if not (np.isfinite(values).all() and values.min(initial=np.inf) > 0):
+                bad |= ~(np.isfinite(values) & (values > 0))
+
+    inverted = candles[:, 2] < candles[:, 3]
+    if inverted.any():
+        bad = inverted if bad is None else bad | inverted
+    return None if bad is None else ~bad
+
+
+def _select_rows(candles, report):
+    """
+    Drop unusable rows, sort by time and keep the last of duplicate timestamps.
+
+    Returns the cleaned candles (the input itself when nothing changed) and
+    their consecutive timestamp deltas.
+    """
+    valid = _valid_rows(candles)
+    report['invalid'] = 0 if valid is None else int(len(candles) - np.count_nonzero(valid))
+
+    # Work out the surviving row indices first and copy the candles once at the end
+    rows = None
+    timestamps = candles[:, 0]
+    if report['invalid']:
+        rows = np.flatnonzero(valid)
+        timestamps = timestamps[rows]
+
+    deltas = np.diff(timestamps)
+    report['out_of_order'] = int(np.count_nonzero(deltas < 0))
+    if report['out_of_order']:
+        # A stable sort keeps the arrival order of duplicates
+        order = np.argsort(timestamps, kind='stable')
+        rows = order if rows is None else rows[order]
+        timestamps = timestamps[order]
+        deltas = np.diff(timestamps)
+
+    duplicate = deltas == 0
+    report['duplicates'] = int(np.count_nonzero(duplicate))
+    if report['duplicates']:
+        keep = np.append(~duplicate, True)
+        rows = np.flatnonzero(keep) if rows is None else rows[keep]
+        deltas = deltas[~duplicate]
+
+    if rows is not None:
+        candles = np.take(candles, rows, axis=0)
+    return candles, deltas
+
+
+def _gap_report(timestamps, deltas, interval, report):
+    """
+    Fill in the gap statistics. Returns each candle's slot on the interval
+    grid when bars are missing, else None.
+    """
+    report['interval_inferred'] = interval is None
+    if interval is None:
+        interval = infer_interval(timestamps)
+    report['interval_ms'] = interval
+
+    # Only the deltas that are not exactly one interval need a closer look
+    irregular = np.flatnonzero(deltas != interval) if interval and len(timestamps) >= 2 else []
+    if len(irregular) == 0:
+        report.update({'off_grid': 0, 'gaps': 0, 'missing_bars': 0, 'largest_gap_ms': 0.0, 'coverage': 1.0})
+        return None
+
+    odd = deltas[irregular]
+    steps = np.maximum(np.rint(odd / interval).astype(np.int64), 1)
+    gaps = steps > 1
+    # Deltas that are not a whole number of intervals shift every later candle off the grid
+    report['off_grid'] = int(np.count_nonzero(odd % interval))
+    report['gaps'] = int(np.count_nonzero(gaps))
+    report['missing_bars'] = int((steps[gaps] - 1).sum())
+    report['largest_gap_ms'] = float(odd.max()) if report['gaps'] else 0.0
+    report['coverage'] = len(timestamps) / (len(timestamps) + report['missing_bars'])
+    if not report['missing_bars']:
+        return None
+
+    skipped = np.zeros(len(timestamps), dtype=np.int64)
+    skipped[irregular + 1] = steps - 1
+    return np.arange(len(timestamps)) + np.cumsum(skipped)
+
+
+def _check_ohlc(candles, report):
+    """Count candles whose high/low do not contain the open and close (kept as they are)"""
+    opens, highs, lows, closes = candles[:, 1], candles[:, 2], candles[:, 3], candles[:, 4]
+    report['inconsistent_ohlc'] = int(np.count_nonzero(
+        (highs < np.maximum(opens, closes)) | (lows > np.minimum(opens, closes))
+    ))
+
+
+def _finish_report(candles, missing, report):
+    report['filled'] = int(missing.sum()) if missing is not None else 0
+    report['rows_out'] = len(candles)
+    report['first_timestamp'] = float(candles[0, 0]) if len(candles) else None
+    report['last_timestamp'] = float(candles[-1, 0]) if len(candles) else None
+    return report
+
+
+def sanitize_array(candles, interval=None, fill='none'):
+    """
+    Clean an (n x 6) candle array of CANDLE_FIELDS.
+
+    Invalid rows are dropped, the rest sorted by time and deduplicated, and
+    gaps measured against interval (inferred when None). fill='ffill'
+    inserts flat zero-volume candles at the previous close for missing
+    bars, fill='mark' inserts NaN-priced ones. Returns (candles, missing
+    mask or None, report).
+    """
+    if fill not in FILL_MODES:
+        raise ValueError(f"Unknown fill mode '{fill}'")
+    candles = np.asarray(candles, dtype=np.float64).reshape(-1, len(CANDLE_FIELDS))
+    report = {'rows_in': len(candles)}
+
+    candles, deltas = _select_rows(candles, report)
+    _check_ohlc(candles, report)
+
+    positions = _gap_report(candles[:, 0], deltas, interval, report)
+    missing = None
+    if fill != 'none' and report['missing_bars']:
+        candles, missing = _fill_gaps(candles, positions, report['interval_ms'], fill)
+    return candles, missing, _finish_report(candles, missing, report)
+
+
+def _fill_gaps(candles, positions, interval, fill):
+    """Spread candles onto a full grid and fill the empty slots"""
+    total = int(positions[-1]) + 1
+    grid = np.empty((total, len(CANDLE_FIELDS)))
+    missing = np.zeros(total, dtype=bool)
+
+    # First candle after each gap; the runs between gaps are copied as blocks
+    after = np.flatnonzero(np.diff(positions) > 1) + 1
+    if len(after) <= MAX_COPIED_RUNS:
+        bounds = np.concatenate([[0], after, [len(candles)]])
+        for lo, hi in zip(bounds[:-1], bounds[1:]):
+            grid[positions[lo]:positions[lo] + hi - lo] = candles[lo:hi]
+        for first in after:
+            missing[positions[first - 1] + 1:positions[first]] = True
+    else:
+        grid[positions] = candles
+        missing[:] = True
+        missing[positions] = False
+
+    # Empty slots are few, so they are filled by index rather than over the whole grid
+    empty = np.flatnonzero(missing)
+    grid[empty, 0] = candles[0, 0] + empty * interval
+    if fill == 'ffill':
+        # The last real candle before each empty slot
+        previous = np.searchsorted(positions, empty) - 1
+        grid[empty, 1:5] = candles[previous, 4][:, None]
+    else:
+        grid[empty, 1:5] = np.nan
+    grid[empty, 5] = 0.0
+    return grid, missing
+
+
+def sanitize_frame(df, interval=None, fill='none'):
+    """
+    sanitize_array for a candle DataFrame with a timestamp column (ms).
+
+    Other columns are carried along. Returns (DataFrame, report); the input
+    comes back unchanged when it is already clean. Filled rows get
+    missing=True (only when fill is not 'none') and NaN in the extra columns.
+    """
+    if fill not in FILL_MODES:
+        raise ValueError(f"Unknown fill mode '{fill}'")
+    candles = np.column_stack([df[field].to_numpy(dtype=np.float64) for field in CANDLE_FIELDS])
+    report = {'rows_in': len(candles)}
+
+    # Track row positions through the cleaning so the other columns can follow
+    tagged = np.column_stack([candles, np.arange(len(candles))])
+    cleaned, deltas = _select_rows(tagged, report)
+    if cleaned is not tagged:
+        df = df.iloc[cleaned[:, -1].astype(np.int64)].reset_index(drop=True)
+    candles = cleaned[:, :-1]
+    _check_ohlc(candles, report)
+
+    positions = _gap_report(candles[:, 0], deltas, interval, report)
+    missing = None
+    if fill != 'none' and report['missing_bars']:
+        grid, missing = _fill_gaps(candles, positions, report['interval_ms'], fill)
+        slots = np.full(len(grid), -1)
+        slots[positions] = np.arange(len(df))
+        # Only the other columns need spreading out; the candle fields come from the grid
+        columns = list(df.columns)
+        extra = [column for column in columns if column not in CANDLE_FIELDS]
+        filled = df[extra].reset_index(drop=True).reindex(slots).reset_index(drop=True)
+        for i, field in enumerate(CANDLE_FIELDS):
+            filled[field] = grid[:, i]
+        df = filled[columns]
+        df['missing'] = missing
+    return df, _finish_report(candles if missing is None else grid, missing, report)
+
+
+def bridge_gap(previous, timestamp, interval, fill='none'):
+    """
+    The gap between two consecutive blocks of one series: previous is the
+    last candle of the earlier block (a CANDLE_FIELDS row) and timestamp
+    the first of the next. Returns (candles to insert between them, report
+    to merge_reports), filling like sanitize_array.
+    """
+    report = {'rows_in': 0, 'invalid': 0, 'out_of_order': 0, 'duplicates': 0, 'inconsistent_ohlc': 0}
+    candles = np.array([previous, [timestamp] + [np.nan] * (len(CANDLE_FIELDS) - 1)], dtype=np.float64)
+    positions = _gap_report(candles[:, 0], np.diff(candles[:, 0]), interval, report)
+    bridge = np.empty((0, len(CANDLE_FIELDS)))
+    if fill != 'none' and report['missing_bars']:
+        grid, _ = _fill_gaps(candles, positions, report['interval_ms'], fill)
+        bridge = grid[1:-1]
+    report['filled'] = report['rows_out'] = len(bridge)
+    report['first_timestamp'] = report['last_timestamp'] = None
+    return bridge, report
+
+
+# Report fields that add up over the blocks of a series
+SUMMED_FIELDS = (
+    'rows_in', 'invalid', 'out_of_order', 'duplicates', 'inconsistent_ohlc',
+    'off_grid', 'gaps', 'missing_bars', 'filled', 'rows_out'
+)
+
+
+def merge_reports(total, report):
+    """Report for a series read in blocks: total covers the blocks so far (None before the first)"""
+    if total is None:
+        return dict(report)
+    merged = dict(total)
+    for field in SUMMED_FIELDS:
+        merged[field] = total[field] + report[field]
+    merged['largest_gap_ms'] = max(total['largest_gap_ms'], report['largest_gap_ms'])
+    if merged['interval_ms'] is None:
+        merged['interval_ms'] = report['interval_ms']
+    real = merged['rows_out'] - merged['filled']
+    merged['coverage'] = real / (real + merged['missing_bars']) if real else 1.0
+    if merged['first_timestamp'] is None:
+        merged['first_timestamp'] = report['first_timestamp']
+    if report['last_timestamp'] is not None:
+        merged['last_timestamp'] = report['last_timestamp']
+    return merged
+
+
+def sanitize_candles(candles, interval=None, fill='none'):
+    """sanitize_array for a list of candle dicts; returns (candle dicts, report)"""
+    array = np.array([[c[field] for field in CANDLE_FIELDS] for c in candles], dtype=np.float64)
+    cleaned, missing, report = sanitize_array(array, interval, fill)
+    result = []
+    for i, row in enumerate(cleaned.tolist()):
+        candle = dict(zip(CANDLE_FIELDS, row))
+        candle['timestamp'] = int(candle['timestamp'])
+        if missing is not None:
+            candle['missing'] = bool(missing[i])
+        result.append(candle)
+    return result, report
+
+
+if __name__ == "__main__":
+    try:
+        # Read candles from the input file and print the cleaned candles with a quality report
+        with open(sys.argv[1], 'r') as f:
+            input_data = json.load(f)
+
+        options = input_data.get('options', {})
+        candles, report = sanitize_candles(
+            input_data['candleData'],
+            interval=options.get('intervalMs'),
+            fill=options.get('fill', 'none')
+        )
+
+        print(json.dumps({'candleData': candles, 'report': report}))
+
+    except Exception as e:
+        print(json.dumps({
+            "error": str(e),
+            "details": {
+                "message": str(e),
+                "type": type(e).__name__
+            }
+        }))
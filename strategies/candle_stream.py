@@ -0,0 +1,71 @@
+import csv
+import json
+import sys
+from itertools import chain
+
+CANDLE_FIELDS = ['timestamp', 'open', 'high', 'low', 'close', 'volume']
+
+
+def _parse_json_candle(record):
+    """Normalize a JSON candle (object or [timestamp, open, high, low, close, volume] array)"""
+    if isinstance(record, dict):
+        return record
+    return dict(zip(CANDLE_FIELDS, record))
+
+
+def _iter_lines(lines):
+    """Yield candles from JSON lines or from CSV with a header row"""
+    lines = iter(lines)
+    for first in lines:
+        if first.strip():
+            break
+    else:
+        return
+
+    if first.lstrip().startswith(('{', '[')):
+        yield _parse_json_candle(json.loads(first))
+        for line in lines:
+            if line.strip():
+                yield _parse_json_candle(json.loads(line))
+        return
+
+    reader = csv.DictReader(chain([first], lines))
+    for row in reader:
+        yield {key: float(value) for key, value in row.items() if key in CANDLE_FIELDS}
+
+
+def iter_candles(source):
+    """
+    Iterate over candles one at a time from a file path ('-' for stdin), an open
+    text file or any iterable of candle dicts. Files hold one JSON candle per line
+    or CSV with a header naming the OHLCV columns.
+    """
+    if isinstance(source, str):
+        if source == '-':
+            yield from _iter_lines(sys.stdin)
+            return
+        with open(source, 'r') as f:
+            yield from _iter_lines(f)
+        return
+
+    if hasattr(source, 'readline'):
+        yield from _iter_lines(source)
+        return
+
+    for candle in source:
+        yield _parse_json_candle(candle)
+
+
+def iter_candle_blocks(source, block_size=5000):
+    """Group candles from any supported source into lists of at most block_size"""
+    if block_size < 1:
+        raise ValueError('block_size must be at least 1')
+
+    block = []
+    for candle in iter_candles(source):
+        block.append(candle)
+        if len(block) >= block_size:
+            yield block
+            block = []
+    if block:
+        yield block
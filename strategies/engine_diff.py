@@ -0,0 +1,272 @@
+import numpy as np
+import pandas as pd
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+from candle_stream import iter_candles
+from scalping_strategy import ScalpingStrategy
+from synthetic_data import synthetic_candles
+
+BRIDGE_SCRIPT = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'scalping_engine_bridge.js')
+
+# Spell out every setting so differing defaults between the engines don't skew the diff
+DEFAULT_CONFIG = {
+    'timeframe': '1m',
+    'profitTarget': '0.5',
+    'stopLoss': '0.3',
+    'useRSI': True,
+    'rsiPeriod': '14',
+    'rsiOverbought': '70',
+    'rsiOversold': '30',
+    'useMACD': True,
+    'macdFastPeriod': '12',
+    'macdSlowPeriod': '26',
+    'macdSignalPeriod': '9',
+    'useBollingerBands': True,
+    'bbPeriod': '20',
+    'bbDeviation': '2',
+    'useEMA': True,
+    'fastEMA': '9',
+    'slowEMA': '21',
+    'useATR': True,
+    'atrPeriod': '14',
+    'useVolume': False,
+    'minimumVolume': '0'
+}
+
+DEFAULT_SIZES = [200, 1000, 5000, 20000]
+
+# JS indicator arrays (aligned to the last candle) -> Python indicator columns
+JS_INDICATOR_COLUMNS = {
+    'rsi': [('rsi', None)],
+    'fastEma': [('ema_fast', None)],
+    'slowEma': [('ema_slow', None)],
+    'atr': [('atr', None)],
+    'macd': [('macd', 'MACD'), ('macd_signal', 'signal'), ('macd_hist', 'histogram')],
+    'bollingerBands': [('bb_upper', 'upper'), ('bb_middle', 'middle'), ('bb_lower', 'lower')],
+    'stochRsi': [('stoch_rsi_k', 'k'), ('stoch_rsi_d', 'd')]
+}
+
+
+def load_candles(path):
+    """Read recorded candles from a JSON array, a {candleData: [...]} file, JSON lines or CSV"""
+    with open(path, 'r') as f:
+        text = f.read()
+    try:
+        data = json.loads(text)
+    except json.JSONDecodeError:
+        return list(iter_candles(path))
+    if isinstance(data, dict):
+        data = data['candleData']
+    return data
+
+
+def run_python(config, candles, repeats=1):
+    """Run the Python engine in-process; returns (result, timings in ms)"""
+    timings = []
+    result = None
+    for _ in range(max(1, repeats)):
+        strategy = ScalpingStrategy(config)
+        start = time.perf_counter()
+        result = strategy.analyze(candles)
+        timings.append((time.perf_counter() - start) * 1000)
+    return result, timings
+
+
+def run_js(config, candles, repeats=1, node='node'):
+    """Run the JS engine through the Node bridge; returns (result, timings in ms)"""
+    payload = json.dumps({'config': config, 'candleData': candles, 'repeats': repeats})
+    completed = subprocess.run(
+        [node, BRIDGE_SCRIPT],
+        input=payload,
+        capture_output=True,
+        text=True,
+        cwd=os.path.dirname(BRIDGE_SCRIPT)
+    )
+    try:
+        output = json.loads(completed.stdout)
+    except json.JSONDecodeError:
+        raise RuntimeError(f'JS engine failed: {completed.stderr.strip() or completed.stdout[:200]}')
+    if 'error' in output:
+        raise RuntimeError(f"JS engine failed: {output['error']}")
+    return output['result'], output['timingsMs']
+
+
+def python_indicator_frame(result):
+    """Indicator columns of a Python analyze() result as a DataFrame in candle order"""
+    return pd.DataFrame.from_dict(result.get('indicators', {}), orient='index').sort_index()
+
+
+def js_indicator_columns(indicators, count):
+    """Right-align the JS indicator arrays to the candles, padding the warm-up with NaN"""
+    columns = {}
+    for name, mapping in JS_INDICATOR_COLUMNS.items():
+        values = indicators.get(name)
+        if not values:
+            continue
+        for column, field in mapping:
+            series = [
+                (entry.get(field) if field else entry) if entry is not None else None
+                for entry in values
+            ]
+            aligned = np.full(count, np.nan)
+            aligned[count - len(series):] = np.array(series, dtype=float)
+            columns[column] = aligned
+    return columns
+
+
+def diff_indicators(py_frame, js_columns, warmup=100, rtol=1e-6, atol=1e-8):
+    """Per-column comparison after skipping `warmup` candles of seeding differences"""
+    report = {}
+    for column, js_values in js_columns.items():
+        if column not in py_frame.columns:
+            report[column] = {'status': 'missing in python'}
+            continue
+        py_values = py_frame[column].to_numpy(dtype=float)[warmup:]
+        js_values = js_values[warmup:]
+        both = np.isfinite(py_values) & np.isfinite(js_values)
+        abs_diff = np.abs(py_values[both] - js_values[both])
+        rel_diff = abs_diff / np.maximum(np.abs(js_values[both]), atol)
+        mismatches = int(np.count_nonzero(abs_diff > atol + rtol * np.abs(js_values[both])))
+        report[column] = {
+            'status': 'match' if mismatches == 0 else 'mismatch',
+            'compared': int(both.sum()),
+            'mismatches': mismatches,
+            'max_abs_diff': float(abs_diff.max()) if abs_diff.size else 0.0,
+            'max_rel_diff': float(rel_diff.max()) if rel_diff.size else 0.0
+        }
+    return report
+
+
+def diff_signals(py_signals, js_signals, rtol=1e-6):
+    """Match signals by candle index and compare direction and price levels"""
+    py_by_index = {int(s['candle_index']): s for s in py_signals}
+    js_by_index = {int(s['candle_index']): s for s in js_signals}
+    common = sorted(set(py_by_index) & set(js_by_index))
+
+    type_conflicts = [i for i in common if py_by_index[i]['type'] != js_by_index[i]['type']]
+    price_mismatches = [
+        i for i in common
+        if i not in type_conflicts and not all(
+            np.isclose(py_by_index[i][key], js_by_index[i][key], rtol=rtol)
+            for key in ('entry_price', 'tp', 'sl')
+        )
+    ]
+
+    return {
+        'python': len(py_signals),
+        'js': len(js_signals),
+        'matched': len(common) - len(type_conflicts) - len(price_mismatches),
+        'type_conflicts': type_conflicts,
+        'price_mismatches': price_mismatches,
+        'python_only': sorted(set(py_by_index) - set(js_by_index)),
+        'js_only': sorted(set(js_by_index) - set(py_by_index))
+    }
+
+
+def compare_dataset(name, candles, config, repeats=3, warmup=100, node='node'):
+    """Run both engines on one candle set and diff their indicators, signals and timings"""
+    py_result, py_timings = run_python(config, candles, repeats)
+    js_result, js_timings = run_js(config, candles, repeats, node)
+
+    entry = {
+        'dataset': name,
+        'candles': len(candles),
+        'python_ms': statistics.median(py_timings),
+        'js_ms': statistics.median(js_timings)
+    }
+    entry['faster'] = 'python' if entry['python_ms'] < entry['js_ms'] else 'js'
+    entry['speedup'] = max(entry['python_ms'], entry['js_ms']) / max(min(entry['python_ms'], entry['js_ms']), 1e-9)
+
+    if not py_result.get('success') or not js_result.get('success'):
+        entry['error'] = {'python': py_result.get('message'), 'js': js_result.get('message')}
+        entry['agree'] = False
+        return entry
+
+    entry['indicators'] = diff_indicators(
+        python_indicator_frame(py_result),
+        js_indicator_columns(js_result.get('indicators', {}), len(candles)),
+        warmup
+    )
+    entry['signals'] = diff_signals(py_result['signals'], js_result['signals'])
+    entry['agree'] = (
+        all(column['status'] == 'match' for column in entry['indicators'].values())
+        and entry['signals']['matched'] == entry['signals']['python'] == entry['signals']['js']
+    )
+    return entry
+
+
+def run_harness(config=None, sizes=DEFAULT_SIZES, recorded=None, repeats=3, seed=0, warmup=100, node='node'):
+    """Compare the engines on synthetic candle sets of each size plus any recorded files"""
+    config = dict(DEFAULT_CONFIG if config is None else config)
+    datasets = [(f'synthetic-{size}', synthetic_candles(size, seed)) for size in sizes]
+    for path in recorded or []:
+        datasets.append((os.path.basename(path), load_candles(path)))
+
+    results = [compare_dataset(name, candles, config, repeats, warmup, node) for name, candles in datasets]
+    return {
+        'config': config,
+        'repeats': repeats,
+        'warmup': warmup,
+        'results': results,
+        'all_agree': all(entry['agree'] for entry in results)
+    }
+
+
+def format_report(report):
+    """Human-readable summary table of a harness report"""
+    lines = [f"{'dataset':<24}{'candles':>9}{'python ms':>12}{'js ms':>12}  {'faster':<8}{'agree':<6}"]
+    for entry in report['results']:
+        lines.append(
+            f"{entry['dataset']:<24}{entry['candles']:>9}{entry['python_ms']:>12.1f}"
+            f"{entry['js_ms']:>12.1f}  {entry['faster']:<8}{str(entry['agree']):<6}"
+        )
+        for column, diff in entry.get('indicators', {}).items():
+            if diff['status'] != 'match':
+                lines.append(f"    {column}: {diff['status']} {diff.get('mismatches', '')} (max rel {diff.get('max_rel_diff', 0):.3g})")
+        signals = entry.get('signals')
+        if signals:
+            lines.append(
+                f"    signals: python={signals['python']} js={signals['js']} matched={signals['matched']} "
+                f"python_only={len(signals['python_only'])} js_only={len(signals['js_only'])}"
+            )
+    return '\n'.join(lines)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Diff the Python and JS scalping engines')
+    parser.add_argument('--sizes', default=','.join(str(s) for s in DEFAULT_SIZES))
+    parser.add_argument('--config', help='JSON file with the strategy configuration')
+    parser.add_argument('--candles', action='append', default=[], help='recorded candle file (repeatable)')
+    parser.add_argument('--repeats', type=int, default=3)
+    parser.add_argument('--warmup', type=int, default=100)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--node', default='node')
+    parser.add_argument('--report', help='write the full JSON report to this file')
+    args = parser.parse_args()
+
+    config = None
+    if args.config:
+        with open(args.config, 'r') as f:
+            config = json.load(f)
+
+    report = run_harness(
+        config,
+        [int(size) for size in args.sizes.split(',') if size],
+        args.candles,
+        args.repeats,
+        args.seed,
+        args.warmup,
+        args.node
+    )
+
+    if args.report:
+        with open(args.report, 'w') as f:
+            json.dump(report, f, indent=2)
+    print(format_report(report))
+    sys.exit(0 if report['all_agree'] else 1)
@@ -0,0 +1,468 @@
+import numpy as np
+import argparse
+import json
+import math
+import os
+import platform
+import tempfile
+import threading
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+
+from btc_strategy import BTCStrategy
+from candle_sanitizer import sanitize_candles
+from result_cache import ResultCache, code_version
+from scalping_strategy import ScalpingStrategy
+from synthetic_data import synthetic_candles
+
+MODES = ('incremental', 'vectorized', 'parallel')
+
+DEFAULT_BENCHMARK_PATH = os.path.join(tempfile.gettempdir(), 'profitcraft_planner.json')
+
+# Candles before each BTCStrategy chunk so its longest rolling window (30) and
+# the previous candle's price change are complete at the first scanned row
+BTC_WARMUP = 64
+
+CHUNK_SIZES = (250, 500, 1000, 2000, 5000, 10000, 20000, 50000)
+
+# Calibration runs: candle counts for the linear cost fit, timed repetitions
+CALIBRATION_SIZES = (250, 1250)
+CALIBRATION_REPEATS = 3
+
+# Weight of each observed run in the per-mode correction of the predictions
+CORRECTION_WEIGHT = 0.2
+
+
+def available_cores():
+    """CPUs this process may run on (the affinity mask, not the machine total)"""
+    if hasattr(os, 'sched_getaffinity'):
+        return len(os.sched_getaffinity(0))
+    return os.cpu_count() or 1
+
+
+def _benchmark_key():
+    """Stored benchmarks only apply to the same code, interpreter and CPU allowance"""
+    return {
+        'btc': code_version('btc'),
+        'scalping': code_version('scalping'),
+        'python': platform.python_version(),
+        'cores': available_cores()
+    }
+
+
+def _indicator_config(enabled):
+    """ScalpingStrategy config with every optional indicator on or off"""
+    return {
+        'useRSI': enabled, 'useStochRSI': enabled, 'useMACD': enabled, 'useMACDHistogram': enabled,
+        'useBollingerBands': enabled, 'useEMA': enabled, 'useVWAP': enabled, 'useSupertrend': enabled,
+        'useATR': enabled, 'useChoppinessIndex': enabled, 'useParabolicSAR': enabled,
+        'useDonchianChannel': enabled, 'usePivotPoints': enabled, 'useHeikinAshi': enabled,
+        'useVolume': enabled
+    }
+
+
+def enabled_indicators(config):
+    """Number of ScalpingStrategy indicators a config turns on"""
+    return sum(1 for indicator in ScalpingStrategy(config).indicators.values() if indicator['enabled'])
+
+
+def _best_time_ms(function, repeats=CALIBRATION_REPEATS):
+    best = math.inf
+    for _ in range(repeats):
+        start = time.perf_counter()
+        function()
+        best = min(best, (time.perf_counter() - start) * 1000)
+    return best
+
+
+def _linear_fit(function, sizes=CALIBRATION_SIZES):
+    """(fixed ms, ms per candle) of function(candles) from timings at two sizes"""
+    small, large = sizes
+    candles = synthetic_candles(large, seed=7)
+    small_ms = _best_time_ms(lambda: function(candles[:small]))
+    large_ms = _best_time_ms(lambda: function(candles))
+    per_candle = max((large_ms - small_ms) / (large - small), 1e-6)
+    return max(small_ms - per_candle * small, 0.0), per_candle
+
+
+def _btc_chunk(candles, cursor):
+    """Worker task: signals of one warmed-up chunk after cursor"""
+    return BTCStrategy(candles).calculate(cursor)
+
+
+def calibrate(cores=None):
+    """
+    Time both engines and the process pool on synthetic candles.
+
+    Returns the benchmark dict ExecutionPlanner predicts from: per engine a
+    fixed and a per-candle cost of a full run and of an incremental call,
+    plus the cost of starting a worker and of a task round trip. Takes a few
+    seconds; store the result with ExecutionPlanner.save().
+    """
+    cores = cores or available_cores()
+    engines = {}
+
+    fixed, per_candle = _linear_fit(lambda candles: BTCStrategy(candles).calculate())
+    incremental = _best_time_ms(lambda: BTCStrategy(synthetic_candles(BTC_WARMUP + 1)).calculate())
+    engines['btc'] = {
+        'fixed_ms': fixed, 'per_candle_ms': per_candle, 'per_indicator_ms': 0.0,
+        'incremental_fixed_ms': incremental, 'incremental_per_candle_ms': per_candle
+    }
+
+    # Indicator cost scales with the number enabled; fit it from all-off and all-on runs
+    bare, full = _indicator_config(False), _indicator_config(True)
+    fixed, per_candle = _linear_fit(lambda candles: ScalpingStrategy(bare).analyze(candles))
+    full_fixed, full_per_candle = _linear_fit(lambda candles: ScalpingStrategy(full).analyze(candles))
+    indicators = enabled_indicators(full) - enabled_indicators(bare)
+
+    history = synthetic_candles(1000, seed=11)
+    strategy = ScalpingStrategy(full)
+    strategy.update(history[:-10])
+    step = iter(history[-10:])
+    incremental = _best_time_ms(lambda: strategy.update([next(step)]), repeats=10)
+    engines['scalping'] = {
+        'fixed_ms': min(fixed, full_fixed),
+        'per_candle_ms': per_candle,
+        'per_indicator_ms': max(full_per_candle - per_candle, 0.0) / max(indicators, 1),
+        'incremental_fixed_ms': incremental,
+        'incremental_per_candle_ms': full_per_candle
+    }
+
+    if cores < 2:
+        # Nothing can run in parallel, so the pool is never planned for
+        return {'key': _benchmark_key(), 'calibrated_at': time.time(), 'engines': engines, 'pool': None}
+
+    # A fresh pool's first task pays for starting the worker; later ones only the round trip
+    candles = synthetic_candles(1000, seed=13)
+    local_ms = _best_time_ms(lambda: _btc_chunk(candles, None))
+    start = time.perf_counter()
+    with ProcessPoolExecutor(max_workers=1) as executor:
+        executor.submit(_btc_chunk, candles, None).result()
+        first_ms = (time.perf_counter() - start) * 1000
+        task_ms = _best_time_ms(lambda: executor.submit(_btc_chunk, candles, None).result())
+    pool = {
+        'worker_start_ms': max(first_ms - task_ms, 0.0),
+        'task_ms': max(task_ms - local_ms, 0.0) / 2,
+        'transfer_per_candle_ms': max(task_ms - local_ms, 0.0) / 2 / len(candles)
+    }
+
+    return {'key': _benchmark_key(), 'calibrated_at': time.time(), 'engines': engines, 'pool': pool}
+
+
+class ExecutionPlanner:
+    """
+    Pick how to run a strategy call from measured costs instead of fixed chunk sizes.
+
+    'incremental' continues from state the caller already has (a cursor, or
+    a live ScalpingStrategy), 'vectorized' is one in-process run over all
+    candles, and 'parallel' splits a BTCStrategy run into warmed-up chunks
+    across worker processes. Each mode's time is predicted from the
+    calibration (passed in, or loaded from benchmark_path when it matches
+    this code and machine) and the cheapest is used. Calibrating takes
+    seconds, so it is never done here: run `execution_planner.py calibrate`
+    once per deployment. Without a calibration every call runs in process
+    (incremental with a cursor, else vectorized). Every executed plan is
+    recorded in metrics, and the observed/predicted ratio of each mode
+    corrects its later predictions in this planner; save() persists them.
+
+    ScalpingStrategy runs are never split: its recursive indicators and
+    position simulation carry state across the whole history, so chunks
+    would change the results.
+    """
+
+    def __init__(self, benchmark_path=DEFAULT_BENCHMARK_PATH, calibration=None, cores=None, max_workers=None):
+        self.benchmark_path = benchmark_path
+        self.cores = cores or available_cores()
+        self.max_workers = max_workers or self.cores
+        self.lock = threading.Lock()
+        self.calibration = calibration or self._load()
+        self.corrections = dict(self.calibration.get('corrections', {})) if self.calibration else {}
+        self.metrics = {'plans': {}, 'recent': deque(maxlen=200)}
+        self._executor = None
+        self._executor_workers = 0
+
+    def _load(self):
+        if not self.benchmark_path:
+            return None
+        try:
+            with open(self.benchmark_path, 'r') as f:
+                calibration = json.load(f)
+        except (OSError, ValueError):
+            return None
+        return calibration if calibration.get('key') == _benchmark_key() else None
+
+    def recalibrate(self):
+        """Measure afresh and store the result"""
+        self.calibration = calibrate(self.cores)
+        self.corrections = {}
+        self.save()
+        return self.calibration
+
+    def save(self):
+        """Write the calibration and the learned corrections to benchmark_path"""
+        if not self.benchmark_path or self.calibration is None:
+            return
+        stored = dict(self.calibration, corrections=self.corrections)
+        fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(os.path.abspath(self.benchmark_path)), suffix='.tmp')
+        with os.fdopen(fd, 'w') as f:
+            json.dump(stored, f, indent=2)
+        os.replace(tmp_path, self.benchmark_path)
+
+    def _correction(self, engine, mode):
+        return self.corrections.get(f'{engine}:{mode}', 1.0)
+
+    def _run_ms(self, engine, candles, indicators):
+        cost = self.calibration['engines'][engine]
+        return cost['fixed_ms'] + candles * (cost['per_candle_ms'] + indicators * cost['per_indicator_ms'])
+
+    def _parallel_ms(self, candles, chunk_size, workers):
+        """Predicted wall time of a BTCStrategy run split into chunk_size chunks over workers"""
+        cost = self.calibration['engines']['btc']
+        pool = self.calibration['pool']
+        chunks = math.ceil(candles / chunk_size)
+        workers = min(workers, chunks)
+        rows = chunk_size + BTC_WARMUP
+        task = (pool['task_ms'] + cost['fixed_ms']
+                + rows * (cost['per_candle_ms'] + pool['transfer_per_candle_ms']))
+        start = pool['worker_start_ms'] * max(workers - self._executor_workers, 0)
+        return start + math.ceil(chunks / workers) * task
+
+    def plan(self, engine, candles, config=None, new_candles=None):
+        """
+        Execution plan for running engine ('btc' or 'scalping') over `candles` candles.
+
+        new_candles is the number of candles after the caller's cursor (None
+        without one); only then is an incremental run possible. Returns a
+        dict with mode, chunk_size, workers and the predicted time of each
+        candidate (None and {} without a calibration).
+        """
+        if engine not in ('btc', 'scalping'):
+            raise ValueError(f"Unknown engine '{engine}'")
+        indicators = enabled_indicators(config or {}) if engine == 'scalping' else 0
+        if self.calibration is None:
+            return {
+                'engine': engine,
+                'mode': 'vectorized' if new_candles is None else 'incremental',
+                'candles': candles,
+                'new_candles': new_candles,
+                'indicators': indicators,
+                'chunk_size': None,
+                'workers': 1,
+                'predicted_ms': None,
+                'candidates_ms': {}
+            }
+        cost = self.calibration['engines'][engine]
+        candidates = {}
+
+        if new_candles is not None:
+            candidates['incremental'] = (
+                cost['incremental_fixed_ms'] + new_candles * cost['incremental_per_candle_ms'],
+                None, 1
+            )
+
+        # A live ScalpingStrategy decides itself between a delta and a full
+        # rerun, so with a cursor there is nothing else to choose
+        if engine == 'btc' or new_candles is None:
+            candidates['vectorized'] = (self._run_ms(engine, candles, indicators), None, 1)
+
+        scanned = candles if new_candles is None else new_candles
+        workers_limit = min(self.max_workers, self.cores)
+        if engine == 'btc' and workers_limit > 1 and self.calibration['pool']:
+            for chunk_size in CHUNK_SIZES:
+                if chunk_size * 2 > scanned:
+                    break
+                for workers in range(2, min(workers_limit, math.ceil(scanned / chunk_size)) + 1):
+                    predicted = self._parallel_ms(scanned, chunk_size, workers)
+                    if 'parallel' not in candidates or predicted < candidates['parallel'][0]:
+                        candidates['parallel'] = (predicted, chunk_size, workers)
+
+        predictions = {
+            mode: predicted * self._correction(engine, mode)
+            for mode, (predicted, _, _) in candidates.items()
+        }
+        mode = min(predictions, key=predictions.get)
+        _, chunk_size, workers = candidates[mode]
+        return {
+            'engine': engine,
+            'mode': mode,
+            'candles': candles,
+            'new_candles': new_candles,
+            'indicators': indicators,
+            'chunk_size': chunk_size,
+            'workers': workers,
+            'predicted_ms': predictions[mode],
+            'candidates_ms': predictions
+        }
+
+    def record(self, plan, elapsed_ms):
+        """Log an executed plan and fold its observed cost into the mode's correction"""
+        key = f"{plan['engine']}:{plan['mode']}"
+        with self.lock:
+            self.metrics['plans'][key] = self.metrics['plans'].get(key, 0) + 1
+            self.metrics['recent'].append({
+                'engine': plan['engine'],
+                'mode': plan['mode'],
+                'candles': plan['candles'],
+                'chunk_size': plan['chunk_size'],
+                'workers': plan['workers'],
+                'predicted_ms': plan['predicted_ms'],
+                'elapsed_ms': elapsed_ms
+            })
+            if plan['predicted_ms'] is None:
+                return
+            predicted = plan['predicted_ms'] / self._correction(plan['engine'], plan['mode'])
+            if predicted > 0:
+                ratio = elapsed_ms / predicted
+                self.corrections[key] = (
+                    (1 - CORRECTION_WEIGHT) * self._correction(plan['engine'], plan['mode'])
+                    + CORRECTION_WEIGHT * ratio
+                )
+
+    def stats(self):
+        """Decision counts per engine:mode and how far predictions were off"""
+        with self.lock:
+            recent = list(self.metrics['recent'])
+            errors = [r['elapsed_ms'] / r['predicted_ms'] for r in recent if r['predicted_ms']]
+            return {
+                'cores': self.cores,
+                'plans': dict(self.metrics['plans']),
+                'corrections': dict(self.corrections),
+                'recent': recent[-20:],
+                'observed_over_predicted': {
+                    'median': float(np.median(errors)),
+                    'max': float(np.max(errors))
+                } if errors else {}
+            }
+
+    def _pool(self, workers):
+        """Worker pool kept between calls, grown when a plan needs more workers"""
+        if self._executor is None or self._executor_workers < workers:
+            if self._executor is not None:
+                self._executor.shutdown()
+            self._executor = ProcessPoolExecutor(max_workers=workers)
+            self._executor_workers = workers
+        return self._executor
+
+    def close(self):
+        if self._executor is not None:
+            self._executor.shutdown()
+            self._executor = None
+            self._executor_workers = 0
+
+    def _run_btc(self, plan, candle_data, cursor):
+        if plan['mode'] == 'vectorized':
+            return BTCStrategy(candle_data).calculate(cursor)
+
+        # Windows and chunks are cut by position, so they need time-ordered, unique candles
+        candles = candle_data
+        timestamps = np.array([float(c['timestamp']) for c in candles])
+        if not np.all(np.diff(timestamps) > 0):
+            candles, _ = sanitize_candles(candle_data)
+            timestamps = np.array([float(c['timestamp']) for c in candles])
+        first = 0 if cursor is None else int(np.searchsorted(timestamps, float(cursor), side='right'))
+
+        if plan['mode'] == 'incremental':
+            return BTCStrategy(candles[max(first - BTC_WARMUP, 0):]).calculate(cursor)
+
+        chunk_size = plan['chunk_size']
+        tasks = []
+        for start in range(first, len(candles), chunk_size):
+            chunk_cursor = cursor if start == first else candles[start - 1]['timestamp']
+            tasks.append((candles[max(start - BTC_WARMUP, 0):start + chunk_size], chunk_cursor))
+        executor = self._pool(plan['workers'])
+        futures = [executor.submit(_btc_chunk, chunk, chunk_cursor) for chunk, chunk_cursor in tasks]
+        return [signal for future in futures for signal in future.result()]
+
+    def run(self, engine, candle_data, config=None, cursor=None, strategy=None, cache=None):
+        """
+        Plan and execute one call; returns (result, plan).
+
+        For 'btc' the result is BTCStrategy.calculate's signal list (only
+        signals after cursor when one is given). For 'scalping' it is
+        ScalpingStrategy.analyze's response; an incremental run needs the
+        live strategy instance whose previous response produced cursor.
+
+        With a ResultCache, 'btc' results are looked up under the same key as
+        ResultCache.calculate_btc and stored after a run; a hit is returned
+        with mode 'cached'. Scalping responses carry per-candle indicators,
+        which the cache does not keep, so they always run.
+        """
+        new_candles = None
+        if cursor is not None and (engine == 'btc' or strategy is not None):
+            new_candles = sum(1 for c in candle_data if float(c['timestamp']) > float(cursor))
+        if strategy is not None:
+            config = strategy.config
+
+        plan = self.plan(engine, len(candle_data), config, new_candles)
+        start = time.perf_counter()
+        key = None
+        if cache is not None and engine == 'btc':
+            key = cache.key('btc', candle_data, {'cursor': cursor})
+            cached = cache.get(key)
+            if cached is not None:
+                plan.update(mode='cached', chunk_size=None, workers=0, elapsed_ms=(time.perf_counter() - start) * 1000)
+                return cached['signals'], plan
+
+        if engine == 'btc':
+            result = self._run_btc(plan, candle_data, cursor)
+        else:
+            result = (strategy or ScalpingStrategy(config)).analyze(candle_data, cursor=cursor)
+        plan['elapsed_ms'] = (time.perf_counter() - start) * 1000
+        self.record(plan, plan['elapsed_ms'])
+        if key is not None:
+            cache.put(key, {'signals': result})
+        return result, plan
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Calibrate the execution planner, show its plans or run a strategy through it')
+    parser.add_argument('command', choices=['calibrate', 'plan', 'run'])
+    parser.add_argument('input', nargs='?', help="run: JSON file with candleData and optional engine, config, cursor")
+    parser.add_argument('--engine', default='btc', choices=['btc', 'scalping'])
+    parser.add_argument('--candles', default='100,1000,10000,100000', help='plan: comma-separated candle counts')
+    parser.add_argument('--benchmarks', default=DEFAULT_BENCHMARK_PATH, help='stored calibration file')
+    parser.add_argument('--workers', type=int, help='upper bound on worker processes')
+    args = parser.parse_args()
+
+    try:
+        if args.command == 'calibrate':
+            planner = ExecutionPlanner(args.benchmarks, calibration=calibrate(), max_workers=args.workers)
+            planner.save()
+            print(json.dumps(planner.calibration, indent=2))
+
+        elif args.command == 'plan':
+            planner = ExecutionPlanner(args.benchmarks, max_workers=args.workers)
+            print(json.dumps([
+                planner.plan(args.engine, int(count)) for count in args.candles.split(',') if count
+            ], indent=2))
+
+        else:
+            # Same contract as btc_strategy.py: read the input file, print JSON
+            with open(args.input, 'r') as f:
+                input_data = json.load(f)
+            planner = ExecutionPlanner(args.benchmarks, max_workers=args.workers)
+            engine = input_data.get('engine', args.engine)
+            cursor = input_data.get('cursor')
+            # Same result cache as btc_strategy.py when one is configured
+            cache_dir = os.environ.get('STRATEGY_RESULT_CACHE')
+            cache = ResultCache(cache_dir) if cache_dir else None
+            result, plan = planner.run(engine, input_data['candleData'], input_data.get('config'), cursor, cache=cache)
+            # One run is too little evidence to rewrite the shared calibration, so corrections are not saved
+            planner.close()
+
+            output = {'signals': result, 'plan': plan} if engine == 'btc' else dict(result, plan=plan)
+            if engine == 'btc':
+                # The next request's cursor: the newest candle this one covered
+                candle_data = input_data['candleData']
+                output['cursor'] = int(max(float(c['timestamp']) for c in candle_data)) if candle_data else cursor
+            print(json.dumps(output))
+
+    except Exception as e:
+        print(json.dumps({
+            "error": str(e),
+            "details": {
+                "message": str(e),
+                "type": type(e).__name__
+            }
+        }))
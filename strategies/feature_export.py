@@ -0,0 +1,270 @@
+import numpy as np
+import pandas as pd
+import argparse
+import json
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from numpy.lib.stride_tricks import sliding_window_view
+
+from candle_stream import CANDLE_FIELDS, iter_candle_blocks
+from scalping_strategy import ScalpingStrategy
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:  # Parquet output is optional; npz parts are written instead
+    pa = None
+    pq = None
+
+DEFAULT_HORIZONS = (1, 5, 15, 60)
+
+# Candles scanned for the take profit / stop loss label
+DEFAULT_LABEL_WINDOW = 60
+
+DEFAULT_BLOCK_SIZE = 50_000
+
+
+def iter_array_blocks(source, block_size=DEFAULT_BLOCK_SIZE):
+    """
+    Candles from a source as (n x 6) arrays of at most block_size rows.
+
+    Accepts an array, a KlineLoader cache file (.npz), a CSV file (read in
+    chunks) or anything iter_candles() understands.
+    """
+    if isinstance(source, np.ndarray):
+        for i in range(0, len(source), block_size):
+            yield source[i:i + block_size]
+        return
+
+    if isinstance(source, str) and source.endswith('.npz'):
+        with np.load(source) as cached:
+            yield from iter_array_blocks(cached['candles'], block_size)
+        return
+
+    if isinstance(source, str) and source.endswith('.csv'):
+        for chunk in pd.read_csv(source, chunksize=block_size):
+            yield chunk[CANDLE_FIELDS].to_numpy(dtype=float)
+        return
+
+    for block in iter_candle_blocks(source, block_size):
+        yield np.array([[float(c[field]) for field in CANDLE_FIELDS] for c in block])
+
+
+def compute_labels(close, high, low, rows, horizons=DEFAULT_HORIZONS, label_window=DEFAULT_LABEL_WINDOW,
+                   profit_target=0.5, stop_loss=0.3):
+    """
+    Forward-looking labels for the first `rows` candles of close/high/low.
+
+    Candles after `rows` only serve as look-ahead. fwd_return_{h} is the
+    percent change of the close h candles later. tp_sl_long/tp_sl_short are 1
+    when the take profit (profit_target percent from the close) is reached
+    within label_window candles, -1 when the stop loss is reached first (or
+    in the same candle) and 0 when neither is. Labels needing candles past
+    the end of the arrays are NaN.
+    """
+    n = len(close)
+    labels = {}
+    for h in horizons:
+        forward = np.full(rows, np.nan)
+        available = max(0, min(rows, n - h))
+        forward[:available] = (close[h:h + available] / close[:available] - 1) * 100
+        labels[f'fwd_return_{h}'] = forward
+
+    # Pad so every row has a full window; NaN never compares as a hit
+    pad = np.full(label_window, np.nan)
+    ahead_high = sliding_window_view(np.concatenate([high[1:], pad]), label_window)[:rows]
+    ahead_low = sliding_window_view(np.concatenate([low[1:], pad]), label_window)[:rows]
+    complete = np.arange(rows) + label_window < n
+    entry = close[:rows, None]
+
+    for name, target_hit, stop_hit in (
+        ('tp_sl_long', ahead_high >= entry * (1 + profit_target / 100), ahead_low <= entry * (1 - stop_loss / 100)),
+        ('tp_sl_short', ahead_low <= entry * (1 - profit_target / 100), ahead_high >= entry * (1 + stop_loss / 100))
+    ):
+        first_target = np.where(target_hit.any(axis=1), target_hit.argmax(axis=1), label_window)
+        first_stop = np.where(stop_hit.any(axis=1), stop_hit.argmax(axis=1), label_window)
+        label = np.where(first_stop <= first_target, -1.0, 1.0)
+        label[(first_target == label_window) & (first_stop == label_window)] = 0.0
+        label[~complete & (label == 0)] = np.nan
+        labels[name] = label
+    return labels
+
+
+class ParquetSink:
+    """Append blocks as row groups of one Parquet file"""
+
+    def __init__(self, path, compression='zstd'):
+        self.path = path + '.parquet'
+        self.compression = compression
+        self.writer = None
+
+    def write(self, columns):
+        table = pa.table(columns)
+        if self.writer is None:
+            self.writer = pq.ParquetWriter(self.path, table.schema, compression=self.compression)
+        self.writer.write_table(table)
+
+    def close(self):
+        if self.writer is not None:
+            self.writer.close()
+        return [self.path] if self.writer is not None else []
+
+
+class NpzSink:
+    """Write each block as its own compressed .npz part file"""
+
+    def __init__(self, path):
+        self.path = path
+        self.paths = []
+
+    def write(self, columns):
+        path = f'{self.path}-{len(self.paths):05d}.npz'
+        np.savez_compressed(path, **columns)
+        self.paths.append(path)
+
+    def close(self):
+        return self.paths
+
+
+class FeatureExporter:
+    """
+    Export ScalpingStrategy indicator columns plus outcome labels, block by block.
+
+    Indicators come from ScalpingStrategy.iter_indicator_blocks; the last
+    max(horizons, label_window) rows of each block are held back until the
+    next block supplies their look-ahead. Memory is bounded by block_size
+    whatever the length of the history.
+    """
+
+    def __init__(self, config=None, columns=None, horizons=DEFAULT_HORIZONS, label_window=DEFAULT_LABEL_WINDOW,
+                 block_size=DEFAULT_BLOCK_SIZE, fmt='auto', dtype='float32'):
+        self.config = dict(config or {})
+        self.columns = list(columns) if columns else None
+        self.horizons = tuple(int(h) for h in horizons)
+        self.label_window = int(label_window)
+        self.lookahead = max(self.horizons + (self.label_window,))
+        self.block_size = int(block_size)
+        if fmt == 'auto':
+            fmt = 'parquet' if pa is not None else 'npz'
+        if fmt == 'parquet' and pa is None:
+            raise ValueError('Parquet output needs pyarrow; install it or use fmt="npz"')
+        self.fmt = fmt
+        self.dtype = np.dtype(dtype)
+
+    def _sink(self, path):
+        return ParquetSink(path) if self.fmt == 'parquet' else NpzSink(path)
+
+    def _feature_columns(self, frame):
+        if self.columns is not None:
+            missing = [column for column in self.columns if column not in frame.columns]
+            if missing:
+                raise ValueError(f'Indicator columns not produced by this configuration: {missing}')
+            return self.columns
+        return [column for column in frame.columns if column not in CANDLE_FIELDS]
+
+    def _write(self, sink, timestamps, prices, features, names, strategy, rows):
+        """Label the first `rows` buffered candles and hand them to the sink"""
+        close, high, low = prices[:, 3], prices[:, 1], prices[:, 2]
+        columns = {'timestamp': timestamps[:rows]}
+        for i, field in enumerate(CANDLE_FIELDS[1:]):
+            columns[field] = prices[:rows, i]
+        for i, name in enumerate(names):
+            columns[name] = features[:rows, i].astype(self.dtype)
+        labels = compute_labels(
+            close, high, low, rows, self.horizons, self.label_window,
+            strategy.profit_target, strategy.stop_loss
+        )
+        for name, values in labels.items():
+            columns[name] = values.astype(self.dtype)
+        sink.write(columns)
+
+    def export_symbol(self, symbol, source, out_dir):
+        """Export one symbol's candles to out_dir; returns a summary with the files written"""
+        strategy = ScalpingStrategy(self.config)
+        sink = self._sink(os.path.join(out_dir, symbol))
+        names = None
+        rows_written = 0
+        started = time.perf_counter()
+
+        # Rows waiting for look-ahead: timestamps, OHLCV and feature matrix
+        held = None
+        for frame in strategy.iter_indicator_blocks(iter_array_blocks(source, self.block_size)):
+            if names is None:
+                names = self._feature_columns(frame)
+            block = (
+                strategy._index_ms(frame.index),
+                frame[CANDLE_FIELDS[1:]].to_numpy(dtype=float),
+                frame[names].to_numpy(dtype=float)
+            )
+            if held is not None:
+                block = tuple(np.concatenate([h, b]) for h, b in zip(held, block))
+
+            ready = len(block[0]) - self.lookahead
+            if ready > 0:
+                self._write(sink, *block, names, strategy, ready)
+                rows_written += ready
+                held = tuple(part[ready:] for part in block)
+            else:
+                held = block
+
+        if held is not None and len(held[0]):
+            self._write(sink, *held, names, strategy, len(held[0]))
+            rows_written += len(held[0])
+
+        return {
+            'symbol': symbol,
+            'rows': rows_written,
+            'columns': (names or []),
+            'files': sink.close(),
+            'seconds': time.perf_counter() - started
+        }
+
+    def export(self, sources, out_dir, workers=1):
+        """Export {symbol: source} to out_dir, one symbol per worker process"""
+        os.makedirs(out_dir, exist_ok=True)
+        if workers <= 1 or len(sources) <= 1:
+            return [self.export_symbol(symbol, source, out_dir) for symbol, source in sources.items()]
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            futures = [executor.submit(self.export_symbol, symbol, source, out_dir) for symbol, source in sources.items()]
+            return [future.result() for future in futures]
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Export indicator features and outcome labels for model training')
+    parser.add_argument('sources', nargs='+', help='SYMBOL=path to candles (.npz kline cache, .csv or JSON lines)')
+    parser.add_argument('--out', required=True, help='output directory')
+    parser.add_argument('--config', help='JSON file with the ScalpingStrategy configuration')
+    parser.add_argument('--columns', help='comma-separated indicator columns (default: all enabled)')
+    parser.add_argument('--horizons', default=','.join(str(h) for h in DEFAULT_HORIZONS))
+    parser.add_argument('--label-window', type=int, default=DEFAULT_LABEL_WINDOW)
+    parser.add_argument('--block-size', type=int, default=DEFAULT_BLOCK_SIZE)
+    parser.add_argument('--format', default='auto', choices=['auto', 'parquet', 'npz'])
+    parser.add_argument('--workers', type=int, default=1)
+    args = parser.parse_args()
+
+    try:
+        config = {}
+        if args.config:
+            with open(args.config, 'r') as f:
+                config = json.load(f)
+
+        sources = dict(source.split('=', 1) for source in args.sources)
+        exporter = FeatureExporter(
+            config,
+            args.columns.split(',') if args.columns else None,
+            [int(h) for h in args.horizons.split(',') if h],
+            args.label_window,
+            args.block_size,
+            args.format
+        )
+        print(json.dumps(exporter.export(sources, args.out, args.workers)))
+
+    except Exception as e:
+        print(json.dumps({
+            "error": str(e),
+            "details": {
+                "message": str(e),
+                "type": type(e).__name__
+            }
+        }))
@@ -0,0 +1,303 @@
+import numpy as np
+import http.client
+import json
+import os
+import queue
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urlencode, urlsplit
+
+# Candle interval names used by the strategies, mapped to MEXC contract intervals
+INTERVALS = {
+    '1m': ('Min1', 60_000),
+    '5m': ('Min5', 300_000),
+    '15m': ('Min15', 900_000),
+    '30m': ('Min30', 1_800_000),
+    '1h': ('Min60', 3_600_000),
+    '4h': ('Hour4', 14_400_000),
+    '8h': ('Hour8', 28_800_000),
+    '1d': ('Day1', 86_400_000)
+}
+
+# MEXC returns at most this many candles per kline request
+MAX_CANDLES_PER_REQUEST = 2000
+
+COLUMNS = ['timestamp', 'open', 'high', 'low', 'close', 'volume']
+
+DEFAULT_BASE_URL = os.environ.get('KLINE_BASE_URL', 'http://localhost:3001/api/mexc/kline')
+
+
+def interval_ms(interval):
+    """Length of an interval such as '5m' in milliseconds"""
+    if interval not in INTERVALS:
+        raise ValueError(f"Unsupported interval '{interval}'")
+    return INTERVALS[interval][1]
+
+
+class RateLimiter:
+    """Token bucket shared by all threads issuing requests"""
+
+    def __init__(self, rate, burst=None):
+        self.rate = float(rate)
+        self.capacity = float(burst if burst is not None else max(1, rate))
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+        self.lock = threading.Lock()
+
+    def acquire(self):
+        """Block until a request may be sent"""
+        while True:
+            with self.lock:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                wait = (1 - self.tokens) / self.rate
+            time.sleep(wait)
+
+
+class HttpKlineFetcher:
+    """
+    Fetch klines over HTTP from the backend's MEXC proxy (or MEXC itself).
+
+    Keep-alive connections are pooled and reused across threads, and every
+    request passes through a shared rate limiter.
+    """
+
+    def __init__(self, base_url=DEFAULT_BASE_URL, max_connections=4, requests_per_second=10,
+                 timeout=10, retries=3):
+        parts = urlsplit(base_url)
+        self.scheme = parts.scheme
+        self.host = parts.hostname
+        self.port = parts.port
+        self.path = parts.path.rstrip('/')
+        self.timeout = timeout
+        self.retries = retries
+        self.max_connections = max_connections
+        self.limiter = RateLimiter(requests_per_second)
+        self.pool = queue.LifoQueue(maxsize=max_connections)
+
+    def _connect(self):
+        connection_class = http.client.HTTPSConnection if self.scheme == 'https' else http.client.HTTPConnection
+        return connection_class(self.host, self.port, timeout=self.timeout)
+
+    def _get(self, url):
+        """GET url on a pooled connection and return the decoded JSON body"""
+        try:
+            connection = self.pool.get_nowait()
+        except queue.Empty:
+            connection = self._connect()
+
+        try:
+            connection.request('GET', url, headers={'Connection': 'keep-alive'})
+            response = connection.getresponse()
+            body = response.read()
+        except (http.client.HTTPException, OSError):
+            connection.close()
+            raise
+
+        try:
+            self.pool.put_nowait(connection)
+        except queue.Full:
+            connection.close()
+
+        if response.status == 429 or response.status >= 500:
+            raise ConnectionError(f'Kline request failed with status {response.status}')
+        if response.status != 200:
+            raise ValueError(f'Kline request failed with status {response.status}: {body[:200]!r}')
+        return json.loads(body)
+
+    def __call__(self, symbol, interval, start, end):
+        """Return candles with start <= timestamp < end (all times in ms)"""
+        params = urlencode({
+            'interval': INTERVALS[interval][0],
+            'start': start // 1000,
+            'end': (end - 1) // 1000
+        })
+        url = f'{self.path}/{symbol}?{params}'
+
+        for attempt in range(self.retries + 1):
+            self.limiter.acquire()
+            try:
+                payload = self._get(url)
+                break
+            except (ConnectionError, http.client.HTTPException, OSError):
+                if attempt == self.retries:
+                    raise
+                time.sleep(0.5 * 2 ** attempt)
+
+        return parse_klines(payload, start, end)
+
+    def close(self):
+        while not self.pool.empty():
+            self.pool.get_nowait().close()
+
+
+def parse_klines(payload, start=None, end=None):
+    """Convert a MEXC kline response (columnar, times in seconds) into candle dicts"""
+    if isinstance(payload, dict) and 'data' in payload:
+        if payload.get('success') is False:
+            raise ValueError(f"Kline request failed: {payload.get('message', payload)}")
+        payload = payload['data']
+
+    times = payload.get('time', [])
+    candles = []
+    for i, seconds in enumerate(times):
+        timestamp = int(seconds) * 1000
+        if (start is not None and timestamp < start) or (end is not None and timestamp >= end):
+            continue
+        candles.append({
+            'timestamp': timestamp,
+            'open': float(payload['open'][i]),
+            'high': float(payload['high'][i]),
+            'low': float(payload['low'][i]),
+            'close': float(payload['close'][i]),
+            'volume': float(payload['vol'][i])
+        })
+    return candles
+
+
+def _merge_ranges(ranges):
+    """Merge overlapping or touching [start, end) ranges"""
+    merged = []
+    for start, end in sorted(ranges):
+        if merged and start <= merged[-1][1]:
+            merged[-1][1] = max(merged[-1][1], end)
+        else:
+            merged.append([start, end])
+    return [(start, end) for start, end in merged]
+
+
+def _missing_ranges(coverage, start, end):
+    """Parts of [start, end) not covered by the merged coverage ranges"""
+    missing = []
+    cursor = start
+    for covered_start, covered_end in coverage:
+        if covered_end <= cursor:
+            continue
+        if covered_start >= end:
+            break
+        if covered_start > cursor:
+            missing.append((cursor, covered_start))
+        cursor = max(cursor, covered_end)
+    if cursor < end:
+        missing.append((cursor, end))
+    return missing
+
+
+class KlineLoader:
+    """
+    Load candles through a local on-disk cache.
+
+    Each (symbol, interval) pair is cached as one .npz file holding the candle
+    arrays and the time ranges already fetched, so repeated loads only request
+    the gaps. Gaps are split into request-sized ranges and fetched concurrently.
+    fetcher is any callable (symbol, interval, start_ms, end_ms) -> candle dicts;
+    it defaults to HttpKlineFetcher.
+    """
+
+    def __init__(self, cache_dir=None, fetcher=None, max_workers=4):
+        if cache_dir is None:
+            cache_dir = os.path.join(tempfile.gettempdir(), 'profitcraft_klines')
+        os.makedirs(cache_dir, exist_ok=True)
+        self.cache_dir = cache_dir
+        self.fetcher = fetcher if fetcher is not None else HttpKlineFetcher()
+        self.max_workers = max_workers
+        self.locks = {}
+        self.locks_lock = threading.Lock()
+
+    def _path(self, symbol, interval):
+        return os.path.join(self.cache_dir, f'{symbol}_{interval}.npz')
+
+    def _lock(self, symbol, interval):
+        with self.locks_lock:
+            return self.locks.setdefault((symbol, interval), threading.Lock())
+
+    def _read_cache(self, symbol, interval):
+        path = self._path(symbol, interval)
+        if not os.path.exists(path):
+            return np.empty((0, len(COLUMNS))), []
+        with np.load(path) as cached:
+            return cached['candles'], [tuple(r) for r in cached['coverage'].tolist()]
+
+    def _write_cache(self, symbol, interval, candles, coverage):
+        # Write to a temporary file first so readers never see a partial cache
+        fd, tmp_path = tempfile.mkstemp(dir=self.cache_dir, suffix='.npz')
+        with os.fdopen(fd, 'wb') as f:
+            np.savez(f, candles=candles, coverage=np.asarray(coverage, dtype=np.int64).reshape(-1, 2))
+        os.replace(tmp_path, self._path(symbol, interval))
+
+    def _fetch_ranges(self, symbol, interval, ranges):
+        """Fetch the given ranges concurrently and return them as one array"""
+        step = interval_ms(interval) * MAX_CANDLES_PER_REQUEST
+        requests = [
+            (chunk_start, min(chunk_start + step, end))
+            for start, end in ranges
+            for chunk_start in range(start, end, step)
+        ]
+
+        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            results = executor.map(lambda r: self.fetcher(symbol, interval, r[0], r[1]), requests)
+            rows = [[c[column] for column in COLUMNS] for candles in results for c in candles]
+
+        return np.asarray(rows, dtype=float).reshape(-1, len(COLUMNS))
+
+    def load_array(self, symbol, interval, start, end):
+        """Candles with start <= timestamp < end as an (n x 6) array of COLUMNS"""
+        step = interval_ms(interval)
+        start = start - start % step
+        # The candle that is still forming is fetched but never marked as cached
+        closed_end = min(end, int(time.time() * 1000) // step * step)
+
+        with self._lock(symbol, interval):
+            candles, coverage = self._read_cache(symbol, interval)
+            missing = _missing_ranges(coverage, start, end)
+
+            if missing:
+                fetched = self._fetch_ranges(symbol, interval, missing)
+                candles = np.concatenate([candles, fetched])
+                # Keep the latest copy of each timestamp, in time order
+                order = np.argsort(candles[:, 0], kind='stable')[::-1]
+                _, first = np.unique(candles[order, 0], return_index=True)
+                candles = candles[order[first]]
+
+                new_coverage = [(s, min(e, closed_end)) for s, e in missing if min(e, closed_end) > s]
+                if new_coverage:
+                    coverage = _merge_ranges(coverage + new_coverage)
+                    self._write_cache(symbol, interval, candles, coverage)
+
+        lo, hi = np.searchsorted(candles[:, 0], [start, end])
+        return candles[lo:hi]
+
+    def load(self, symbol, interval, start, end):
+        """Candles with start <= timestamp < end as dicts ready for BTCStrategy/ScalpingStrategy"""
+        rows = self.load_array(symbol, interval, start, end)
+        candles = []
+        for row in rows.tolist():
+            candle = dict(zip(COLUMNS, row))
+            candle['timestamp'] = int(candle['timestamp'])
+            candles.append(candle)
+        return candles
+
+
+if __name__ == "__main__":
+    try:
+        symbol, interval, start, end = sys.argv[1], sys.argv[2], int(sys.argv[3]), int(sys.argv[4])
+        cache_dir = sys.argv[5] if len(sys.argv) > 5 else None
+
+        loader = KlineLoader(cache_dir)
+        print(json.dumps(loader.load(symbol, interval, start, end)))
+
+    except Exception as e:
+        print(json.dumps({
+            "error": str(e),
+            "details": {
+                "message": str(e),
+                "type": type(e).__name__
+            }
+        }))
@@ -0,0 +1,375 @@
+import numpy as np
+import argparse
+import json
+import os
+import platform
+import resource
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from scalping_strategy import ScalpingStrategy
+from synthetic_data import synthetic_candles
+
+STRATEGY_DIR = os.path.dirname(os.path.abspath(__file__))
+PLANNER_SCRIPT = os.path.join(STRATEGY_DIR, 'execution_planner.py')
+
+PERCENTILES = (50, 95, 99)
+
+TIMEFRAMES = {'1m': 60_000, '5m': 300_000}
+
+PAGE_SIZE = os.sysconf('SC_PAGE_SIZE') if hasattr(os, 'sysconf') else 4096
+
+
+def _rss_bytes():
+    """Current resident set size of this process (peak RSS where /proc is unavailable)"""
+    try:
+        with open('/proc/self/statm', 'r') as f:
+            return int(f.read().split()[1]) * PAGE_SIZE
+    except (OSError, IndexError, ValueError):
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return peak if sys.platform == 'darwin' else peak * 1024
+
+
+def _cpu_seconds():
+    """CPU time used by this process and its finished children"""
+    times = os.times()
+    return times.user + times.system + times.children_user + times.children_system
+
+
+def _version():
+    """git revision of the strategies, so saved results can be told apart"""
+    try:
+        return subprocess.run(
+            ['git', 'describe', '--always', '--dirty'],
+            capture_output=True, text=True, cwd=STRATEGY_DIR, timeout=5
+        ).stdout.strip() or None
+    except (OSError, subprocess.SubprocessError):
+        return None
+
+
+class ResourceSampler:
+    """Sample CPU utilisation, RSS and in-flight requests on a background thread"""
+
+    def __init__(self, interval=0.5, in_flight=None):
+        self.interval = interval
+        self.in_flight = in_flight or (lambda: 0)
+        self.samples = []
+        self._stop = threading.Event()
+        self._thread = None
+
+    def _run(self):
+        start = last_wall = time.perf_counter()
+        last_cpu = _cpu_seconds()
+        while not self._stop.wait(self.interval):
+            wall, cpu = time.perf_counter(), _cpu_seconds()
+            self.samples.append({
+                't': round(wall - start, 3),
+                'cpu_percent': round((cpu - last_cpu) / max(wall - last_wall, 1e-9) * 100, 1),
+                'rss_mb': round(_rss_bytes() / 2 ** 20, 1),
+                'in_flight': self.in_flight()
+            })
+            last_wall, last_cpu = wall, cpu
+
+    def start(self):
+        self._thread = threading.Thread(target=self._run, name='load-test-sampler', daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+        return self.samples
+
+
+def build_workload(users=10, strategies_per_user=2, minutes=5, history=500, btc_fraction=0.3,
+                   five_minute_fraction=0.3, seed=0):
+    """
+    Strategies with their candle series, one entry per (user, strategy).
+
+    Each series holds `history` candles plus one per bar that closes during the
+    run, so every request sends a growing window like the live clients do.
+    """
+    rng = np.random.default_rng(seed)
+    strategies = []
+    for user in range(users):
+        for index in range(strategies_per_user):
+            timeframe = '5m' if rng.random() < five_minute_fraction else '1m'
+            bars = minutes if timeframe == '1m' else minutes // 5 + 1
+            strategies.append({
+                'key': f'user{user}_strategy{index}',
+                'engine': 'btc' if rng.random() < btc_fraction else 'scalping',
+                'timeframe': timeframe,
+                'history': history,
+                'candles': synthetic_candles(
+                    history + bars,
+                    seed=int(rng.integers(2 ** 31)),
+                    interval_ms=TIMEFRAMES[timeframe],
+                    start_price=float(rng.uniform(0.5, 60000))
+                )
+            })
+    return strategies
+
+
+def build_schedule(strategies, minutes, minute_seconds=6.0, jitter=0.5, seed=0):
+    """
+    Request times for the run, clustered at the start of each (compressed) minute.
+
+    1m strategies poll every minute and 5m strategies every fifth minute, each
+    within `jitter` seconds of the boundary. Returns (time, strategy, closed bars).
+    """
+    rng = np.random.default_rng(seed)
+    schedule = []
+    for minute in range(minutes):
+        for strategy in strategies:
+            if strategy['timeframe'] == '5m' and minute % 5:
+                continue
+            closed = minute + 1 if strategy['timeframe'] == '1m' else minute // 5 + 1
+            at = minute * minute_seconds + float(rng.uniform(0, jitter))
+            schedule.append((at, strategy, closed))
+    schedule.sort(key=lambda entry: entry[0])
+    return schedule
+
+
+def call_btc(candles, cursor=None, python=sys.executable):
+    """One analyze request the way BTC_Strategy.js serves it: an execution_planner.py run spawn"""
+    fd, path = tempfile.mkstemp(prefix='btc_request_', suffix='.json')
+    try:
+        with os.fdopen(fd, 'w') as f:
+            json.dump({'engine': 'btc', 'candleData': candles, 'cursor': cursor}, f)
+        completed = subprocess.run([python, PLANNER_SCRIPT, 'run', path], capture_output=True, text=True, timeout=30)
+        if completed.returncode != 0:
+            raise RuntimeError(completed.stderr.strip() or 'Python process failed')
+        result = json.loads(completed.stdout)
+        if 'error' in result:
+            raise RuntimeError(result['error'])
+        return result['signals'], result.get('cursor')
+    finally:
+        os.remove(path)
+
+
+class LoadTest:
+    """
+    Replay a schedule of analyze requests against the Python engines.
+
+    Scalping strategies are analyzed in-process on one long-lived instance per
+    key (like the handler's strategyInstances); BTC requests spawn
+    execution_planner.py run once each. Requests run on a pool of `concurrency` threads
+    and latency is measured from the scheduled time, so queueing counts.
+    """
+
+    def __init__(self, concurrency=8, use_cursor=False, sample_interval=0.5):
+        self.concurrency = concurrency
+        self.use_cursor = use_cursor
+        self.sample_interval = sample_interval
+        self.instances = {}
+        self.cursors = {}
+        self.records = []
+        self.lock = threading.Lock()
+        self.in_flight = 0
+
+    def _instance(self, strategy):
+        with self.lock:
+            if strategy['key'] not in self.instances:
+                config = {'timeframe': strategy['timeframe']}
+                self.instances[strategy['key']] = ScalpingStrategy(config)
+            return self.instances[strategy['key']]
+
+    def _call(self, strategy, candles):
+        cursor = self.cursors.get(strategy['key']) if self.use_cursor else None
+        if strategy['engine'] == 'btc':
+            _, self.cursors[strategy['key']] = call_btc(candles, cursor)
+            return
+        instance = self._instance(strategy)
+        result = instance.analyze(candles, cursor=cursor)
+        if not result.get('success'):
+            raise RuntimeError(result.get('message'))
+        self.cursors[strategy['key']] = result.get('cursor')
+
+    def _request(self, run_start, at, strategy, closed, burst):
+        with self.lock:
+            self.in_flight += 1
+        started = time.perf_counter()
+        error = None
+        try:
+            self._call(strategy, strategy['candles'][:strategy['history'] + closed])
+        except Exception as e:
+            error = f'{type(e).__name__}: {e}'
+        finished = time.perf_counter()
+
+        with self.lock:
+            self.in_flight -= 1
+            self.records.append({
+                'engine': strategy['engine'],
+                'timeframe': strategy['timeframe'],
+                'burst': burst,
+                'scheduled': at,
+                'latency_ms': (finished - run_start - at) * 1000,
+                'service_ms': (finished - started) * 1000,
+                'finished': finished - run_start,
+                'error': error
+            })
+
+    def run(self, schedule, minute_seconds):
+        """Replay the schedule in real (compressed) time and return the raw records and samples"""
+        sampler = ResourceSampler(self.sample_interval, lambda: self.in_flight)
+        sampler.start()
+        run_start = time.perf_counter()
+
+        with ThreadPoolExecutor(max_workers=self.concurrency) as executor:
+            for at, strategy, closed in schedule:
+                delay = run_start + at - time.perf_counter()
+                if delay > 0:
+                    time.sleep(delay)
+                executor.submit(self._request, run_start, at, strategy, closed, int(at // minute_seconds))
+
+        duration = time.perf_counter() - run_start
+        return self.records, sampler.stop(), duration
+
+
+def _latency_stats(values):
+    values = np.asarray(values, dtype=float)
+    if values.size == 0:
+        return {'count': 0}
+    stats = {'count': int(values.size), 'mean': float(values.mean()), 'max': float(values.max())}
+    for p, value in zip(PERCENTILES, np.percentile(values, PERCENTILES)):
+        stats[f'p{p}'] = float(value)
+    return stats
+
+
+def summarize(records, samples, duration, minute_seconds):
+    """Latency percentiles per engine/timeframe, throughput, burst overruns and resource peaks"""
+    groups = {'all': records}
+    for record in records:
+        groups.setdefault(f"{record['engine']}/{record['timeframe']}", []).append(record)
+
+    summary = {}
+    for name, group in sorted(groups.items()):
+        ok = [r for r in group if r['error'] is None]
+        summary[name] = {
+            'requests': len(group),
+            'errors': len(group) - len(ok),
+            'latency_ms': _latency_stats([r['latency_ms'] for r in ok]),
+            'service_ms': _latency_stats([r['service_ms'] for r in ok])
+        }
+
+    # A burst overruns when its last request finishes after the next minute starts
+    bursts = {}
+    for record in records:
+        bursts[record['burst']] = max(bursts.get(record['burst'], 0), record['finished'])
+    overruns = [b for b, finished in bursts.items() if finished > (b + 1) * minute_seconds]
+
+    return {
+        'duration_s': duration,
+        'throughput_rps': len(records) / duration if duration else 0.0,
+        'groups': summary,
+        'bursts': len(bursts),
+        'burst_overruns': len(overruns),
+        'peak_cpu_percent': max((s['cpu_percent'] for s in samples), default=0.0),
+        'peak_rss_mb': max((s['rss_mb'] for s in samples), default=0.0),
+        'peak_in_flight': max((s['in_flight'] for s in samples), default=0),
+        'errors': sorted({r['error'] for r in records if r['error']})[:10]
+    }
+
+
+def run_load_test(users=10, strategies_per_user=2, minutes=5, minute_seconds=6.0, history=500,
+                  btc_fraction=0.3, five_minute_fraction=0.3, jitter=0.5, concurrency=8,
+                  use_cursor=False, sample_interval=0.5, seed=0):
+    """Build a workload, replay it and return the report (settings, summary and timeline)"""
+    settings = {
+        'users': users, 'strategies_per_user': strategies_per_user, 'minutes': minutes,
+        'minute_seconds': minute_seconds, 'history': history, 'btc_fraction': btc_fraction,
+        'five_minute_fraction': five_minute_fraction, 'jitter': jitter, 'concurrency': concurrency,
+        'use_cursor': use_cursor, 'seed': seed
+    }
+    strategies = build_workload(users, strategies_per_user, minutes, history, btc_fraction, five_minute_fraction, seed)
+    schedule = build_schedule(strategies, minutes, minute_seconds, jitter, seed)
+
+    test = LoadTest(concurrency, use_cursor, sample_interval)
+    records, samples, duration = test.run(schedule, minute_seconds)
+    return {
+        'settings': settings,
+        'summary': summarize(records, samples, duration, minute_seconds),
+        'timeline': samples
+    }
+
+
+def format_report(report, baseline=None):
+    """Latency table for a report, with the baseline's numbers alongside when given"""
+    summary = report['summary']
+    lines = [
+        f"{'group':<16}{'requests':>9}{'errors':>8}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}"
+        + (f"{'base p95':>10}{'change':>9}" if baseline else '')
+    ]
+    for name, group in summary['groups'].items():
+        latency = group['latency_ms']
+        line = f"{name:<16}{group['requests']:>9}{group['errors']:>8}"
+        line += ''.join(f"{latency.get(f'p{p}', float('nan')):>10.1f}" for p in PERCENTILES)
+        if baseline:
+            base = baseline['summary']['groups'].get(name, {}).get('latency_ms', {}).get('p95')
+            if base:
+                line += f"{base:>10.1f}{(latency.get('p95', 0) / base - 1) * 100:>8.0f}%"
+        lines.append(line)
+
+    lines.append(
+        f"throughput {summary['throughput_rps']:.2f} req/s over {summary['duration_s']:.1f}s, "
+        f"{summary['burst_overruns']}/{summary['bursts']} bursts overran, "
+        f"peak CPU {summary['peak_cpu_percent']:.0f}%, peak RSS {summary['peak_rss_mb']:.0f} MB"
+    )
+    if baseline:
+        lines.append(
+            f"baseline {baseline.get('version')}: throughput {baseline['summary']['throughput_rps']:.2f} req/s, "
+            f"{baseline['summary']['burst_overruns']}/{baseline['summary']['bursts']} bursts overran"
+        )
+    return '\n'.join(lines)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Replay analyze traffic against the Python strategy engines')
+    parser.add_argument('--users', default='10', help='number of users, or a comma-separated ramp such as 10,20,40')
+    parser.add_argument('--strategies-per-user', type=int, default=2)
+    parser.add_argument('--minutes', type=int, default=5, help='simulated minutes per stage')
+    parser.add_argument('--minute-seconds', type=float, default=6.0, help='wall-clock seconds per simulated minute')
+    parser.add_argument('--history', type=int, default=500, help='candles sent with the first request')
+    parser.add_argument('--btc-fraction', type=float, default=0.3)
+    parser.add_argument('--five-minute-fraction', type=float, default=0.3)
+    parser.add_argument('--jitter', type=float, default=0.5, help='seconds over which each burst is spread')
+    parser.add_argument('--concurrency', type=int, default=8)
+    parser.add_argument('--cursor', action='store_true', help='send cursors so requests only scan candles after the previous response')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--output', help='write the JSON results to this file')
+    parser.add_argument('--compare', help='results file from an earlier run to compare against')
+    args = parser.parse_args()
+
+    compared = {'stages': []}
+    if args.compare:
+        with open(args.compare, 'r') as f:
+            compared = json.load(f)
+
+    results = {
+        'version': _version(),
+        'python': platform.python_version(),
+        'cpus': os.cpu_count(),
+        'started': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'stages': []
+    }
+    for stage, users in enumerate(int(u) for u in args.users.split(',') if u):
+        report = run_load_test(
+            users, args.strategies_per_user, args.minutes, args.minute_seconds, args.history,
+            args.btc_fraction, args.five_minute_fraction, args.jitter, args.concurrency,
+            args.cursor, seed=args.seed
+        )
+        results['stages'].append(report)
+
+        baseline = None
+        if stage < len(compared['stages']):
+            baseline = dict(compared['stages'][stage], version=compared.get('version'))
+        print(f'--- {users} users x {args.strategies_per_user} strategies')
+        print(format_report(report, baseline))
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(results, f, indent=2)
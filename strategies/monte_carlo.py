@@ -0,0 +1,158 @@
+import numpy as np
+import json
+import os
+import sys
+from concurrent.futures import ProcessPoolExecutor
+
+# Upper bound on the number of cells (runs x trades) simulated at once
+DEFAULT_MAX_CELLS = 4_000_000
+
+PERCENTILES = (1, 5, 25, 50, 75, 95, 99)
+
+
+def extract_pnl(trades):
+    """Turn a list of trades (dicts with 'pnl') or raw P&L values into a float array"""
+    if isinstance(trades, np.ndarray):
+        return trades.astype(float).ravel()
+
+    pnl = []
+    for trade in trades:
+        if isinstance(trade, dict):
+            if 'pnl' not in trade:
+                raise ValueError("Trade is missing required field 'pnl'")
+            pnl.append(trade['pnl'])
+        else:
+            pnl.append(trade)
+    return np.asarray(pnl, dtype=float)
+
+
+def _resample_indices(rng, runs, n_trades, method, block_size):
+    """Build a (runs x trades) matrix of indices into the P&L sequence"""
+    if method == 'bootstrap':
+        return rng.integers(0, n_trades, size=(runs, n_trades))
+
+    if method == 'block':
+        block_size = max(1, min(block_size, n_trades))
+        n_blocks = -(-n_trades // block_size)
+        starts = rng.integers(0, n_trades - block_size + 1, size=(runs, n_blocks))
+        idx = starts[:, :, None] + np.arange(block_size)
+        return idx.reshape(runs, -1)[:, :n_trades]
+
+    if method == 'permutation':
+        return rng.permuted(np.broadcast_to(np.arange(n_trades), (runs, n_trades)), axis=1)
+
+    raise ValueError(f"Unknown resampling method '{method}'")
+
+
+def _simulate_chunk(pnl, runs, method, block_size, initial_capital, ruin_level, seed):
+    """Simulate one chunk of equity paths and reduce it to per-run statistics"""
+    rng = np.random.default_rng(seed)
+    idx = _resample_indices(rng, runs, len(pnl), method, block_size)
+
+    # Equity paths, including the starting capital as column 0
+    equity = np.empty((runs, len(pnl) + 1))
+    equity[:, 0] = initial_capital
+    np.cumsum(pnl[idx], axis=1, out=equity[:, 1:])
+    equity[:, 1:] += initial_capital
+
+    # Drawdown relative to the running peak of each path
+    peak = np.maximum.accumulate(equity, axis=1)
+    max_drawdown = ((peak - equity) / peak).max(axis=1)
+
+    ruined = (equity <= ruin_level).any(axis=1)
+
+    return max_drawdown, equity[:, -1].copy(), ruined
+
+
+def _summarize(values):
+    """Percentile summary of a 1-D array"""
+    points = np.percentile(values, PERCENTILES)
+    summary = {f'p{p}': float(v) for p, v in zip(PERCENTILES, points)}
+    summary['mean'] = float(values.mean())
+    return summary
+
+
+def run_monte_carlo(trades, runs=10000, method='bootstrap', block_size=20,
+                    initial_capital=10000.0, ruin_threshold=0.5, seed=None,
+                    max_cells=DEFAULT_MAX_CELLS, workers=1):
+    """
+    Resample a backtest's trade P&L sequence and summarize the resulting paths.
+
+    method is one of 'bootstrap' (i.i.d. resampling with replacement), 'block'
+    (moving-block bootstrap, keeps streaks of block_size trades together) or
+    'permutation' (same trades in a random order). A path counts as ruined
+    when its equity touches initial_capital * (1 - ruin_threshold). Runs are
+    simulated in chunks of at most max_cells matrix cells, optionally spread
+    over several worker processes.
+    """
+    pnl = extract_pnl(trades)
+    if len(pnl) == 0:
+        raise ValueError('No trades to simulate')
+    if runs < 1:
+        raise ValueError('runs must be at least 1')
+
+    initial_capital = float(initial_capital)
+    ruin_level = initial_capital * (1 - ruin_threshold)
+
+    # Split the runs into memory-bounded chunks with independent random streams
+    chunk_runs = max(1, int(max_cells // len(pnl)))
+    sizes = [min(chunk_runs, runs - start) for start in range(0, runs, chunk_runs)]
+    seeds = np.random.SeedSequence(seed).spawn(len(sizes))
+    tasks = [
+        (pnl, size, method, block_size, initial_capital, ruin_level, child)
+        for size, child in zip(sizes, seeds)
+    ]
+
+    if workers is None:
+        workers = os.cpu_count() or 1
+
+    if workers > 1 and len(tasks) > 1:
+        with ProcessPoolExecutor(max_workers=min(workers, len(tasks))) as executor:
+            results = list(executor.map(_simulate_chunk, *zip(*tasks)))
+    else:
+        results = [_simulate_chunk(*task) for task in tasks]
+
+    max_drawdown = np.concatenate([r[0] for r in results])
+    final_equity = np.concatenate([r[1] for r in results])
+    ruined = np.concatenate([r[2] for r in results])
+
+    return {
+        'runs': runs,
+        'trades': len(pnl),
+        'method': method,
+        'initial_capital': initial_capital,
+        'max_drawdown': _summarize(max_drawdown * 100),
+        'final_equity': _summarize(final_equity),
+        'total_return': _summarize((final_equity / initial_capital - 1) * 100),
+        'ruin_probability': float(ruined.mean())
+    }
+
+
+if __name__ == "__main__":
+    try:
+        # Read backtest trades from the input file
+        with open(sys.argv[1], 'r') as f:
+            input_data = json.load(f)
+
+        options = input_data.get('options', {})
+        summary = run_monte_carlo(
+            input_data['trades'],
+            runs=int(options.get('runs', 10000)),
+            method=options.get('method', 'bootstrap'),
+            block_size=int(options.get('blockSize', 20)),
+            initial_capital=float(input_data.get('initialCapital', 10000)),
+            ruin_threshold=float(options.get('ruinThreshold', 0.5)),
+            seed=options.get('seed'),
+            workers=int(options.get('workers', 1))
+        )
+
+        print(json.dumps(summary))
+
+    except Exception as e:
+        print(json.dumps({
+            "error": str(e),
+            "details": {
+                "message": str(e),
+                "type": type(e).__name__
+            }
+        }))
@@ -0,0 +1,387 @@
+import numpy as np
+import argparse
+import heapq
+import json
+import sys
+import time
+
+from btc_strategy import BTCStrategy
+
+COLUMNS = ['timestamp', 'open', 'high', 'low', 'close', 'volume']
+
+# Candles scanned for an exit before the look-ahead window doubles
+INITIAL_EXIT_WINDOW = 32
+
+# Upper bound on candidates x window cells scanned at once, to cap scratch memory
+MAX_EXIT_CELLS = 2 ** 22
+
+YEAR_MS = 365 * 24 * 60 * 60 * 1000
+
+
+def _candle_array(candles):
+    """Candles as an (n x 6) array of COLUMNS sorted by time; accepts dicts or a KlineLoader array"""
+    if isinstance(candles, np.ndarray):
+        array = candles.astype(float)
+    else:
+        array = np.array([[float(c[column]) for column in COLUMNS] for c in candles]).reshape(-1, len(COLUMNS))
+    return array[np.argsort(array[:, 0], kind='stable')]
+
+
+def align_candles(candles_by_symbol):
+    """
+    Put every symbol on the union of their timestamps.
+
+    Returns (symbols, timestamps, high, low, close) with T x S price arrays.
+    high and low are NaN where a symbol has no bar (so nothing triggers there);
+    close is carried forward for marking open positions and NaN before a
+    symbol's first bar.
+    """
+    symbols = list(candles_by_symbol)
+    arrays = [_candle_array(candles_by_symbol[symbol]) for symbol in symbols]
+    timestamps = np.unique(np.concatenate([a[:, 0] for a in arrays])) if arrays else np.empty(0)
+
+    shape = (len(timestamps), len(symbols))
+    high = np.full(shape, np.nan)
+    low = np.full(shape, np.nan)
+    close = np.full(shape, np.nan)
+    for column, array in enumerate(arrays):
+        rows = np.searchsorted(timestamps, array[:, 0])
+        high[rows, column] = array[:, 2]
+        low[rows, column] = array[:, 3]
+        close[rows, column] = array[:, 4]
+
+    # Forward-fill close along time
+    seen = np.where(np.isnan(close), 0, np.arange(len(timestamps))[:, None])
+    np.maximum.accumulate(seen, axis=0, out=seen)
+    close = close[seen, np.arange(len(symbols))]
+    return symbols, timestamps, high, low, close
+
+
+def align_signals(signals_by_symbol, symbols, timestamps):
+    """
+    Signals as candidate arrays (row, column, direction, entry, tp, sl), in time order.
+
+    Each signal lands on the bar with its timestamp; signals outside the index
+    are dropped and a later signal on the same bar and symbol replaces an earlier one.
+    """
+    rows, columns, direction, entry, tp, sl = [], [], [], [], [], []
+    for column, symbol in enumerate(symbols):
+        signals = signals_by_symbol.get(symbol) or []
+        if not signals:
+            continue
+        times = np.array([float(s['timestamp']) for s in signals])
+        found = np.searchsorted(timestamps, times)
+        valid = (found < len(timestamps)) & (timestamps[np.minimum(found, len(timestamps) - 1)] == times)
+        for signal, row in zip((s for s, ok in zip(signals, valid) if ok), found[valid]):
+            rows.append(row)
+            columns.append(column)
+            direction.append(1 if signal['type'] == 'long' else -1)
+            entry.append(float(signal['entry_price']))
+            tp.append(float(signal['tp']))
+            sl.append(float(signal['sl']))
+
+    rows = np.asarray(rows, dtype=np.int64)
+    columns = np.asarray(columns, dtype=np.int64)
+    # np.unique keeps first occurrences, so look from the end to let later signals win;
+    # the result comes out ordered by bar, then symbol
+    key = rows * len(symbols) + columns
+    _, last = np.unique(key[::-1], return_index=True)
+    keep = len(key) - 1 - last
+    return (
+        rows[keep], columns[keep], np.asarray(direction, dtype=np.int8)[keep],
+        np.asarray(entry)[keep], np.asarray(tp)[keep], np.asarray(sl)[keep]
+    )
+
+
+def _scan_exits(pending, begin, window, columns, direction, tp, sl, high, low, exit_row, exit_price, reason):
+    """Look for the exits of `pending` candidates in the window bars from begin; returns the found mask"""
+    n_rows = len(high)
+    offsets = begin[:, None] + np.arange(window)
+    valid = offsets < n_rows
+    offsets = np.minimum(offsets, n_rows - 1)
+    cols = columns[pending][:, None]
+    seg_high = high[offsets, cols]
+    seg_low = low[offsets, cols]
+
+    long = (direction[pending] == 1)[:, None]
+    stop = sl[pending][:, None]
+    target = tp[pending][:, None]
+    stop_hit = valid & np.where(long, seg_low <= stop, seg_high >= stop)
+    target_hit = valid & np.where(long, seg_high >= target, seg_low <= target)
+    hits = stop_hit | target_hit
+
+    found = hits.any(axis=1)
+    first = np.argmax(hits, axis=1)
+    done = pending[found]
+    stopped = stop_hit[found, first[found]]
+    exit_row[done] = offsets[found, first[found]]
+    exit_price[done] = np.where(stopped, sl[done], tp[done])
+    reason[done] = np.where(stopped, 0, 1)
+    return found
+
+
+def find_exits(rows, columns, direction, tp, sl, high, low, close):
+    """
+    Exit bar, price and reason for every candidate, vectorized across candidates.
+
+    Exits are looked for from the bar after entry; when the stop and the target
+    fall in one bar the stop is assumed to fill first. Positions still open at
+    the end of the data close at the last close. Candidates are scanned in
+    batches of at most MAX_EXIT_CELLS bars, so memory stays bounded however
+    long positions stay open.
+    """
+    n_rows = len(high)
+    exit_row = np.full(len(rows), n_rows - 1, dtype=np.int64)
+    exit_price = close[-1, columns] if len(rows) else np.empty(0)
+    reason = np.full(len(rows), 2, dtype=np.int8)  # 0 stop loss, 1 take profit, 2 end of data
+
+    pending = np.flatnonzero(rows < n_rows - 1)
+    begin = rows[pending] + 1
+    window = INITIAL_EXIT_WINDOW
+    while len(pending):
+        # No window needs to reach past the last bar
+        window = min(window, n_rows - int(begin.min()))
+        batch = max(1, MAX_EXIT_CELLS // window)
+        found = np.zeros(len(pending), dtype=bool)
+        for lo in range(0, len(pending), batch):
+            found[lo:lo + batch] = _scan_exits(
+                pending[lo:lo + batch], begin[lo:lo + batch], window,
+                columns, direction, tp, sl, high, low, exit_row, exit_price, reason
+            )
+
+        begin = begin[~found] + window
+        pending = pending[~found]
+        keep = begin < n_rows
+        pending, begin = pending[keep], begin[keep]
+        window *= 2
+
+    return exit_row, exit_price, reason
+
+
+def allocate(rows, columns, entry, exit_row, pnl_per_unit, n_symbols, initial_capital=10000.0,
+             position_fraction=0.1, max_symbol_exposure=0.25, max_gross_exposure=1.0, fee_rate=0.0):
+    """
+    Walk the candidates in time order, sizing each from one shared balance.
+
+    A position gets position_fraction of the realized balance, cut down to what
+    is left under the per-symbol and gross exposure limits (fractions of the
+    balance, by entry notional). Exits on a bar are settled before that bar's
+    entries. Returns the notional of each candidate, 0 where it was skipped.
+    """
+    notional = np.zeros(len(rows))
+    symbol_open = np.zeros(n_symbols)
+    gross_open = 0.0
+    balance = float(initial_capital)
+    exits = []
+
+    for k in range(len(rows)):
+        row = rows[k]
+        while exits and exits[0][0] <= row:
+            _, j = heapq.heappop(exits)
+            symbol_open[columns[j]] -= notional[j]
+            gross_open -= notional[j]
+            balance += notional[j] / entry[j] * pnl_per_unit[j] - notional[j] * fee_rate * 2
+
+        column = columns[k]
+        size = min(
+            balance * position_fraction,
+            balance * max_symbol_exposure - symbol_open[column],
+            balance * max_gross_exposure - gross_open
+        )
+        if size <= balance * 1e-6:
+            continue
+
+        notional[k] = size
+        symbol_open[column] += size
+        gross_open += size
+        heapq.heappush(exits, (exit_row[k], k))
+
+    return notional
+
+
+def portfolio_equity(rows, columns, direction, entry, exit_row, pnl_per_unit, notional, close,
+                     initial_capital=10000.0, fee_rate=0.0):
+    """
+    Equity and per-symbol P&L curves (T and T x S) from the sized trades.
+
+    Signed quantity and cost basis are scattered onto entry/exit bars and
+    cumulated over time, so marking every open position is one array expression.
+    """
+    n_rows, n_symbols = close.shape
+    taken = notional > 0
+    rows, columns, exit_row = rows[taken], columns[taken], exit_row[taken]
+    units = notional[taken] / entry[taken] * direction[taken]
+    basis = units * entry[taken]
+    fees = notional[taken] * fee_rate
+
+    quantity = np.zeros((n_rows, n_symbols))
+    cost = np.zeros((n_rows, n_symbols))
+    realized = np.zeros((n_rows, n_symbols))
+    np.add.at(quantity, (rows, columns), units)
+    np.add.at(quantity, (exit_row, columns), -units)
+    np.add.at(cost, (rows, columns), basis)
+    np.add.at(cost, (exit_row, columns), -basis)
+    np.add.at(realized, (exit_row, columns), notional[taken] / entry[taken] * pnl_per_unit[taken] - fees)
+    np.add.at(realized, (rows, columns), -fees)
+
+    np.cumsum(quantity, axis=0, out=quantity)
+    np.cumsum(cost, axis=0, out=cost)
+    np.cumsum(realized, axis=0, out=realized)
+
+    marked = np.nan_to_num(close)
+    symbol_pnl = realized + quantity * marked - cost
+    equity = initial_capital + symbol_pnl.sum(axis=1)
+    gross_exposure = np.abs(quantity * marked).sum(axis=1)
+    return equity, symbol_pnl, gross_exposure
+
+
+def portfolio_stats(timestamps, equity, symbol_pnl, gross_exposure, symbols, initial_capital=10000.0):
+    """Return, drawdown, risk-adjusted return, exposure and cross-symbol correlation figures"""
+    peaks = np.maximum.accumulate(equity)
+    drawdown = (peaks - equity) / peaks
+    trough = int(np.argmax(drawdown)) if len(drawdown) else 0
+
+    returns = np.diff(equity) / equity[:-1] if len(equity) > 1 else np.empty(0)
+    bar_ms = float(np.median(np.diff(timestamps))) if len(timestamps) > 1 else 0.0
+    bars_per_year = YEAR_MS / bar_ms if bar_ms else 0.0
+    volatility = returns.std()
+    sharpe = float(returns.mean() / volatility * np.sqrt(bars_per_year)) if volatility > 0 else 0.0
+
+    # Correlation of per-bar P&L between symbols that traded
+    bar_pnl = np.diff(symbol_pnl, axis=0)
+    active = np.flatnonzero(bar_pnl.std(axis=0) > 0) if len(bar_pnl) else np.empty(0, dtype=int)
+    correlation = np.corrcoef(bar_pnl[:, active], rowvar=False).reshape(len(active), len(active))
+    off_diagonal = correlation[~np.eye(len(active), dtype=bool)]
+
+    exposure = gross_exposure / equity
+    return {
+        'final_equity': float(equity[-1]) if len(equity) else initial_capital,
+        'total_return': float(equity[-1] / initial_capital - 1) * 100 if len(equity) else 0.0,
+        'max_drawdown': float(drawdown.max()) * 100 if len(drawdown) else 0.0,
+        'max_drawdown_time': float(timestamps[trough]) if len(timestamps) else None,
+        'sharpe_ratio': sharpe,
+        'mean_exposure': float(exposure.mean()) if len(exposure) else 0.0,
+        'max_exposure': float(exposure.max()) if len(exposure) else 0.0,
+        'symbol_pnl': {symbols[i]: float(symbol_pnl[-1, i]) for i in range(len(symbols))} if len(symbol_pnl) else {},
+        'mean_correlation': float(off_diagonal.mean()) if off_diagonal.size else 0.0,
+        'correlation': {
+            'symbols': [symbols[i] for i in active],
+            'matrix': correlation.tolist()
+        }
+    }
+
+
+def run_portfolio_backtest(candles_by_symbol, signals_by_symbol=None, initial_capital=10000.0,
+                           position_fraction=0.1, max_symbol_exposure=0.25, max_gross_exposure=1.0,
+                           fee_rate=0.0, curve_points=1000):
+    """
+    Backtest many symbols against one capital pool.
+
+    candles_by_symbol maps symbol -> candles (dicts or an n x 6 array);
+    signals_by_symbol maps symbol -> signal dicts with timestamp, type,
+    entry_price, tp and sl. Symbols without signals get BTCStrategy's,
+    whose scan is vectorized (about 0.2 s per symbol-year of 5m candles).
+    """
+    if signals_by_symbol is None:
+        signals_by_symbol = {}
+    symbols, timestamps, high, low, close = align_candles(candles_by_symbol)
+    for symbol in symbols:
+        if symbol not in signals_by_symbol:
+            candles = candles_by_symbol[symbol]
+            if isinstance(candles, np.ndarray):
+                candles = {column: candles[:, i] for i, column in enumerate(COLUMNS)}
+            signals_by_symbol[symbol] = BTCStrategy(candles).calculate()
+
+    rows, columns, direction, entry, tp, sl = align_signals(signals_by_symbol, symbols, timestamps)
+    exit_row, exit_price, reason = find_exits(rows, columns, direction, tp, sl, high, low, close)
+    pnl_per_unit = (exit_price - entry) * direction
+
+    notional = allocate(
+        rows, columns, entry, exit_row, pnl_per_unit, len(symbols), initial_capital,
+        position_fraction, max_symbol_exposure, max_gross_exposure, fee_rate
+    )
+    equity, symbol_pnl, gross_exposure = portfolio_equity(
+        rows, columns, direction, entry, exit_row, pnl_per_unit, notional, close, initial_capital, fee_rate
+    )
+
+    taken = np.flatnonzero(notional > 0)
+    trade_pnl = notional[taken] / entry[taken] * pnl_per_unit[taken] - notional[taken] * fee_rate * 2
+    step = max(1, len(timestamps) // curve_points) if curve_points else 1
+
+    result = portfolio_stats(timestamps, equity, symbol_pnl, gross_exposure, symbols, initial_capital)
+    result.update({
+        'symbols': len(symbols),
+        'bars': len(timestamps),
+        'signals': len(rows),
+        'trades': len(taken),
+        'skipped_signals': len(rows) - len(taken),
+        'win_rate': float((trade_pnl > 0).mean()) * 100 if len(taken) else 0.0,
+        'exit_reasons': {
+            name: int(np.count_nonzero(reason[taken] == code))
+            for code, name in enumerate(('stop_loss', 'take_profit', 'end_of_data'))
+        },
+        'equity_curve': [[float(t), float(e)] for t, e in zip(timestamps[::step], equity[::step])]
+    })
+    return result
+
+
+def benchmark_default_signals(symbols=10, candles=105_120, interval_ms=300_000, seed=0):
+    """Seconds per symbol for a backtest that generates BTCStrategy's signals (default: a year of 5m candles)"""
+    rng = np.random.default_rng(seed)
+    candles_by_symbol = {}
+    for index in range(symbols):
+        closes = 100 * np.exp(np.cumsum(rng.normal(0, 0.002, candles)))
+        opens = np.concatenate([closes[:1], closes[:-1]])
+        candles_by_symbol[f'S{index}'] = np.column_stack([
+            1_700_000_000_000 + interval_ms * np.arange(candles),
+            opens,
+            np.maximum(opens, closes) * (1 + np.abs(rng.normal(0, 0.001, candles))),
+            np.minimum(opens, closes) * (1 - np.abs(rng.normal(0, 0.001, candles))),
+            closes,
+            rng.uniform(1, 10, candles)
+        ])
+    started = time.perf_counter()
+    run_portfolio_backtest(candles_by_symbol)
+    return (time.perf_counter() - started) / symbols
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Backtest many symbols against one capital pool')
+    parser.add_argument('input', nargs='?', help='JSON file with symbols (candleData and optional signals) and options')
+    parser.add_argument('--benchmark', type=int, metavar='SYMBOLS', help='time the default-signal path on this many synthetic symbol-years of 5m candles')
+    parser.add_argument('--budget', type=float, default=1.0, help='benchmark: seconds allowed per symbol-year (exit 1 when over)')
+    args = parser.parse_args()
+
+    if args.benchmark:
+        per_symbol = benchmark_default_signals(args.benchmark)
+        print(f'default signals: {per_symbol:.3f}s per symbol-year (budget {args.budget:.3f}s)')
+        sys.exit(0 if per_symbol <= args.budget else 1)
+
+    try:
+        # Read candles (and optionally signals) per symbol from the input file
+        with open(args.input, 'r') as f:
+            input_data = json.load(f)
+
+        options = input_data.get('options', {})
+        symbols = input_data['symbols']
+        result = run_portfolio_backtest(
+            {symbol: entry['candleData'] for symbol, entry in symbols.items()},
+            {symbol: entry['signals'] for symbol, entry in symbols.items() if 'signals' in entry},
+            initial_capital=float(input_data.get('initialCapital', 10000)),
+            position_fraction=float(options.get('positionFraction', 0.1)),
+            max_symbol_exposure=float(options.get('maxSymbolExposure', 0.25)),
+            max_gross_exposure=float(options.get('maxGrossExposure', 1.0)),
+            fee_rate=float(options.get('feeRate', 0.0)),
+            curve_points=int(options.get('curvePoints', 1000))
+        )
+
+        print(json.dumps(result))
+
+    except Exception as e:
+        print(json.dumps({
+            "error": str(e),
+            "details": {
+                "message": str(e),
+                "type": type(e).__name__
+            }
+        }))
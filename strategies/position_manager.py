@@ -0,0 +1,250 @@
+import heapq
+import numpy as np
+
+# Candles scanned for an exit before the look-ahead window doubles
+INITIAL_EXIT_WINDOW = 32
+
+
+class PositionManager:
+    """
+    Track open positions for a strategy's signals.
+
+    Enforces max_open_trades, sizes each position so that hitting its stop loss
+    costs risk_per_trade percent of the balance (capped at max_leverage times
+    the balance, so tight stops do not blow up the size), and ratchets trailing stops as
+    new highs/lows arrive. Open positions live in fixed-size arrays with one
+    slot per allowed trade.
+
+    process() handles a block of candles at a time and carries open positions
+    over to the next call, so a whole history at once (batch) and one candle
+    per call (live, O(open positions) work) give the same trades.
+    """
+
+    def __init__(self, max_open_trades=2, risk_per_trade=1.0, use_trailing_stop=False,
+                 trailing_stop_distance=0.2, initial_capital=10000.0, max_leverage=1.0):
+        self.max_open_trades = max(1, int(max_open_trades))
+        self.risk_per_trade = float(risk_per_trade)
+        self.use_trailing_stop = bool(use_trailing_stop)
+        self.trailing_stop_distance = float(trailing_stop_distance)
+        self.initial_capital = float(initial_capital)
+        self.max_leverage = float(max_leverage)
+        self.reset()
+
+    @classmethod
+    def from_strategy(cls, strategy):
+        """Build a manager from a strategy's risk management settings"""
+        return cls(
+            strategy.max_open_trades,
+            strategy.risk_per_trade,
+            strategy.use_trailing_stop,
+            strategy.trailing_stop_distance,
+            strategy.initial_capital,
+            strategy.max_leverage
+        )
+
+    def reset(self):
+        """Close the books: no open positions and the balance back to the initial capital"""
+        slots = self.max_open_trades
+        self.balance = self.initial_capital
+        self.active = np.zeros(slots, dtype=bool)
+        self.direction = np.zeros(slots, dtype=np.int8)  # 1 long, -1 short
+        self.entry_price = np.zeros(slots)
+        self.initial_stop = np.zeros(slots)
+        self.stop = np.zeros(slots)
+        self.take_profit = np.zeros(slots)
+        self.size = np.zeros(slots)
+        self.extreme = np.zeros(slots)  # Best price seen since entry
+        self.entry_index = np.zeros(slots, dtype=np.int64)
+        self.entry_time = np.zeros(slots)
+
+    @property
+    def open_count(self):
+        return int(self.active.sum())
+
+    def _find_exit(self, slot, high, low, begin):
+        """
+        Scan candles from `begin` for the slot's exit.
+
+        Returns (offset, price, reason), or None after updating the slot's
+        extreme and trailing stop when the position survives the block.
+        """
+        direction = self.direction[slot]
+        distance = self.trailing_stop_distance / 100
+        stop = self.stop[slot]
+        extreme = self.extreme[slot]
+        window = INITIAL_EXIT_WINDOW
+
+        while begin < len(high):
+            end = min(begin + window, len(high))
+            seg_high = high[begin:end]
+            seg_low = low[begin:end]
+
+            if direction == 1:
+                # Stop in force at each candle uses extremes up to the previous candle
+                extremes = np.maximum.accumulate(np.concatenate(([extreme], seg_high)))
+                stops = np.maximum(stop, extremes[:-1] * (1 - distance)) if self.use_trailing_stop else np.full(len(seg_high), stop)
+                stop_hit = seg_low <= stops
+                target_hit = seg_high >= self.take_profit[slot]
+            else:
+                extremes = np.minimum.accumulate(np.concatenate(([extreme], seg_low)))
+                stops = np.minimum(stop, extremes[:-1] * (1 + distance)) if self.use_trailing_stop else np.full(len(seg_low), stop)
+                stop_hit = seg_high >= stops
+                target_hit = seg_low <= self.take_profit[slot]
+
+            hits = stop_hit | target_hit
+            if hits.any():
+                j = int(np.argmax(hits))
+                # Assume the stop fills first when both levels are inside one candle
+                if stop_hit[j]:
+                    reason = 'trailing_stop' if stops[j] != self.initial_stop[slot] else 'stop_loss'
+                    return begin + j, float(stops[j]), reason
+                return begin + j, float(self.take_profit[slot]), 'take_profit'
+
+            extreme = extremes[-1]
+            if self.use_trailing_stop:
+                stop = max(stop, extreme * (1 - distance)) if direction == 1 else min(stop, extreme * (1 + distance))
+            begin = end
+            window *= 2
+
+        self.extreme[slot] = extreme
+        self.stop[slot] = stop
+        return None
+
+    def _close(self, slot, index, timestamp, price, reason):
+        """Free a slot and return its closed-trade record"""
+        direction = int(self.direction[slot])
+        entry = self.entry_price[slot]
+        pnl = (price - entry) / entry * self.size[slot] * direction
+        self.balance += pnl
+        self.active[slot] = False
+        return {
+            'type': 'long' if direction == 1 else 'short',
+            'entry_index': int(self.entry_index[slot]),
+            'entry_time': float(self.entry_time[slot]),
+            'entry_price': float(entry),
+            'exit_index': int(index),
+            'exit_time': float(timestamp),
+            'exit_price': price,
+            'exit_reason': reason,
+            'position_size': float(self.size[slot]),
+            'pnl': float(pnl),
+            'pnl_percentage': float(pnl / self.size[slot] * 100)
+        }
+
+    def process(self, high, low, timestamps, signals, start_index=0):
+        """
+        Run a block of candles through the manager.
+
+        high, low and timestamps are arrays for candles start_index onward;
+        signals carry the global candle_index they were raised on. Exits on a
+        candle are settled before that candle's signals are considered, and a
+        new position is first checked for exits on the following candle.
+        Returns (accepted signals with sizing attached, closed trades).
+        """
+        high = np.asarray(high, dtype=float)
+        low = np.asarray(low, dtype=float)
+        timestamps = np.asarray(timestamps, dtype=float)
+        accepted = []
+        closed = []
+
+        # Pending exits within this block as (candle offset, slot) -> (price, reason)
+        exits = []
+        exit_info = {}
+
+        def schedule(slot, begin):
+            found = self._find_exit(slot, high, low, begin)
+            if found is not None:
+                offset, price, reason = found
+                heapq.heappush(exits, (offset, slot))
+                exit_info[slot] = (price, reason)
+
+        def settle(until):
+            while exits and exits[0][0] <= until:
+                offset, slot = heapq.heappop(exits)
+                price, reason = exit_info.pop(slot)
+                closed.append(self._close(slot, start_index + offset, timestamps[offset], price, reason))
+
+        # Positions carried over from earlier blocks
+        for slot in np.flatnonzero(self.active):
+            schedule(slot, 0)
+
+        for signal in sorted(signals, key=lambda s: s['candle_index']):
+            offset = int(signal['candle_index']) - start_index
+            settle(offset)
+
+            free = np.flatnonzero(~self.active)
+            if len(free) == 0:
+                continue
+
+            entry = float(signal['entry_price'])
+            risk_fraction = abs(entry - float(signal['sl'])) / entry
+            if risk_fraction == 0:
+                continue
+            size = min(self.balance * self.risk_per_trade / 100 / risk_fraction, self.balance * self.max_leverage)
+            if size <= 0:
+                continue
+            risk_amount = size * risk_fraction
+
+            slot = free[0]
+            direction = 1 if signal['type'] == 'long' else -1
+            stop = float(signal['sl'])
+            if self.use_trailing_stop:
+                trail = entry * (1 - direction * self.trailing_stop_distance / 100)
+                stop = max(stop, trail) if direction == 1 else min(stop, trail)
+
+            self.active[slot] = True
+            self.direction[slot] = direction
+            self.entry_price[slot] = entry
+            self.initial_stop[slot] = stop
+            self.stop[slot] = stop
+            self.take_profit[slot] = float(signal['tp'])
+            self.size[slot] = size
+            self.extreme[slot] = entry
+            self.entry_index[slot] = signal['candle_index']
+            self.entry_time[slot] = signal.get('timestamp', timestamps[offset])
+
+            sized = dict(signal, position_size=size, quantity=size / entry, risk_amount=risk_amount)
+            if self.use_trailing_stop:
+                sized['trailing_stop'] = stop
+            accepted.append(sized)
+            schedule(slot, offset + 1)
+
+        settle(len(high))
+        return accepted, closed
+
+    def open_positions(self):
+        """Open positions as plain dicts"""
+        return [
+            {
+                'type': 'long' if self.direction[slot] == 1 else 'short',
+                'entry_index': int(self.entry_index[slot]),
+                'entry_time': float(self.entry_time[slot]),
+                'entry_price': float(self.entry_price[slot]),
+                'stop_loss': float(self.stop[slot]),
+                'initial_stop': float(self.initial_stop[slot]),
+                'take_profit': float(self.take_profit[slot]),
+                'position_size': float(self.size[slot]),
+                'extreme': float(self.extreme[slot])
+            }
+            for slot in np.flatnonzero(self.active)
+        ]
+
+    def to_dict(self):
+        """State for snapshots"""
+        return {'balance': self.balance, 'positions': self.open_positions()}
+
+    def load_dict(self, state):
+        """Restore state produced by to_dict()"""
+        self.reset()
+        self.balance = float(state['balance'])
+        for slot, position in enumerate(state['positions'][:self.max_open_trades]):
+            self.active[slot] = True
+            self.direction[slot] = 1 if position['type'] == 'long' else -1
+            self.entry_price[slot] = position['entry_price']
+            self.initial_stop[slot] = position['initial_stop']
+            self.stop[slot] = position['stop_loss']
+            self.take_profit[slot] = position['take_profit']
+            self.size[slot] = position['position_size']
+            self.extreme[slot] = position['extreme']
+            self.entry_index[slot] = position['entry_index']
+            self.entry_time[slot] = position['entry_time']
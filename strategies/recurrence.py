@@ -0,0 +1,211 @@
+import numpy as np
+
+try:
+    from scipy.signal import lfilter
+except ImportError:  # scipy is optional; the blocked NumPy kernel is used instead
+    lfilter = None
+
+# The NumPy kernel works in blocks of rows: about BLOCK_ELEMENTS values at a
+# time so a block stays in cache, and shorter where decay**-block would overflow
+BLOCK_ELEMENTS = 2 ** 15
+MAX_BLOCK = 2 ** 14
+MAX_SCALE_LOG = np.log(1e150)
+
+
+def _columns(values):
+    """Values as a float64 (n x k) array and whether the input was 1-D"""
+    array = np.asarray(values, dtype=np.float64)
+    if array.ndim == 1:
+        return array[:, None], True
+    if array.ndim != 2:
+        raise ValueError('Expected a 1-D series or a 2-D array of series in columns')
+    return array, False
+
+
+def _block_length(decay, columns):
+    """Power-of-two block for `columns` series decaying by decay, short enough that decay**-block stays finite"""
+    limit = min(MAX_BLOCK, max(64, BLOCK_ELEMENTS // columns))
+    if decay < 1.0:
+        limit = min(limit, max(1.0, MAX_SCALE_LOG / -np.log(decay)))
+    return int(2 ** int(np.log2(limit)))
+
+
+def _smooth_columns(x, alpha, start, block, out):
+    """
+    y[t] = y[t-1] + alpha * (x[t] - y[t-1]) from y[-1] = start down each column, in blocks.
+
+    With d = y - start and u = x - start, within a block
+    d[t] = decay**(t+1) * (d[-1] + alpha * cumsum(u[j] / decay**(j+1))),
+    which is exact algebra; the block length keeps decay**-(j+1) finite.
+    Working on deviations from start keeps a flat series exactly flat.
+    """
+    n, k = x.shape
+    scale = (1.0 - alpha) ** np.arange(1, min(block, n) + 1)[:, None]
+    inverse = 1.0 / scale
+    weight = alpha * scale
+    previous = np.zeros(k)
+    for first in range(0, n, block):
+        rows = min(block, n - first)
+        values = out[first:first + rows]
+        np.subtract(x[first:first + rows], start, out=values)
+        values *= inverse[:rows]
+        np.cumsum(values, axis=0, out=values)
+        values *= weight[:rows]
+        # The carried-in value decays like the seed of the block
+        values += scale[:rows] * previous
+        previous = values[-1].copy()
+        values += start
+
+
+def _smooth_blocked(x, alpha, start, out):
+    """
+    Blocked NumPy kernel over the columns of x.
+
+    Columns are grouped by block length so slowly decaying spans are not cut
+    into the short blocks fast ones need; alpha == 1 columns follow the input.
+    """
+    decay = 1.0 - alpha
+    blocks = np.array([_block_length(d, len(decay)) if d > 0 else 0 for d in decay])
+    order = np.argsort(blocks, kind='stable')
+    if np.any(order != np.arange(len(order))):
+        # Make each group a contiguous range of columns, then put them back
+        result = np.empty_like(out)
+        _smooth_blocked(np.ascontiguousarray(x[:, order]), alpha[order], start[order], result)
+        out[:, order] = result
+        return
+
+    bounds = np.flatnonzero(np.diff(blocks)) + 1
+    for lo, hi in zip(np.concatenate([[0], bounds]), np.concatenate([bounds, [len(blocks)]])):
+        if blocks[lo] == 0:
+            out[:, lo:hi] = x[:, lo:hi]
+        else:
+            _smooth_columns(x[:, lo:hi], alpha[lo:hi], start[lo:hi], int(blocks[lo]), out[:, lo:hi])
+
+
+def _smooth_lfilter(x, alpha, start, out):
+    """_smooth_blocked through scipy.signal.lfilter, one call per distinct alpha"""
+    for value in np.unique(alpha):
+        columns = alpha == value
+        deviation = x[:, columns] - start[columns]
+        out[:, columns] = lfilter([value], [1.0, value - 1.0], deviation, axis=0) + start[columns]
+
+
+def smooth(values, alpha, seed=None):
+    """
+    Exponential smoothing y[t] = y[t-1] + alpha * (x[t] - y[t-1]) of each column.
+
+    values is a 1-D series or an (n x k) array of k series; alpha and seed
+    are scalars or one per column. seed is the output just before values
+    (to continue an earlier call); without it the series starts at its first
+    value, like pandas ewm(adjust=False). The recursion runs on deviations
+    from the seed, so a flat series stays exactly flat. Inputs must be
+    finite. Returns an array shaped like values.
+    """
+    x, flat = _columns(values)
+    if not np.all(np.isfinite(x)):
+        raise ValueError('smooth() needs finite values; a NaN or inf would carry into every later output')
+    n, k = x.shape
+    alpha = np.broadcast_to(np.asarray(alpha, dtype=np.float64), (k,))
+    out = np.empty((n, k))
+    if n:
+        if seed is None:
+            start = x[0].copy()
+        else:
+            start = np.broadcast_to(np.asarray(seed, dtype=np.float64), (k,))
+            if not np.all(np.isfinite(start)):
+                raise ValueError('smooth() needs a finite seed')
+        if lfilter is not None:
+            _smooth_lfilter(x, alpha, start, out)
+        else:
+            _smooth_blocked(x, alpha, start, out)
+    return out[:, 0] if flat else out
+
+
+def ema_alpha(span):
+    return 2.0 / (np.asarray(span, dtype=np.float64) + 1.0)
+
+
+def ema(values, span, seed=None):
+    """
+    EMA with pandas ewm(span=span, adjust=False) semantics.
+
+    span may be a sequence: a 1-D series is then filtered once per span and
+    the result has one column per span, so a sweep over many spans is a
+    single call. Without scipy this is a convenience rather than a speed-up:
+    it costs about the same as a loop of pandas ewm() calls.
+    """
+    spans = np.asarray(span, dtype=np.float64)
+    x = np.asarray(values, dtype=np.float64)
+    if spans.ndim and x.ndim == 1:
+        # A read-only view with the series in every column; nothing is copied
+        x = np.broadcast_to(x[:, None], (len(x), len(spans)))
+    return smooth(x, ema_alpha(spans), seed)
+
+
+def wilder(values, period, seed=None):
+    """Wilder's smoothing (RMA), the EMA with alpha = 1 / period used by Wilder's RSI and ATR"""
+    return smooth(values, 1.0 / np.asarray(period, dtype=np.float64), seed)
+
+
+def rolling_sum(values, period):
+    """
+    Sums of each full window of period values (NaN before the first), in
+    O(n log period).
+
+    Windows are added up from power-of-two partial sums that start at the
+    window's own first value, so a result depends only on the values in its
+    window, not on the history before it as with pandas' running totals.
+    Computing a suffix of a series therefore gives exactly the values of a
+    whole-series run.
+    """
+    values = np.asarray(values, dtype=np.float64)
+    total = np.full(len(values), np.nan)
+    if len(values) >= period:
+        windows = len(values) - period + 1
+        # pieces[j] is the sum of the `size` values from j
+        pieces, size, covered = values, 1, 0
+        window_sum = None
+        while size <= period:
+            if period & size:
+                part = pieces[covered:covered + windows]
+                window_sum = part.copy() if window_sum is None else window_sum + part
+                covered += size
+            if size * 2 <= period:
+                pieces = pieces[:-size] + pieces[size:]
+            size *= 2
+        total[period - 1:] = window_sum
+    return total
+
+
+def rolling_std(values, period):
+    """
+    Sample standard deviation of each full window, built like rolling_sum.
+
+    Pieces carry their mean and sum of squared deviations and are merged
+    with Chan et al.'s update, which stays accurate for prices far from zero
+    and gives exactly 0 for flat windows.
+    """
+    values = np.asarray(values, dtype=np.float64)
+    std = np.full(len(values), np.nan)
+    if period > 1 and len(values) >= period:
+        windows = len(values) - period + 1
+        means, squares, size, covered = values, np.zeros(len(values)), 1, 0
+        window_mean = window_squares = None
+        while size <= period:
+            if period & size:
+                mean = means[covered:covered + windows]
+                square = squares[covered:covered + windows]
+                if window_mean is None:
+                    window_mean, window_squares = mean.copy(), square.copy()
+                else:
+                    delta = mean - window_mean
+                    window_squares = window_squares + square + delta * delta * (covered * size / (covered + size))
+                    window_mean = window_mean + delta * (size / (covered + size))
+                covered += size
+            if size * 2 <= period:
+                delta = means[size:] - means[:-size]
+                squares = squares[:-size] + squares[size:] + delta * delta * (size / 2)
+                means = means[:-size] + delta / 2
+            size *= 2
+        std[period - 1:] = np.sqrt(window_squares / (period - 1))
+    return std
@@ -0,0 +1,218 @@
+import numpy as np
+import argparse
+import json
+import sys
+import time
+
+from btc_strategy import BTCStrategy
+from engine_diff import load_candles
+from scalping_strategy import ScalpingStrategy
+from synthetic_data import synthetic_candles
+
+# Histogram bucket edges in ms, log-spaced from 10 µs to 10 s
+HISTOGRAM_EDGES = np.logspace(-2, 4, 25)
+
+MODES = ('update', 'delta', 'btc')
+
+
+class LatencyHistogram:
+    """Per-update latencies with log-spaced buckets and exact percentiles"""
+
+    def __init__(self, edges=HISTOGRAM_EDGES):
+        self.edges = np.asarray(edges, dtype=float)
+        self.values = []
+
+    def add(self, ms):
+        self.values.append(ms)
+
+    def summary(self):
+        values = np.asarray(self.values, dtype=float)
+        if values.size == 0:
+            return {'count': 0}
+        counts = np.bincount(np.searchsorted(self.edges, values), minlength=len(self.edges) + 1)
+        return {
+            'count': int(values.size),
+            'mean': float(values.mean()),
+            'p50': float(np.percentile(values, 50)),
+            'p90': float(np.percentile(values, 90)),
+            'p99': float(np.percentile(values, 99)),
+            'max': float(values.max()),
+            'buckets': [
+                {'le_ms': float(edge) if i < len(self.edges) else None, 'count': int(count)}
+                for i, (edge, count) in enumerate(zip(np.append(self.edges, np.inf), counts))
+                if count
+            ]
+        }
+
+
+def _signal_key(signal):
+    """Fields that must agree between a live and a batch signal"""
+    return tuple(sorted(
+        (key, round(float(value), 10) if isinstance(value, (int, float)) else value)
+        for key, value in signal.items()
+    ))
+
+
+class ReplaySimulator:
+    """
+    Push recorded candles through a strategy one at a time and check them against a batch run.
+
+    mode 'update' streams into ScalpingStrategy.update(), 'delta' polls
+    ScalpingStrategy.analyze() with the growing history and a cursor like a
+    client does, and 'btc' re-runs BTCStrategy.calculate() with a cursor.
+    speed=None replays as fast as possible; speed=N sleeps so candles arrive
+    at N times their recorded pace.
+    """
+
+    def __init__(self, config=None, mode='update', speed=None):
+        if mode not in MODES:
+            raise ValueError(f"Unknown replay mode '{mode}'")
+        self.config = dict(config or {})
+        self.mode = mode
+        self.speed = speed
+
+    def batch_signals(self, candles):
+        """Signals of one batch run, grouped by the step (candle) that raises them"""
+        if self.mode == 'btc':
+            signals = BTCStrategy(candles).calculate()
+        else:
+            result = ScalpingStrategy(self.config).analyze(candles)
+            if not result.get('success'):
+                raise RuntimeError(result.get('message'))
+            signals = result['signals']
+
+        # A signal on a filled-in candle is raised when the next real candle arrives
+        timestamps = np.array([float(c['timestamp']) for c in candles])
+        by_step = {}
+        for signal in signals:
+            step = int(np.searchsorted(timestamps, float(signal['timestamp'])))
+            by_step.setdefault(step, []).append(signal)
+        return by_step
+
+    def _stepper(self, candles):
+        """Callable taking the step index and returning the signals emitted for that candle"""
+        if self.mode == 'update':
+            strategy = ScalpingStrategy(self.config)
+            return lambda i: strategy.update([candles[i]])
+
+        if self.mode == 'delta':
+            strategy = ScalpingStrategy(self.config)
+            cursor = [None]
+
+            def step(i):
+                result = strategy.analyze(candles[:i + 1], cursor=cursor[0])
+                if not result.get('success'):
+                    # Too little history yet; a client would get no signals either
+                    return []
+                cursor[0] = result['cursor']
+                return result['signals']
+            return step
+
+        def step(i):
+            if i == 0:
+                return []
+            return BTCStrategy(candles[:i + 1]).calculate(cursor=candles[i - 1]['timestamp'])
+        return step
+
+    def run(self, candles, fail_fast=False):
+        """Replay the candles; returns a report with parity results and the latency histogram"""
+        expected = self.batch_signals(candles)
+        step = self._stepper(candles)
+        histogram = LatencyHistogram()
+        mismatches = []
+        emitted = 0
+
+        wall_start = time.perf_counter()
+        first_time = float(candles[0]['timestamp']) if candles else 0.0
+        for i, candle in enumerate(candles):
+            if self.speed:
+                delay = wall_start + (float(candle['timestamp']) - first_time) / 1000 / self.speed - time.perf_counter()
+                if delay > 0:
+                    time.sleep(delay)
+
+            start = time.perf_counter()
+            signals = step(i)
+            histogram.add((time.perf_counter() - start) * 1000)
+            emitted += len(signals)
+
+            want = sorted(map(_signal_key, expected.get(i, [])))
+            got = sorted(map(_signal_key, signals))
+            if got != want:
+                mismatches.append({
+                    'step': i,
+                    'timestamp': candle['timestamp'],
+                    'live': signals,
+                    'batch': expected.get(i, [])
+                })
+                if fail_fast:
+                    break
+
+        return {
+            'mode': self.mode,
+            'speed': self.speed,
+            'candles': len(candles),
+            'batch_signals': sum(len(s) for s in expected.values()),
+            'live_signals': emitted,
+            'parity': not mismatches,
+            'mismatches': mismatches[:20],
+            'mismatch_count': len(mismatches),
+            'wall_seconds': time.perf_counter() - wall_start,
+            'latency_ms': histogram.summary()
+        }
+
+
+def format_report(report):
+    """Parity verdict and a text histogram of the per-update latencies"""
+    latency = report['latency_ms']
+    lines = [
+        f"{report['mode']}: {report['candles']} candles in {report['wall_seconds']:.2f}s, "
+        f"live {report['live_signals']} / batch {report['batch_signals']} signals, "
+        f"parity {'OK' if report['parity'] else 'FAILED (' + str(report['mismatch_count']) + ' steps)'}"
+    ]
+    if latency.get('count'):
+        lines.append(
+            f"latency ms: p50 {latency['p50']:.3f}  p90 {latency['p90']:.3f}  "
+            f"p99 {latency['p99']:.3f}  max {latency['max']:.3f}"
+        )
+        peak = max(bucket['count'] for bucket in latency['buckets'])
+        for bucket in latency['buckets']:
+            label = f"<= {bucket['le_ms']:.3g}" if bucket['le_ms'] is not None else '>  max'
+            lines.append(f"  {label:>10} ms {bucket['count']:>8} {'#' * max(1, round(40 * bucket['count'] / peak))}")
+    for mismatch in report['mismatches'][:3]:
+        lines.append(f"  step {mismatch['step']}: live {len(mismatch['live'])} vs batch {len(mismatch['batch'])} signals")
+    return '\n'.join(lines)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Replay candles one at a time and check live/batch signal parity')
+    parser.add_argument('--candles', help='recorded candle file (JSON array, JSON lines or CSV)')
+    parser.add_argument('--synthetic', type=int, default=2000, help='replay this many synthetic candles instead')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--drop', type=int, default=0, help='remove this many random candles to replay a series with gaps')
+    parser.add_argument('--fill-gaps', action='store_true', help='run the strategy with fillGaps')
+    parser.add_argument('--config', help='JSON file with the ScalpingStrategy configuration')
+    parser.add_argument('--mode', default='update', choices=MODES)
+    parser.add_argument('--speed', type=float, help='replay at N times real time (default: as fast as possible)')
+    parser.add_argument('--fail-fast', action='store_true')
+    parser.add_argument('--report', help='write the full JSON report to this file')
+    args = parser.parse_args()
+
+    config = None
+    if args.config:
+        with open(args.config, 'r') as f:
+            config = json.load(f)
+    if args.fill_gaps:
+        config = dict(config or {}, fillGaps=True)
+    candles = load_candles(args.candles) if args.candles else synthetic_candles(args.synthetic, args.seed)
+    if args.drop:
+        # Keep the first candles so the interval is learned from regular spacing
+        dropped = set(np.random.default_rng(args.seed).choice(np.arange(2, len(candles)), args.drop, replace=False).tolist())
+        candles = [c for i, c in enumerate(candles) if i not in dropped]
+
+    report = ReplaySimulator(config, args.mode, args.speed).run(candles, args.fail_fast)
+
+    if args.report:
+        with open(args.report, 'w') as f:
+            json.dump(report, f, indent=2)
+    print(format_report(report))
+    sys.exit(0 if report['parity'] else 1)
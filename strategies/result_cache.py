@@ -0,0 +1,319 @@
+import numpy as np
+import ast
+import hashlib
+import json
+import os
+import struct
+import tempfile
+import threading
+import zlib
+
+CACHE_MAGIC = b'PCRC'
+CACHE_VERSION = 1
+CACHE_PREFIX = struct.Struct('<4sBI')
+
+CANDLE_FIELDS = ['timestamp', 'open', 'high', 'low', 'close', 'volume']
+
+STRATEGY_DIR = os.path.dirname(os.path.abspath(__file__))
+
+# Entry module of each engine; the strategy modules it imports are found from its source
+ENGINE_MODULES = {
+    'scalping': 'scalping_strategy.py',
+    'btc': 'btc_strategy.py'
+}
+
+DEFAULT_MAX_BYTES = 256 * 2 ** 20
+
+_code_versions = {}
+
+
+def engine_sources(engine):
+    """The engine's entry module and every strategy module it imports, directly or not"""
+    sources = []
+    queue = [ENGINE_MODULES[engine]]
+    while queue:
+        name = queue.pop()
+        if name in sources:
+            continue
+        sources.append(name)
+        with open(os.path.join(STRATEGY_DIR, name), 'rb') as f:
+            tree = ast.parse(f.read(), filename=name)
+        for node in ast.walk(tree):
+            if isinstance(node, ast.Import):
+                modules = [alias.name for alias in node.names]
+            elif isinstance(node, ast.ImportFrom) and node.module and not node.level:
+                modules = [node.module]
+            else:
+                continue
+            for module in modules:
+                path = module.split('.')[0] + '.py'
+                if os.path.exists(os.path.join(STRATEGY_DIR, path)):
+                    queue.append(path)
+    return sorted(sources)
+
+
+def code_version(engine):
+    """Hash of the engine's source files, so edits to the strategy code invalidate its entries"""
+    if engine not in _code_versions:
+        digest = hashlib.sha256()
+        for name in engine_sources(engine):
+            digest.update(name.encode('utf-8') + b'\x00')
+            with open(os.path.join(STRATEGY_DIR, name), 'rb') as f:
+                digest.update(f.read())
+        _code_versions[engine] = digest.hexdigest()[:16]
+    return _code_versions[engine]
+
+
+def _canonical_value(value):
+    """Numeric strings become numbers, since the strategies parse '14' and 14 alike"""
+    if isinstance(value, dict):
+        return {str(k): _canonical_value(v) for k, v in value.items() if v is not None}
+    if isinstance(value, (list, tuple)):
+        return [_canonical_value(v) for v in value]
+    if isinstance(value, bool) or value is None:
+        return value
+    if isinstance(value, (int, float)):
+        return float(value)
+    if isinstance(value, str):
+        try:
+            return float(value)
+        except ValueError:
+            return value
+    return str(value)
+
+
+def canonical_config(config):
+    """Config as a stable JSON string, independent of key order and number formatting"""
+    return json.dumps(_canonical_value(config or {}), sort_keys=True, separators=(',', ':'))
+
+
+def fingerprint_candles(candle_data):
+    """Hash of the OHLCV values of a candle list, DataFrame or (n x 6) array"""
+    if isinstance(candle_data, np.ndarray):
+        array = candle_data
+    elif hasattr(candle_data, 'columns'):
+        array = candle_data[CANDLE_FIELDS].to_numpy(dtype=float)
+    else:
+        array = np.array([[c[field] for field in CANDLE_FIELDS] for c in candle_data], dtype=float)
+    array = np.ascontiguousarray(array, dtype=np.float64)
+    return hashlib.sha256(array.tobytes()).hexdigest()
+
+
+def _pack_records(records):
+    """Split homogeneous dicts into a numeric float64 matrix and JSON for everything else"""
+    numeric = []
+    if records:
+        numeric = [
+            key for key, value in records[0].items()
+            if isinstance(value, (int, float, np.number)) and not isinstance(value, bool)
+            and all(isinstance(r.get(key), (int, float, np.number)) for r in records)
+        ]
+    matrix = np.array([[r[key] for key in numeric] for r in records], dtype=np.float64).reshape(len(records), len(numeric))
+    integer = [key for key in numeric if all(isinstance(r[key], (int, np.integer)) for r in records)]
+    other = [{k: v for k, v in r.items() if k not in numeric} for r in records]
+    return {'numeric': numeric, 'integer': integer, 'other': other, 'rows': len(records)}, matrix
+
+
+def _unpack_records(meta, matrix):
+    integer = set(meta['integer'])
+    records = []
+    for row, other in zip(matrix.tolist(), meta['other']):
+        record = {}
+        for key, value in zip(meta['numeric'], row):
+            record[key] = int(value) if key in integer else value
+        record.update(other)
+        records.append(record)
+    return records
+
+
+def summarize_trades(trades, initial_capital=10000.0):
+    """Headline stats of a result's closed trades"""
+    pnl = np.array([t['pnl'] for t in trades], dtype=float)
+    equity = initial_capital + np.cumsum(pnl)
+    peaks = np.maximum.accumulate(np.concatenate([[initial_capital], equity]))[1:]
+    return {
+        'trades': len(trades),
+        'win_rate': float((pnl > 0).mean()) * 100 if len(pnl) else 0.0,
+        'total_pnl': float(pnl.sum()),
+        'final_balance': float(equity[-1]) if len(pnl) else initial_capital,
+        'max_drawdown': float(((peaks - equity) / peaks).max()) * 100 if len(pnl) else 0.0
+    }
+
+
+class ResultCache:
+    """
+    Disk-backed cache of strategy results keyed by candle data, config and code version.
+
+    Each entry is one file: a fixed prefix, a JSON header and the record
+    lists (signals, trades) as float64 matrices, zlib-compressed. File
+    modification times track recency; once the directory grows past max_bytes
+    the least recently used entries are removed. Entries survive restarts and
+    are shared by every process using the directory.
+    """
+
+    SUFFIX = '.result'
+
+    def __init__(self, directory=None, max_bytes=DEFAULT_MAX_BYTES):
+        if directory is None:
+            directory = os.path.join(tempfile.gettempdir(), 'profitcraft_results')
+        os.makedirs(directory, exist_ok=True)
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def key(self, engine, candle_data, config=None, data_key=None):
+        """
+        Cache key for running engine on candle_data with config.
+
+        data_key (e.g. symbol, interval and time range of a KlineLoader load)
+        stands in for hashing the candles when the caller already knows it.
+        """
+        data = json.dumps(data_key, sort_keys=True) if data_key is not None else fingerprint_candles(candle_data)
+        parts = [engine, code_version(engine), canonical_config(config), data]
+        return hashlib.sha256('\x00'.join(parts).encode()).hexdigest()
+
+    def _path(self, key):
+        return os.path.join(self.directory, key + self.SUFFIX)
+
+    def get(self, key):
+        """The stored result for key, or None"""
+        path = self._path(key)
+        try:
+            with open(path, 'rb') as f:
+                blob = f.read()
+        except FileNotFoundError:
+            self.misses += 1
+            return None
+
+        try:
+            result = self._decode(blob)
+        except (ValueError, struct.error, zlib.error):
+            # Unreadable entry (older format or partial copy): drop it and recompute
+            self._remove(path)
+            self.misses += 1
+            return None
+
+        try:
+            os.utime(path)
+        except OSError:
+            pass
+        self.hits += 1
+        return result
+
+    def put(self, key, result):
+        """
+        Store a result (a dict whose list-of-dict values are stored columnar).
+        A result larger than max_bytes is not stored, as eviction would drop it.
+        """
+        blob = self._encode(result)
+        if len(blob) > self.max_bytes:
+            return
+        fd, tmp_path = tempfile.mkstemp(dir=self.directory, suffix='.tmp')
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                f.write(blob)
+            os.replace(tmp_path, self._path(key))
+        finally:
+            # Only left behind when the write or rename failed
+            self._remove(tmp_path)
+        self._evict()
+
+    def _encode(self, result):
+        header = {'fields': {}, 'tables': {}}
+        matrices = []
+        for name, value in result.items():
+            if isinstance(value, list) and all(isinstance(v, dict) for v in value):
+                meta, matrix = _pack_records(value)
+                header['tables'][name] = meta
+                matrices.append(matrix.tobytes())
+            else:
+                header['fields'][name] = value
+        header_bytes = json.dumps(header, separators=(',', ':')).encode('utf-8')
+        payload = zlib.compress(header_bytes + b''.join(matrices), 6)
+        return CACHE_PREFIX.pack(CACHE_MAGIC, CACHE_VERSION, len(header_bytes)) + payload
+
+    def _decode(self, blob):
+        magic, version, header_length = CACHE_PREFIX.unpack_from(blob)
+        if magic != CACHE_MAGIC or version != CACHE_VERSION:
+            raise ValueError('Not a result cache entry of this version')
+        payload = zlib.decompress(blob[CACHE_PREFIX.size:])
+        header = json.loads(payload[:header_length].decode('utf-8'))
+
+        result = dict(header['fields'])
+        offset = header_length
+        for name, meta in header['tables'].items():
+            count = meta['rows'] * len(meta['numeric'])
+            matrix = np.frombuffer(payload, dtype=np.float64, count=count, offset=offset)
+            offset += count * 8
+            result[name] = _unpack_records(meta, matrix.reshape(meta['rows'], len(meta['numeric'])))
+        return result
+
+    def _remove(self, path):
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass
+
+    def _evict(self):
+        """Remove least recently used entries until the cache fits in max_bytes"""
+        with self.lock:
+            entries = []
+            total = 0
+            for entry in os.scandir(self.directory):
+                if entry.name.endswith(self.SUFFIX):
+                    try:
+                        stat = entry.stat()
+                    except FileNotFoundError:
+                        # Removed by another process since the scan listed it
+                        continue
+                    entries.append((stat.st_mtime, stat.st_size, entry.path))
+                    total += stat.st_size
+            if total <= self.max_bytes:
+                return
+            for _, size, path in sorted(entries):
+                self._remove(path)
+                total -= size
+                if total <= self.max_bytes:
+                    break
+
+    def clear(self):
+        for entry in os.scandir(self.directory):
+            if entry.name.endswith(self.SUFFIX):
+                self._remove(entry.path)
+
+    def analyze(self, strategy, candle_data, data_key=None, include_indicators=False):
+        """
+        ScalpingStrategy.analyze through the cache.
+
+        Stores signals, trades and summary stats; the per-candle indicator map
+        is only computed (and never cached) when include_indicators is set.
+        A cache hit leaves the strategy's streaming state untouched, so use
+        analyze() directly when the next call will pass a cursor.
+        """
+        key = self.key('scalping', candle_data, strategy.config, data_key)
+        cached = self.get(key)
+        if cached is not None and not include_indicators:
+            return dict(cached, cached=True)
+
+        result = strategy.analyze(candle_data)
+        if not result.get('success'):
+            return result
+        stored = {k: v for k, v in result.items() if k != 'indicators'}
+        stored['stats'] = summarize_trades(result.get('trades', []), strategy.initial_capital)
+        if cached is None:
+            self.put(key, stored)
+        return dict(result, stats=stored['stats']) if include_indicators else dict(stored, cached=False)
+
+    def calculate_btc(self, candle_data, cursor=None, data_key=None):
+        """BTCStrategy(candle_data).calculate(cursor) through the cache"""
+        from btc_strategy import BTCStrategy
+
+        key = self.key('btc', candle_data, {'cursor': cursor}, data_key)
+        cached = self.get(key)
+        if cached is not None:
+            return cached['signals']
+        signals = BTCStrategy(candle_data).calculate(cursor)
+        self.put(key, {'signals': signals})
+        return signals
@@ -0,0 +1,49 @@
+/**
+ * Scalping Engine Bridge
+ *
+ * Runs Scalping_Strategy.js on candle data read from stdin so that other
+ * tools (engine_diff.py) can drive the JS engine with exactly the same inputs
+ * as the Python one.
+ *
+ * Input (stdin):  { "config": {...}, "candleData": [...], "repeats": 1 }
+ * Output (stdout): { "result": <analyze() result>, "timingsMs": [...] }
+ */
+
+// The strategy logs every step to stdout; keep stdout for the JSON result
+const verbose = process.env.SCALPING_BRIDGE_VERBOSE === '1';
+console.log = verbose ? console.error : () => {};
+
+const ScalpingStrategy = require('./Scalping_Strategy');
+
+let input = '';
+process.stdin.setEncoding('utf8');
+process.stdin.on('data', (chunk) => {
+    input += chunk;
+});
+
+process.stdin.on('end', () => {
+    try {
+        const { config = {}, candleData, repeats = 1 } = JSON.parse(input);
+        const timingsMs = [];
+        let result = null;
+
+        for (let i = 0; i < Math.max(1, repeats); i++) {
+            // Fresh instance per run so active-trade state does not leak between runs
+            const strategy = new ScalpingStrategy(config);
+            const start = process.hrtime.bigint();
+            result = strategy.analyze(candleData);
+            timingsMs.push(Number(process.hrtime.bigint() - start) / 1e6);
+        }
+
+        process.stdout.write(JSON.stringify({ result, timingsMs }));
+    } catch (error) {
+        process.stdout.write(JSON.stringify({
+            error: error.message,
+            details: {
+                message: error.message,
+                type: error.name
+            }
+        }));
+        process.exitCode = 1;
+    }
+});
@@ -1,11 +1,27 @@
 import pandas as pd
 import numpy as np
+import copy
+import json
+import os
+import struct
+import tempfile
+import threading
 from datetime import datetime
+from candle_sanitizer import CANDLE_FIELDS, SUMMED_FIELDS, bridge_gap, infer_interval, merge_reports, sanitize_frame
+from candle_stream import iter_candle_blocks
+from position_manager import PositionManager
+from recurrence import ema, rolling_std, rolling_sum, smooth
+
+# Binary snapshot layout: magic, format version, header length, tail rows
+SNAPSHOT_MAGIC = b'PCSS'
+SNAPSHOT_VERSION = 2
+SNAPSHOT_PREFIX = struct.Struct('<4sBII')
 
 class ScalpingStrategy:
     def __init__(self, config=None):
         if config is None:
             config = {}
+        self.config = dict(config)
             
         # Core settings
         self.timeframe = config.get('timeframe', '1m')
@@ -19,6 +35,12 @@ class ScalpingStrategy:
         self.max_open_trades = int(config.get('maxOpenTrades', 2))
         self.use_trailing_stop = config.get('useTrailingStop', False)
         self.trailing_stop_distance = float(config.get('trailingStopDistance', 0.2))
+        self.initial_capital = float(config.get('initialCapital', 10000))
+        self.max_leverage = float(config.get('maxLeverage', 1))
+        
+        # Candle cleaning: gaps are reported, and forward-filled when fillGaps is set
+        self.fill_gaps = config.get('fillGaps', False)
+        self.data_quality = None
         
         # Technical indicators configuration
         self.indicators = {
@@ -101,6 +123,10 @@ class ScalpingStrategy:
         self.positions = []
         self.signals = []
         self.last_candle = None
+        self._lock = threading.RLock()
+        # Strategy whose update() stream follows analyze() cursors
+        self._cursor_stream = None
+        self.reset_stream()
     
     # Technical Indicator Helper Methods
     def _calculate_rsi(self, data, period=14):
@@ -118,8 +144,8 @@ class ScalpingStrategy:
         loss = -loss  # Make losses positive
         
         # First calculations
-        avg_gain = gain.rolling(window=period).mean()
-        avg_loss = loss.rolling(window=period).mean()
+        avg_gain = self._calculate_sma(gain, period)
+        avg_loss = self._calculate_sma(loss, period)
         
         # Calculate RS and RSI
         rs = avg_gain / avg_loss
@@ -127,17 +153,45 @@ class ScalpingStrategy:
         
         return rsi
     
-    def _calculate_ema(self, data, period):
+    def _calculate_ema(self, data, period, seed=None):
         """
         Calculate EMA (Exponential Moving Average)
+
+        seed is the EMA value of the candle just before data, used to continue
+        a series computed by an earlier call.
         """
-        return data.ewm(span=period, adjust=False).mean()
+        return pd.Series(ema(data.to_numpy(dtype=float), period, seed), index=data.index)
+    
+    def _calculate_emas(self, data, periods, seeds=None):
+        """
+        EMAs of one series for several periods in a single filter pass.
+
+        Returns one array per period; seeds (one per period) continue an
+        earlier call like _calculate_ema's seed.
+        """
+        values = ema(data.to_numpy(dtype=float), list(periods), seeds)
+        return [values[:, i] for i in range(len(periods))]
     
     def _calculate_sma(self, data, period):
         """
         Calculate SMA (Simple Moving Average)
         """
-        return data.rolling(window=period).mean()
+        return self._rolling_sum(data, period) / period
+    
+    def _rolling_sum(self, data, period):
+        """
+        Calculate a rolling sum over full windows
+
+        Each value depends only on its own window (see recurrence.rolling_sum),
+        so streamed blocks reproduce whole-series results exactly.
+        """
+        return pd.Series(rolling_sum(data.to_numpy(dtype=float), period), index=data.index)
+    
+    def _rolling_std(self, data, period):
+        """
+        Calculate a rolling sample standard deviation over full windows
+        """
+        return pd.Series(rolling_std(data.to_numpy(dtype=float), period), index=data.index)
     
     def _calculate_true_range(self, high, low, close):
         """
@@ -158,25 +212,35 @@ class ScalpingStrategy:
         Calculate ATR (Average True Range)
         """
         tr = self._calculate_true_range(high, low, close)
-        return tr.rolling(window=period).mean()
+        return self._calculate_sma(tr, period)
     
-    def _calculate_macd(self, close, fast_period=12, slow_period=26, signal_period=9):
+    def _calculate_macd(self, close, fast_period=12, slow_period=26, signal_period=9, state=None):
         """
         Calculate MACD (Moving Average Convergence Divergence)
+
+        Pass the same state dict on successive calls to continue the series.
         """
+        if state is None:
+            state = {}
+        
         # Calculate EMAs
-        fast_ema = self._calculate_ema(close, fast_period)
-        slow_ema = self._calculate_ema(close, slow_period)
+        seeds = [state['fast_ema'], state['slow_ema']] if 'fast_ema' in state else None
+        fast_ema, slow_ema = self._calculate_emas(close, [fast_period, slow_period], seeds)
         
         # Calculate MACD line
-        macd_line = fast_ema - slow_ema
+        macd_line = pd.Series(fast_ema - slow_ema, index=close.index)
         
         # Calculate signal line
-        signal_line = self._calculate_ema(macd_line, signal_period)
+        signal_line = self._calculate_ema(macd_line, signal_period, state.get('signal'))
         
         # Calculate histogram
         histogram = macd_line - signal_line
         
+        if len(close):
+            state['fast_ema'] = float(fast_ema[-1])
+            state['slow_ema'] = float(slow_ema[-1])
+            state['signal'] = float(signal_line.iloc[-1])
+        
         return macd_line, signal_line, histogram
     
     def _calculate_bollinger_bands(self, close, period=20, std_dev=2):
@@ -187,7 +251,7 @@ class ScalpingStrategy:
         middle_band = self._calculate_sma(close, period)
         
         # Calculate standard deviation
-        rolling_std = close.rolling(window=period).std()
+        rolling_std = self._rolling_std(close, period)
         
         # Calculate upper and lower bands
         upper_band = middle_band + (rolling_std * std_dev)
@@ -208,106 +272,171 @@ class ScalpingStrategy:
         )
         
         # Calculate %K and %D lines
-        k = stoch_rsi.rolling(window=k_period).mean() * 100
-        d = k.rolling(window=d_period).mean()
+        k = self._calculate_sma(stoch_rsi, k_period) * 100
+        d = self._calculate_sma(k, d_period)
         
         return k, d
     
-    def _calculate_parabolic_sar(self, high, low, close, step=0.02, max_step=0.2):
+    def _calculate_parabolic_sar(self, high, low, close, step=0.02, max_step=0.2, state=None):
         """
         Calculate Parabolic SAR manually
+
+        Pass the same state dict on successive calls to continue the series.
         """
-        length = len(high)
-        if length < 2:
-            return pd.Series([np.nan] * length, index=close.index)
-        
-        # Initialize series
-        psar = pd.Series([np.nan] * length, index=close.index)
-        psarbull = [False] * length
-        psarbear = [False] * length
-        af = step  # Acceleration factor
-        
-        # Set initial values
-        ep_bull = low.iloc[0]  # Extreme point for bulls
-        ep_bear = high.iloc[0]  # Extreme point for bears
-        
-        # Assume we start with a bull trend
-        psar.iloc[0] = low.iloc[0]
-        psarbull[0] = True
-        
-        for i in range(1, length):
-            # Previous SAR value
-            prev_psar = psar.iloc[i-1]
+        if state is None:
+            state = {}
+        
+        highs = high.to_numpy(dtype=float)
+        lows = low.to_numpy(dtype=float)
+        length = len(highs)
+        psar = np.full(length, np.nan)
+        if length == 0:
+            return pd.Series(psar, index=close.index)
+        
+        if 'psar' in state:
+            # Continue the previous run; its last two candles bound the next SAR values
+            offset = len(state['highs'])
+            highs = np.concatenate((state['highs'], highs))
+            lows = np.concatenate((state['lows'], lows))
+            prev_psar = state['psar']
+            bull = state['bull']
+            af = state['af']
+            ep_bull = state['ep_bull']  # Extreme point for bulls
+            ep_bear = state['ep_bear']  # Extreme point for bears
+            first = offset
+        else:
+            offset = 0
+            af = step  # Acceleration factor
+            ep_bull = lows[0]
+            ep_bear = highs[0]
             
+            # Assume we start with a bull trend
+            prev_psar = lows[0]
+            bull = True
+            psar[0] = prev_psar
+            first = 1
+        
+        for i in range(first, len(highs)):
             # Bull trend
-            if psarbull[i-1]:
-                psar.iloc[i] = prev_psar + af * (ep_bull - prev_psar)
+            if bull:
+                value = prev_psar + af * (ep_bull - prev_psar)
                 
                 # Make sure SAR is below the previous two lows
-                psar.iloc[i] = min(psar.iloc[i], low.iloc[i-1], low.iloc[max(0, i-2)])
+                value = min(value, lows[i-1], lows[max(0, i-2)])
                 
                 # If SAR crosses above the current low, switch to bear trend
-                if psar.iloc[i] > low.iloc[i]:
-                    psarbull[i] = False
-                    psarbear[i] = True
-                    psar.iloc[i] = ep_bull
-                    ep_bear = high.iloc[i]
+                if value > lows[i]:
+                    bull = False
+                    value = ep_bull
+                    ep_bear = highs[i]
                     af = step
-                else:
-                    psarbull[i] = True
-                    psarbear[i] = False
-                    # If we have a new extreme point, increase af
-                    if high.iloc[i] > ep_bull:
-                        ep_bull = high.iloc[i]
-                        af = min(af + step, max_step)
+                # If we have a new extreme point, increase af
+                elif highs[i] > ep_bull:
+                    ep_bull = highs[i]
+                    af = min(af + step, max_step)
             
             # Bear trend
             else:
-                psar.iloc[i] = prev_psar - af * (prev_psar - ep_bear)
+                value = prev_psar - af * (prev_psar - ep_bear)
                 
                 # Make sure SAR is above the previous two highs
-                psar.iloc[i] = max(psar.iloc[i], high.iloc[i-1], high.iloc[max(0, i-2)])
+                value = max(value, highs[i-1], highs[max(0, i-2)])
                 
                 # If SAR crosses below the current high, switch to bull trend
-                if psar.iloc[i] < high.iloc[i]:
-                    psarbull[i] = True
-                    psarbear[i] = False
-                    psar.iloc[i] = ep_bear
-                    ep_bull = low.iloc[i]
+                if value < highs[i]:
+                    bull = True
+                    value = ep_bear
+                    ep_bull = lows[i]
                     af = step
-                else:
-                    psarbull[i] = False
-                    psarbear[i] = True
-                    # If we have a new extreme point, increase af
-                    if low.iloc[i] < ep_bear:
-                        ep_bear = low.iloc[i]
-                        af = min(af + step, max_step)
-        
-        return psar
-    
-    def analyze(self, candle_data):
-        """Main strategy analysis function"""
-        if not candle_data or len(candle_data) < 50:
+                # If we have a new extreme point, increase af
+                elif lows[i] < ep_bear:
+                    ep_bear = lows[i]
+                    af = min(af + step, max_step)
+            
+            psar[i - offset] = value
+            prev_psar = value
+        
+        state.update({
+            'psar': float(prev_psar),
+            'bull': bool(bull),
+            'af': float(af),
+            'ep_bull': float(ep_bull),
+            'ep_bear': float(ep_bear),
+            'highs': highs[-2:].tolist(),
+            'lows': lows[-2:].tolist()
+        })
+        
+        return pd.Series(psar, index=close.index)
+    
+    def analyze(self, candle_data, cursor=None):
+        """
+        Main strategy analysis function
+
+        Every response carries a 'cursor' (timestamp of the last candle). Passing
+        it back on the next call only processes candles after it and returns just
+        the new signals, trades and indicator rows. A changed cursor candle
+        (one that was still forming) is recomputed and returned as well.
+
+        The cursor is followed by its own stream, so analyze() never disturbs
+        the one fed by update() and iter_signals().
+        """
+        if cursor is not None and candle_data is not None and len(candle_data):
+            try:
+                delta = self._analyze_delta(candle_data, int(cursor))
+                if delta is not None:
+                    return delta
+            except Exception as e:
+                print(f'Error analyzing candle data: {str(e)}')
+                return {
+                    'success': False,
+                    'message': f'Analysis error: {str(e)}'
+                }
+        
+        if candle_data is None or len(candle_data) < 50:
             print('Insufficient data for analysis, minimum 50 candles required')
             return {'success': False, 'message': 'Insufficient data for analysis'}
         
         try:
             # Convert candle data to pandas DataFrame
-            df = self._prepare_dataframe(candle_data)
+            state = {}
+            df = self._prepare_dataframe(candle_data, state)
             
             # Calculate all enabled indicators
-            df = self._calculate_indicators(df)
+            df = self._calculate_indicators(df, state)
             
             # Generate signals
             signals = self._generate_signals(df)
             
+            # Apply the open-trade cap, position sizing and trailing stops
+            manager = PositionManager.from_strategy(self)
+            signals, trades = manager.process(df['high'], df['low'], self._index_ms(df.index), signals)
+            
+            # Keep the tail and indicator state so calls with a cursor only process new candles
+            stream = type(self)(self.config)
+            stream._stream_state = state
+            stream._stream_count = len(df)
+            stream.position_manager = manager
+            stream.positions = manager.open_positions()
+            stream._store_stream_tail(df)
+            with self._lock:
+                self._cursor_stream = stream
+            
+            # Out-of-sync cursor: answer with everything after it
+            if cursor is not None:
+                cursor = int(cursor)
+                signals = [s for s in signals if s['timestamp'] > cursor]
+                trades = [t for t in trades if t['exit_time'] > cursor]
+                df = df[self._index_ms(df.index) > cursor]
+            
             # Convert dataframe index to timestamp for serialization
             indicator_data = df.to_dict(orient='index')
             
             return {
                 'success': True,
                 'signals': signals,
-                'indicators': indicator_data
+                'trades': trades,
+                'indicators': indicator_data,
+                'cursor': stream.last_candle['timestamp']
             }
         except Exception as e:
             print(f'Error analyzing candle data: {str(e)}')
@@ -316,8 +445,386 @@ class ScalpingStrategy:
                 'message': f'Analysis error: {str(e)}'
             }
     
-    def _prepare_dataframe(self, candle_data):
-        """Convert candle data to pandas DataFrame"""
+    def _analyze_delta(self, candle_data, cursor):
+        """Incremental analyze() for a cursor matching the stream, or None to fall back to a full run"""
+        with self._lock:
+            stream = self._cursor_stream
+            if stream is None or stream.last_candle['timestamp'] != cursor:
+                return None
+            
+            df = stream._prepare_dataframe(stream._candles_since(candle_data, cursor), stream._stream_state)
+            timestamps = stream._index_ms(df.index)
+            
+            # The cursor candle may have still been forming: rewind the last update and replay it
+            at_cursor = df[timestamps == cursor]
+            if len(at_cursor) and stream._candle_changed(at_cursor.iloc[-1]):
+                if stream._previous_snapshot is None:
+                    return None
+                count = stream._stream_count
+                stream.restore(stream._previous_snapshot)
+                rewound = stream.last_candle['timestamp'] if stream.last_candle else None
+                df = stream._prepare_dataframe(stream._candles_since(candle_data, rewound), stream._stream_state)
+                timestamps = stream._index_ms(df.index)
+                replayed = timestamps <= cursor if rewound is None else (timestamps > rewound) & (timestamps <= cursor)
+                if np.count_nonzero(replayed) != count - stream._stream_count:
+                    return None
+            
+            stream._previous_snapshot = stream.snapshot()
+            signals, trades, rows = stream._advance(df)
+            self.data_quality = stream.data_quality
+            
+            return {
+                'success': True,
+                'signals': signals,
+                'trades': trades,
+                'indicators': rows.to_dict(orient='index'),
+                'cursor': stream.last_candle['timestamp'] if stream.last_candle else cursor,
+                'delta': True
+            }
+    
+    def _candles_since(self, candle_data, since):
+        """
+        Candles with timestamp >= since (all of them when since is None)
+
+        Lists are scanned from the end, so the cost depends on the number of new
+        candles rather than on the length of the history the client sends.
+        """
+        if since is None:
+            return candle_data
+        if isinstance(candle_data, pd.DataFrame):
+            return candle_data[pd.to_numeric(candle_data['timestamp']) >= since]
+        
+        first = len(candle_data)
+        while first > 0 and float(candle_data[first - 1]['timestamp']) >= since:
+            first -= 1
+        return candle_data[first:]
+    
+    def _candle_changed(self, row):
+        """Whether a candle differs from the last one the stream processed"""
+        return any(
+            float(row[field]) != self.last_candle[field]
+            for field in ('open', 'high', 'low', 'close', 'volume')
+        )
+    
+    def reset_stream(self):
+        """Forget the candles seen by update() so the next call starts a new series"""
+        self._stream_tail = None
+        self._stream_state = {}
+        self._stream_count = 0
+        self._previous_snapshot = None
+        self._last_block = None
+        self.position_manager = PositionManager.from_strategy(self)
+        self.positions = []
+    
+    def update(self, candle_data):
+        """
+        Feed candles that follow the ones already seen and return the new signals.
+
+        Only a short tail of recent candles and the running state of the recursive
+        indicators are kept between calls, so memory stays flat however long the
+        stream is, and the signals match an analyze() run over the whole series.
+        A changed copy of the last candle replaces it, as the last of duplicate
+        candles does in a whole-series run, and its signals are returned again.
+        """
+        with self._lock:
+            signals, _, _ = self._advance(self._prepare_dataframe(candle_data, self._stream_state))
+            return signals
+    
+    def _advance(self, df):
+        """Process the rows of a prepared DataFrame newer than the stream; returns (signals, trades, new rows)"""
+        replaced = self._replace_last_candle(df)
+        if replaced is not None:
+            df = replaced
+        tail = self._stream_tail
+        block = df if tail is None else df[df.index > tail.index[-1]]
+        checkpoint = (
+            tail, copy.deepcopy(self._stream_state), self._stream_count,
+            self.position_manager.to_dict(), self.last_candle
+        )
+        frame, start = self._extend_indicators(df, tail, self._stream_state, replaced is None)
+        if frame is None:
+            return [], [], df.iloc[:0]
+        
+        offset = self._stream_count - start
+        signals = self._generate_signals(frame, max(start, 50), offset)
+        
+        # Settle open positions candle by candle and admit the new signals
+        recent = frame.iloc[start:]
+        signals, trades = self.position_manager.process(
+            recent['high'], recent['low'], self._index_ms(recent.index), signals, offset + start
+        )
+        self.positions = self.position_manager.open_positions()
+        
+        self._stream_count += len(recent)
+        self._store_stream_tail(frame)
+        self._last_block = (checkpoint, block)
+        
+        if replaced is not None:
+            # Candles before the replaced one were replayed unchanged and reported already
+            since = self._index_ms(replaced.index[:1])[0]
+            signals = [s for s in signals if s['timestamp'] >= since]
+            trades = [t for t in trades if t['exit_time'] >= since]
+        return signals, trades, recent
+    
+    def _replace_last_candle(self, df):
+        """
+        When df carries a changed copy of the stream's last candle, rewind the
+        block that ended with it and return that block's earlier rows followed
+        by df from the copy on; otherwise None.
+        """
+        tail = self._stream_tail
+        if tail is None or self._last_block is None:
+            return None
+        repeated = df[df.index == tail.index[-1]]
+        if repeated.empty or not self._candle_changed(repeated.iloc[-1]):
+            return None
+        
+        (tail, state, count, positions, last_candle), block = self._last_block
+        # The interval and the quality report already cover both blocks; the
+        # replaced candle now counts as a duplicate
+        correction = {field: 0 for field in SUMMED_FIELDS}
+        correction.update({'duplicates': 1, 'rows_out': -1, 'largest_gap_ms': 0.0, 'interval_ms': None,
+                           'first_timestamp': None, 'last_timestamp': None})
+        for key in ('interval_ms', 'data_quality'):
+            if key in self._stream_state:
+                state[key] = self._stream_state[key]
+        if 'data_quality' in state:
+            state['data_quality'] = self.data_quality = merge_reports(state['data_quality'], correction)
+        
+        self._stream_tail = tail
+        self._stream_state = state
+        self._stream_count = count
+        self.position_manager.load_dict(positions)
+        self.positions = self.position_manager.open_positions()
+        self.last_candle = last_candle
+        self._last_block = None
+        return pd.concat([block[block.index < repeated.index[-1]], df[df.index >= repeated.index[-1]]])
+    
+    def _extend_indicators(self, df, tail, state, report_gap=True):
+        """
+        Indicators for the rows of df newer than a warm-up tail.
+
+        Returns (frame, start): the tail followed by the new rows, where rows
+        before `start` come from the tail and keep their indicator values and
+        state carries the recursive indicators forward. frame is None when df
+        holds nothing new. report_gap=False fills a gap after the tail without
+        reporting it again (when replaying rows).
+        """
+        if tail is not None:
+            # Skip candles that were already processed
+            df = df[df.index > tail.index[-1]]
+        if df.empty:
+            return None, 0
+        if tail is not None:
+            df = self._bridge_gap(tail, df, state, report_gap)
+        
+        start = 0 if tail is None else len(tail)
+        frame = df if tail is None else pd.concat([tail, df])
+        return self._calculate_indicators(frame, state, start), start
+    
+    def _bridge_gap(self, tail, df, state, report_gap=True):
+        """
+        Report the gap between a stream's last candle and the rows after it,
+        and forward-fill it when fillGaps is set, as a whole-series run would.
+
+        A stream fed one candle at a time learns its interval here, from the
+        spacing of the tail and the next candle.
+        """
+        last = tail.iloc[-1]
+        timestamps = self._index_ms(tail.index)
+        previous = [timestamps[-1]] + [float(last[field]) for field in CANDLE_FIELDS[1:]]
+        if state.get('interval_ms') is None:
+            state['interval_ms'] = infer_interval(np.append(timestamps, self._index_ms(df.index[:1])))
+        bridge, report = bridge_gap(
+            previous, self._index_ms(df.index[:1])[0], state['interval_ms'], 'ffill' if self.fill_gaps else 'none'
+        )
+        if report_gap:
+            state['data_quality'] = self.data_quality = merge_reports(state.get('data_quality'), report)
+        if len(bridge):
+            filler = pd.DataFrame(
+                bridge[:, 1:],
+                index=pd.DatetimeIndex(pd.to_datetime(bridge[:, 0], unit='ms'), name='timestamp'),
+                columns=CANDLE_FIELDS[1:]
+            )
+            df = pd.concat([filler, df])
+        return df
+    
+    def _store_stream_tail(self, frame):
+        """Keep the last warm-up rows of an indicator frame and remember its last candle"""
+        self._stream_tail = frame.iloc[-self._warmup_length():].copy()
+        
+        last = frame.iloc[-1]
+        self.last_candle = {
+            'timestamp': int(frame.index[-1].timestamp() * 1000),
+            'open': float(last['open']),
+            'high': float(last['high']),
+            'low': float(last['low']),
+            'close': float(last['close']),
+            'volume': float(last['volume'])
+        }
+    
+    def iter_signals(self, candle_source, block_size=5000):
+        """
+        Scan candles from a file path, '-' for stdin, an open file or any iterator,
+        yielding signals as they are found. Candles are read block_size at a time.
+        """
+        self.reset_stream()
+        for block in iter_candle_blocks(candle_source, block_size):
+            yield from self.update(block)
+    
+    def iter_indicator_blocks(self, candle_blocks):
+        """
+        Indicator frames for consecutive blocks of candles (lists of dicts,
+        DataFrames or n x 6 arrays), skipping signal generation.
+
+        Each frame holds only its block's rows; the warm-up tail and recursive
+        indicator state are carried between blocks so the values match one
+        pass over the whole history. Does not touch the update() stream.
+        """
+        state = {}
+        tail = None
+        for block in candle_blocks:
+            if isinstance(block, np.ndarray):
+                block = pd.DataFrame(block, columns=['timestamp', 'open', 'high', 'low', 'close', 'volume'])
+            frame, start = self._extend_indicators(self._prepare_dataframe(block, state), tail, state)
+            if frame is None:
+                continue
+            tail = frame.iloc[-self._warmup_length():].copy()
+            yield frame.iloc[start:]
+    
+    def snapshot(self):
+        """
+        Serialize the runtime state to a compact binary blob.
+
+        Covers the configuration, the stream tail with its indicator columns, the
+        recursive indicator state, positions, signals and last_candle, so a
+        restored strategy continues update() without recomputing history.
+        """
+        with self._lock:
+            tail = self._stream_tail
+            if tail is None:
+                columns, index, values = [], np.empty(0, dtype=np.int64), np.empty((0, 0))
+            else:
+                # Extra fields carried from the input (symbols, ids, ...) are not needed to continue
+                tail = tail.select_dtypes(include=['number', 'bool'])
+                columns = [str(column) for column in tail.columns]
+                index = self._index_ms(tail.index)
+                values = tail.to_numpy(dtype=float)
+            
+            header = json.dumps({
+                'config': self.config,
+                'stream_count': self._stream_count,
+                'stream_state': self._stream_state,
+                'columns': columns,
+                'position_manager': self.position_manager.to_dict(),
+                'signals': self.signals,
+                'last_candle': self.last_candle
+            }).encode('utf-8')
+            
+            return b''.join([
+                SNAPSHOT_PREFIX.pack(SNAPSHOT_MAGIC, SNAPSHOT_VERSION, len(header), len(index)),
+                header,
+                index.astype('<i8').tobytes(),
+                values.astype('<f8').tobytes()
+            ])
+    
+    def restore(self, data):
+        """Load state produced by snapshot() into this strategy"""
+        magic, version, header_length, rows = SNAPSHOT_PREFIX.unpack_from(data)
+        if magic != SNAPSHOT_MAGIC or version not in (1, SNAPSHOT_VERSION):
+            raise ValueError('Unsupported strategy snapshot format')
+        
+        offset = SNAPSHOT_PREFIX.size
+        header = json.loads(data[offset:offset + header_length])
+        if header['config'] != json.loads(json.dumps(self.config)):
+            raise ValueError('Snapshot was taken with a different strategy configuration')
+        offset += header_length
+        
+        columns = header['columns']
+        tail = None
+        if rows:
+            index = np.frombuffer(data, dtype='<i8', count=rows, offset=offset)
+            offset += index.nbytes
+            values = np.frombuffer(data, dtype='<f8', count=rows * len(columns), offset=offset)
+            tail = pd.DataFrame(
+                values.reshape(rows, len(columns)).copy(),
+                index=pd.DatetimeIndex(pd.to_datetime(index, unit='ms'), name='timestamp'),
+                columns=columns
+            )
+        
+        with self._lock:
+            self._stream_tail = tail
+            self._last_block = None
+            self._stream_state = header['stream_state']
+            self._stream_count = header['stream_count']
+            if version == 1:
+                # Version 1 predates the position manager; its 'positions' list was never filled
+                self.position_manager.reset()
+            else:
+                self.position_manager.load_dict(header['position_manager'])
+            self.positions = self.position_manager.open_positions()
+            self.signals = header['signals']
+            self.last_candle = header['last_candle']
+    
+    @classmethod
+    def from_snapshot(cls, data):
+        """Create a strategy from a snapshot, using the configuration stored in it"""
+        _, _, header_length, _ = SNAPSHOT_PREFIX.unpack_from(data)
+        offset = SNAPSHOT_PREFIX.size
+        config = json.loads(data[offset:offset + header_length])['config']
+        strategy = cls(config)
+        strategy.restore(data)
+        return strategy
+    
+    def save_snapshot(self, path):
+        """Write a snapshot to path atomically"""
+        data = self.snapshot()
+        directory = os.path.dirname(os.path.abspath(path))
+        fd, tmp_path = tempfile.mkstemp(dir=directory, suffix='.tmp')
+        with os.fdopen(fd, 'wb') as f:
+            f.write(data)
+        os.replace(tmp_path, path)
+    
+    def _warmup_length(self):
+        """Number of trailing candles a stream keeps to continue its rolling windows"""
+        indicators = self.indicators
+        atr_period = indicators['atr']['period'] if indicators['atr']['enabled'] else indicators['supertrend']['period']
+        stoch = indicators['stoch_rsi']
+        windows = [
+            indicators['rsi']['period'] + 1,
+            stoch['rsi_period'] + 1 + 2 * stoch['k_period'] + stoch['d_period'],
+            indicators['bollinger_bands']['period'],
+            indicators['donchian_channel']['period'],
+            indicators['choppiness_index']['period'] + atr_period + 1
+        ]
+        # Signal checks look one candle back and only start from index 50
+        return max(51, max(windows) + 1)
+    
+    def _index_ms(self, index):
+        """Datetime index as integer milliseconds since the epoch"""
+        return np.asarray((index - pd.Timestamp(0)) // pd.Timedelta(milliseconds=1), dtype=np.int64)
+    
+    def _set_column(self, df, column, values, start=0):
+        """Write the last len(df) - start values into column, leaving earlier rows untouched"""
+        values = np.asarray(values)
+        if start == 0:
+            df[column] = values[len(values) - len(df):]
+            return
+        # Rebuilding the column is much cheaper than a positional setitem on small frames
+        column_values = (
+            df[column].to_numpy(dtype=np.result_type(df[column].dtype, values.dtype), copy=True)
+            if column in df.columns else np.full(len(df), np.nan)
+        )
+        column_values[start:] = values[len(values) - (len(df) - start):]
+        df[column] = column_values
+    
+    def _prepare_dataframe(self, candle_data, state=None):
+        """
+        Convert candle data to pandas DataFrame
+
+        With the state of a stream, candles are checked against the stream's
+        interval and data_quality covers every block the stream has seen.
+        """
         df = pd.DataFrame(candle_data)
         # Ensure all required columns are present
         required_columns = ['timestamp', 'open', 'high', 'low', 'close', 'volume']
@@ -325,16 +832,36 @@ class ScalpingStrategy:
             if col not in df.columns:
                 raise ValueError(f"Required column '{col}' not found in candle data")
         
+        # Sort, drop duplicate and broken candles before any rolling window sees them
+        df['timestamp'] = pd.to_numeric(df['timestamp'])
+        interval = state.get('interval_ms') if state is not None else None
+        df, self.data_quality = sanitize_frame(df, interval, fill='ffill' if self.fill_gaps else 'none')
+        df = df.drop(columns='missing', errors='ignore')
+        if state is not None:
+            # The first interval found is kept; a single candle has none
+            if state.get('interval_ms') is None:
+                state['interval_ms'] = self.data_quality['interval_ms']
+            state['data_quality'] = self.data_quality = merge_reports(state.get('data_quality'), self.data_quality)
+        
         df['timestamp'] = pd.to_datetime(df['timestamp'], unit='ms')
         df.set_index('timestamp', inplace=True)
         
         return df
     
-    def _calculate_indicators(self, df):
-        """Calculate all enabled indicators"""
+    def _calculate_indicators(self, df, state=None, start=0):
+        """
+        Calculate all enabled indicators
+
+        When continuing a stream, rows before `start` already hold indicator values
+        and `state` carries the recursive indicators (EMA, MACD, SAR, ...) forward.
+        """
+        if state is None:
+            state = {}
+        recent = df.iloc[start:]
+        
         # RSI
         if self.indicators['rsi']['enabled']:
-            df['rsi'] = self._calculate_rsi(df['close'], self.indicators['rsi']['period'])
+            self._set_column(df, 'rsi', self._calculate_rsi(df['close'], self.indicators['rsi']['period']), start)
         
         # Stochastic RSI
         if self.indicators['stoch_rsi']['enabled']:
@@ -344,20 +871,21 @@ class ScalpingStrategy:
                 self.indicators['stoch_rsi']['k_period'],
                 self.indicators['stoch_rsi']['d_period']
             )
-            df['stoch_rsi_k'] = k
-            df['stoch_rsi_d'] = d
+            self._set_column(df, 'stoch_rsi_k', k, start)
+            self._set_column(df, 'stoch_rsi_d', d, start)
         
         # MACD
         if self.indicators['macd']['enabled']:
             macd, signal, hist = self._calculate_macd(
-                df['close'],
+                recent['close'],
                 self.indicators['macd']['fast_period'],
                 self.indicators['macd']['slow_period'],
-                self.indicators['macd']['signal_period']
+                self.indicators['macd']['signal_period'],
+                state.setdefault('macd', {})
             )
-            df['macd'] = macd
-            df['macd_signal'] = signal
-            df['macd_hist'] = hist
+            self._set_column(df, 'macd', macd, start)
+            self._set_column(df, 'macd_signal', signal, start)
+            self._set_column(df, 'macd_hist', hist, start)
         
         # Bollinger Bands
         if self.indicators['bollinger_bands']['enabled']:
@@ -366,135 +894,176 @@ class ScalpingStrategy:
                 self.indicators['bollinger_bands']['period'],
                 self.indicators['bollinger_bands']['std_dev']
             )
-            df['bb_upper'] = upper
-            df['bb_middle'] = middle
-            df['bb_lower'] = lower
+            self._set_column(df, 'bb_upper', upper, start)
+            self._set_column(df, 'bb_middle', middle, start)
+            self._set_column(df, 'bb_lower', lower, start)
         
         # EMAs
         if self.indicators['ema']['enabled']:
-            df['ema_fast'] = self._calculate_ema(df['close'], self.indicators['ema']['fast_period'])
-            df['ema_slow'] = self._calculate_ema(df['close'], self.indicators['ema']['slow_period'])
+            ema_state = state.setdefault('ema', {})
+            fast, slow = self._calculate_emas(
+                recent['close'],
+                [self.indicators['ema']['fast_period'], self.indicators['ema']['slow_period']],
+                [ema_state['fast'], ema_state['slow']] if 'fast' in ema_state else None
+            )
+            self._set_column(df, 'ema_fast', fast, start)
+            self._set_column(df, 'ema_slow', slow, start)
+            ema_state['fast'] = float(fast[-1])
+            ema_state['slow'] = float(slow[-1])
         
         # ATR
         if self.indicators['atr']['enabled']:
-            df['atr'] = self._calculate_atr(
+            atr = self._calculate_atr(
                 df['high'],
                 df['low'],
                 df['close'],
                 self.indicators['atr']['period']
             )
+            self._set_column(df, 'atr', atr, start)
         
         # Parabolic SAR
         if self.indicators['parabolic_sar']['enabled']:
-            df['psar'] = self._calculate_parabolic_sar(
-                df['high'],
-                df['low'],
-                df['close'],
+            psar = self._calculate_parabolic_sar(
+                recent['high'],
+                recent['low'],
+                recent['close'],
                 self.indicators['parabolic_sar']['step'],
-                self.indicators['parabolic_sar']['max_step']
+                self.indicators['parabolic_sar']['max_step'],
+                state.setdefault('parabolic_sar', {})
             )
+            self._set_column(df, 'psar', psar, start)
         
         # Calculate VWAP
         if self.indicators['vwap']['enabled']:
-            df = self._calculate_vwap(df)
+            df = self._calculate_vwap(df, state.setdefault('vwap', {}), start)
         
         # Calculate Supertrend
         if self.indicators['supertrend']['enabled']:
-            df = self._calculate_supertrend(df)
+            df = self._calculate_supertrend(df, state.setdefault('supertrend', {}), start)
         
         # Calculate Donchian Channel
         if self.indicators['donchian_channel']['enabled']:
-            df = self._calculate_donchian_channel(df)
+            df = self._calculate_donchian_channel(df, start)
         
         # Calculate Choppiness Index
         if self.indicators['choppiness_index']['enabled']:
-            df = self._calculate_choppiness_index(df)
+            df = self._calculate_choppiness_index(df, start)
         
         # Calculate Pivot Points if enabled
         if self.indicators['pivot_points']['enabled']:
-            df = self._calculate_pivot_points(df)
+            df = self._calculate_pivot_points(df, start)
         
         # Calculate Heikin-Ashi candles if enabled
         if self.indicators['heikin_ashi']['enabled']:
-            df = self._calculate_heikin_ashi(df)
+            df = self._calculate_heikin_ashi(df, state.setdefault('heikin_ashi', {}), start)
         
         return df
     
-    def _calculate_vwap(self, df):
+    def _calculate_vwap(self, df, state=None, start=0):
         """Calculate VWAP manually"""
-        df['vwap'] = np.cumsum(df['volume'] * df['close']) / np.cumsum(df['volume'])
+        if state is None:
+            state = {}
+        recent = df.iloc[start:]
+        price_volume = (recent['volume'] * recent['close']).to_numpy(dtype=float)
+        volume = recent['volume'].to_numpy(dtype=float)
+        
+        # Continue the running sums of an earlier block
+        if 'price_volume' in state:
+            price_volume = np.cumsum(np.concatenate(([state['price_volume']], price_volume)))[1:]
+            volume = np.cumsum(np.concatenate(([state['volume']], volume)))[1:]
+        else:
+            price_volume = np.cumsum(price_volume)
+            volume = np.cumsum(volume)
+        
+        self._set_column(df, 'vwap', price_volume / volume, start)
+        state['price_volume'] = float(price_volume[-1])
+        state['volume'] = float(volume[-1])
         return df
     
-    def _calculate_supertrend(self, df):
+    def _calculate_supertrend(self, df, state=None, start=0):
         """Calculate Supertrend indicator"""
+        if state is None:
+            state = {}
         period = self.indicators['supertrend']['period']
         multiplier = self.indicators['supertrend']['multiplier']
         
         # Calculate ATR if not already calculated
-        if 'atr' not in df.columns:
-            df['atr'] = self._calculate_atr(
+        if not self.indicators['atr']['enabled']:
+            atr = self._calculate_atr(
                 df['high'],
                 df['low'],
                 df['close'],
                 period
             )
+            self._set_column(df, 'atr', atr, start)
         
         # Calculate Basic Upper and Lower Bands
-        df['basic_upper'] = ((df['high'] + df['low']) / 2) + (multiplier * df['atr'])
-        df['basic_lower'] = ((df['high'] + df['low']) / 2) - (multiplier * df['atr'])
-        
-        # Calculate Supertrend
-        df['supertrend'] = 0.0
-        df['supertrend_direction'] = 1  # 1 for uptrend, -1 for downtrend
-        
-        # First value of Supertrend is set to basic upper/lower based on first close vs first pivotpoint
-        if df['close'].iloc[0] <= df['basic_upper'].iloc[0]:
-            df.loc[df.index[0], 'supertrend'] = df['basic_upper'].iloc[0]
-            df.loc[df.index[0], 'supertrend_direction'] = -1
+        self._set_column(df, 'basic_upper', ((df['high'] + df['low']) / 2) + (multiplier * df['atr']), start)
+        self._set_column(df, 'basic_lower', ((df['high'] + df['low']) / 2) - (multiplier * df['atr']), start)
+        
+        close = df['close'].to_numpy(dtype=float)[start:]
+        basic_upper = df['basic_upper'].to_numpy(dtype=float)[start:]
+        basic_lower = df['basic_lower'].to_numpy(dtype=float)[start:]
+        supertrend = np.zeros(len(close))
+        direction = np.ones(len(close), dtype=int)  # 1 for uptrend, -1 for downtrend
+        
+        if 'supertrend' in state:
+            prev_supertrend = state['supertrend']
+            prev_basic_lower = state['basic_lower']
+            first = 0
         else:
-            df.loc[df.index[0], 'supertrend'] = df['basic_lower'].iloc[0]
-            df.loc[df.index[0], 'supertrend_direction'] = 1
+            # First value of Supertrend is set to basic upper/lower based on first close vs first pivotpoint
+            if close[0] <= basic_upper[0]:
+                supertrend[0] = basic_upper[0]
+                direction[0] = -1
+            else:
+                supertrend[0] = basic_lower[0]
+                direction[0] = 1
+            prev_supertrend = supertrend[0]
+            prev_basic_lower = basic_lower[0]
+            first = 1
         
         # Calculate Supertrend values
-        for i in range(1, len(df)):
-            curr_close = df['close'].iloc[i]
-            prev_supertrend = df['supertrend'].iloc[i-1]
-            curr_basic_upper = df['basic_upper'].iloc[i]
-            curr_basic_lower = df['basic_lower'].iloc[i]
-            prev_basic_upper = df['basic_upper'].iloc[i-1]
-            prev_basic_lower = df['basic_lower'].iloc[i-1]
-            prev_direction = df['supertrend_direction'].iloc[i-1]
-            
+        for i in range(first, len(close)):
             # Uptrend
             if prev_supertrend == prev_basic_lower:
-                if curr_close <= curr_basic_lower:
-                    df.loc[df.index[i], 'supertrend'] = curr_basic_upper
-                    df.loc[df.index[i], 'supertrend_direction'] = -1
+                if close[i] <= basic_lower[i]:
+                    supertrend[i] = basic_upper[i]
+                    direction[i] = -1
                 else:
-                    df.loc[df.index[i], 'supertrend'] = curr_basic_lower
-                    df.loc[df.index[i], 'supertrend_direction'] = 1
+                    supertrend[i] = basic_lower[i]
+                    direction[i] = 1
             # Downtrend
             else:
-                if curr_close >= curr_basic_upper:
-                    df.loc[df.index[i], 'supertrend'] = curr_basic_lower
-                    df.loc[df.index[i], 'supertrend_direction'] = 1
+                if close[i] >= basic_upper[i]:
+                    supertrend[i] = basic_lower[i]
+                    direction[i] = 1
                 else:
-                    df.loc[df.index[i], 'supertrend'] = curr_basic_upper
-                    df.loc[df.index[i], 'supertrend_direction'] = -1
+                    supertrend[i] = basic_upper[i]
+                    direction[i] = -1
+            prev_supertrend = supertrend[i]
+            prev_basic_lower = basic_lower[i]
+        
+        self._set_column(df, 'supertrend', supertrend, start)
+        self._set_column(df, 'supertrend_direction', direction, start)
+        state['supertrend'] = float(prev_supertrend)
+        state['basic_lower'] = float(prev_basic_lower)
         
         return df
     
-    def _calculate_donchian_channel(self, df):
+    def _calculate_donchian_channel(self, df, start=0):
         """Calculate Donchian Channel"""
         period = self.indicators['donchian_channel']['period']
         
-        df['donchian_high'] = df['high'].rolling(window=period).max()
-        df['donchian_low'] = df['low'].rolling(window=period).min()
-        df['donchian_mid'] = (df['donchian_high'] + df['donchian_low']) / 2
+        donchian_high = df['high'].rolling(window=period).max()
+        donchian_low = df['low'].rolling(window=period).min()
+        self._set_column(df, 'donchian_high', donchian_high, start)
+        self._set_column(df, 'donchian_low', donchian_low, start)
+        self._set_column(df, 'donchian_mid', (donchian_high + donchian_low) / 2, start)
         
         return df
     
-    def _calculate_choppiness_index(self, df):
+    def _calculate_choppiness_index(self, df, start=0):
         """Calculate Choppiness Index"""
         period = self.indicators['choppiness_index']['period']
         
@@ -505,19 +1074,24 @@ class ScalpingStrategy:
             tr = df['atr'] * period  # Approximate TR from ATR
         
         # Sum of true ranges
-        df['tr_sum'] = tr.rolling(window=period).sum()
+        tr_sum = self._rolling_sum(tr, period)
         
         # Highest high - lowest low over period
-        df['highest_high'] = df['high'].rolling(window=period).max()
-        df['lowest_low'] = df['low'].rolling(window=period).min()
-        df['range'] = df['highest_high'] - df['lowest_low']
+        highest_high = df['high'].rolling(window=period).max()
+        lowest_low = df['low'].rolling(window=period).min()
+        price_range = highest_high - lowest_low
+        
+        self._set_column(df, 'tr_sum', tr_sum, start)
+        self._set_column(df, 'highest_high', highest_high, start)
+        self._set_column(df, 'lowest_low', lowest_low, start)
+        self._set_column(df, 'range', price_range, start)
         
         # Calculate Choppiness Index
-        df['choppiness'] = 100 * np.log10(df['tr_sum'] / df['range']) / np.log10(period)
+        self._set_column(df, 'choppiness', 100 * np.log10(tr_sum / price_range) / np.log10(period), start)
         
         return df
     
-    def _calculate_pivot_points(self, df):
+    def _calculate_pivot_points(self, df, start=0):
         """Calculate Pivot Points"""
         # This implementation uses the standard pivot point calculation method
         # For daily pivot points based on the previous day
@@ -532,88 +1106,103 @@ class ScalpingStrategy:
         prev_close = df['close'].shift(1)
         
         # Calculate pivot point
-        df['pivot'] = (prev_high + prev_low + prev_close) / 3
+        pivot = (prev_high + prev_low + prev_close) / 3
+        levels = {}
         
         # Calculate support and resistance levels
         if self.indicators['pivot_points']['type'] == 'standard':
             # Standard pivot points
-            df['r1'] = (2 * df['pivot']) - prev_low
-            df['s1'] = (2 * df['pivot']) - prev_high
-            df['r2'] = df['pivot'] + (prev_high - prev_low)
-            df['s2'] = df['pivot'] - (prev_high - prev_low)
-            df['r3'] = df['pivot'] + 2 * (prev_high - prev_low)
-            df['s3'] = df['pivot'] - 2 * (prev_high - prev_low)
+            levels['r1'] = (2 * pivot) - prev_low
+            levels['s1'] = (2 * pivot) - prev_high
+            levels['r2'] = pivot + (prev_high - prev_low)
+            levels['s2'] = pivot - (prev_high - prev_low)
+            levels['r3'] = pivot + 2 * (prev_high - prev_low)
+            levels['s3'] = pivot - 2 * (prev_high - prev_low)
         
         elif self.indicators['pivot_points']['type'] == 'fibonacci':
             # Fibonacci pivot points
-            df['r1'] = df['pivot'] + 0.382 * (prev_high - prev_low)
-            df['s1'] = df['pivot'] - 0.382 * (prev_high - prev_low)
-            df['r2'] = df['pivot'] + 0.618 * (prev_high - prev_low)
-            df['s2'] = df['pivot'] - 0.618 * (prev_high - prev_low)
-            df['r3'] = df['pivot'] + 1.0 * (prev_high - prev_low)
-            df['s3'] = df['pivot'] - 1.0 * (prev_high - prev_low)
+            levels['r1'] = pivot + 0.382 * (prev_high - prev_low)
+            levels['s1'] = pivot - 0.382 * (prev_high - prev_low)
+            levels['r2'] = pivot + 0.618 * (prev_high - prev_low)
+            levels['s2'] = pivot - 0.618 * (prev_high - prev_low)
+            levels['r3'] = pivot + 1.0 * (prev_high - prev_low)
+            levels['s3'] = pivot - 1.0 * (prev_high - prev_low)
         
         elif self.indicators['pivot_points']['type'] == 'camarilla':
             # Camarilla pivot points
-            df['r1'] = prev_close + 1.1 * (prev_high - prev_low) / 12
-            df['s1'] = prev_close - 1.1 * (prev_high - prev_low) / 12
-            df['r2'] = prev_close + 1.1 * (prev_high - prev_low) / 6
-            df['s2'] = prev_close - 1.1 * (prev_high - prev_low) / 6
-            df['r3'] = prev_close + 1.1 * (prev_high - prev_low) / 4
-            df['s3'] = prev_close - 1.1 * (prev_high - prev_low) / 4
+            levels['r1'] = prev_close + 1.1 * (prev_high - prev_low) / 12
+            levels['s1'] = prev_close - 1.1 * (prev_high - prev_low) / 12
+            levels['r2'] = prev_close + 1.1 * (prev_high - prev_low) / 6
+            levels['s2'] = prev_close - 1.1 * (prev_high - prev_low) / 6
+            levels['r3'] = prev_close + 1.1 * (prev_high - prev_low) / 4
+            levels['s3'] = prev_close - 1.1 * (prev_high - prev_low) / 4
         
         elif self.indicators['pivot_points']['type'] == 'woodie':
             # Woodie pivot points
-            df['pivot'] = (prev_high + prev_low + 2 * prev_close) / 4
-            df['r1'] = (2 * df['pivot']) - prev_low
-            df['s1'] = (2 * df['pivot']) - prev_high
-            df['r2'] = df['pivot'] + (prev_high - prev_low)
-            df['s2'] = df['pivot'] - (prev_high - prev_low)
+            pivot = (prev_high + prev_low + 2 * prev_close) / 4
+            levels['r1'] = (2 * pivot) - prev_low
+            levels['s1'] = (2 * pivot) - prev_high
+            levels['r2'] = pivot + (prev_high - prev_low)
+            levels['s2'] = pivot - (prev_high - prev_low)
+        
+        self._set_column(df, 'pivot', pivot, start)
+        for column, values in levels.items():
+            self._set_column(df, column, values, start)
         
         return df
     
-    def _calculate_heikin_ashi(self, df):
+    def _calculate_heikin_ashi(self, df, state=None, start=0):
         """Calculate Heikin-Ashi candles"""
-        df_ha = df.copy()
+        if state is None:
+            state = {}
+        recent = df.iloc[start:]
         
         # Calculate Heikin-Ashi candles
-        df_ha['ha_close'] = (df['open'] + df['high'] + df['low'] + df['close']) / 4
-        
-        # Calculate first Heikin-Ashi open
-        df_ha['ha_open'] = df['open'].copy()
+        ha_close = ((recent['open'] + recent['high'] + recent['low'] + recent['close']) / 4).to_numpy(dtype=float)
         
-        # Calculate remaining Heikin-Ashi open values
-        for i in range(1, len(df)):
-            df_ha.loc[df.index[i], 'ha_open'] = (df_ha['ha_open'].iloc[i-1] + df_ha['ha_close'].iloc[i-1]) / 2
+        # Each open is the midpoint of the previous Heikin-Ashi candle: smoothing
+        # of the previous close with alpha 0.5. The first open is the candle
+        # open, unless continuing an earlier block.
+        if 'ha_open' in state:
+            ha_open = smooth(np.concatenate(([state['ha_close']], ha_close[:-1])), 0.5, state['ha_open'])
+        else:
+            ha_open = smooth(ha_close[:-1], 0.5, recent['open'].iloc[0])
+            ha_open = np.concatenate(([recent['open'].iloc[0]], ha_open))
         
         # Calculate Heikin-Ashi high and low
-        df_ha['ha_high'] = df[['high', 'ha_open', 'ha_close']].max(axis=1)
-        df_ha['ha_low'] = df[['low', 'ha_open', 'ha_close']].min(axis=1)
+        ha_high = np.maximum(recent['high'].to_numpy(dtype=float), np.maximum(ha_open, ha_close))
+        ha_low = np.minimum(recent['low'].to_numpy(dtype=float), np.minimum(ha_open, ha_close))
         
         # Add the new columns to original dataframe
-        df['ha_open'] = df_ha['ha_open']
-        df['ha_high'] = df_ha['ha_high']
-        df['ha_low'] = df_ha['ha_low']
-        df['ha_close'] = df_ha['ha_close']
+        self._set_column(df, 'ha_open', ha_open, start)
+        self._set_column(df, 'ha_high', ha_high, start)
+        self._set_column(df, 'ha_low', ha_low, start)
+        self._set_column(df, 'ha_close', ha_close, start)
+        state['ha_open'] = float(ha_open[-1])
+        state['ha_close'] = float(ha_close[-1])
         
         return df
     
-    def _generate_signals(self, df):
-        """Generate trading signals based on indicator values"""
+    def _generate_signals(self, df, start_idx=50, index_offset=0):
+        """
+        Generate trading signals based on indicator values
+
+        index_offset is the position of df's first row in the full series and is
+        added to each signal's candle_index.
+        """
         signals = []
         
         # Start from the 50th row to ensure we have enough data for all indicators
-        start_idx = 50
+        start_idx = max(start_idx, 50)
         
         # Process each candle for signals
         for i in range(start_idx, len(df)):
-            current_candle = df.iloc[i].to_dict()
             signal = self._check_for_signal(df, i)
             
             if signal:
                 # Add timestamp from DataFrame index
                 signal['timestamp'] = df.index[i].timestamp() * 1000  # Convert to milliseconds
-                signal['candle_index'] = i
+                signal['candle_index'] = i + index_offset
                 signals.append(signal)
         
         return signals
@@ -0,0 +1,95 @@
+import os
+import threading
+from urllib.parse import quote, unquote
+
+from scalping_strategy import ScalpingStrategy
+
+
+class StrategyCheckpointer:
+    """
+    Periodically snapshot live strategy instances to disk and restore them on startup.
+
+    Instances are keyed like the JS handler's strategyInstances
+    (`${userId}_${strategyId}`); each key gets its own snapshot file in directory.
+    """
+
+    SUFFIX = '.snapshot'
+
+    def __init__(self, directory, interval=30.0):
+        os.makedirs(directory, exist_ok=True)
+        self.directory = directory
+        self.interval = interval
+        self.instances = {}
+        self.lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+
+    def _path(self, key):
+        return os.path.join(self.directory, quote(key, safe='') + self.SUFFIX)
+
+    def register(self, key, strategy):
+        """Start checkpointing a strategy instance"""
+        with self.lock:
+            self.instances[key] = strategy
+
+    def unregister(self, key, delete=True):
+        """Stop checkpointing an instance and optionally remove its snapshot"""
+        with self.lock:
+            self.instances.pop(key, None)
+        if delete:
+            try:
+                os.remove(self._path(key))
+            except FileNotFoundError:
+                pass
+
+    def checkpoint(self):
+        """Snapshot every registered instance now; returns the number written"""
+        with self.lock:
+            instances = list(self.instances.items())
+
+        written = 0
+        for key, strategy in instances:
+            try:
+                strategy.save_snapshot(self._path(key))
+                written += 1
+            except Exception as e:
+                print(f'Error checkpointing strategy {key}: {str(e)}')
+        return written
+
+    def restore_all(self, strategy_class=ScalpingStrategy):
+        """Recreate and register every instance found in the snapshot directory"""
+        restored = {}
+        for name in os.listdir(self.directory):
+            if not name.endswith(self.SUFFIX):
+                continue
+            key = unquote(name[:-len(self.SUFFIX)])
+            try:
+                with open(os.path.join(self.directory, name), 'rb') as f:
+                    restored[key] = strategy_class.from_snapshot(f.read())
+            except Exception as e:
+                print(f'Error restoring strategy {key}: {str(e)}')
+
+        with self.lock:
+            self.instances.update(restored)
+        return restored
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            self.checkpoint()
+
+    def start(self):
+        """Checkpoint in a background thread every `interval` seconds"""
+        if self._thread is not None and self._thread.is_alive():
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name='strategy-checkpointer', daemon=True)
+        self._thread.start()
+
+    def stop(self, final_checkpoint=True):
+        """Stop the background thread, writing one last checkpoint by default"""
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+        if final_checkpoint:
+            self.checkpoint()
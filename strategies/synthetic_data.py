@@ -0,0 +1,23 @@
+import numpy as np
+
+
+def synthetic_candles(count, seed=0, interval_ms=60_000, start_price=30000.0, start_time=1_700_000_000_000):
+    """Random-walk OHLCV candles, reproducible for a given seed"""
+    rng = np.random.default_rng(seed)
+    opens = start_price * np.exp(np.cumsum(rng.normal(0, 0.001, count)))
+    closes = opens * np.exp(rng.normal(0, 0.0008, count))
+    highs = np.maximum(opens, closes) * (1 + np.abs(rng.normal(0, 0.0004, count)))
+    lows = np.minimum(opens, closes) * (1 - np.abs(rng.normal(0, 0.0004, count)))
+    volumes = rng.uniform(1000, 60000, count)
+
+    return [
+        {
+            'timestamp': start_time + i * interval_ms,
+            'open': float(opens[i]),
+            'high': float(highs[i]),
+            'low': float(lows[i]),
+            'close': float(closes[i]),
+            'volume': float(volumes[i])
+        }
+        for i in range(count)
+    ]